@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class OrdersConfig(AppConfig):
     name = 'orders'
+
+    def ready(self):
+        # Registrar las señales que invalidan la caché de las tablas
+        from . import signals  # noqa: F401
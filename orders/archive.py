@@ -0,0 +1,109 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import rollups, search
+from .cache import bump_table_version
+from .models import ArchivedOrder, Customer, Order, Product, SearchEntry
+
+# Pedidos movidos por transacción
+BATCH_SIZE = 1000
+
+# Columnas que se copian de Order a ArchivedOrder; la marca de importación
+# solo sirve mientras se importa el bloque
+FIELDS = [field.attname for field in Order._meta.concrete_fields
+          if field.attname != 'import_batch']
+
+
+def horizon(days=None):
+    """
+    Calcula la fecha de entrega a partir de la cual se conservan los
+    pedidos en la tabla principal.
+
+    Args:
+        days (int): Días de antigüedad; por defecto ARCHIVE_AFTER_DAYS.
+
+    Returns:
+        date: Se archivan los pedidos entregados antes de esta fecha.
+    """
+
+    if days is None:
+        days = settings.ARCHIVE_AFTER_DAYS
+    return timezone.localdate() - timedelta(days=days)
+
+
+def archive_batch(before, batch_size=BATCH_SIZE):
+    """
+    Mueve al archivo un bloque de pedidos entregados antes de una fecha, en
+    una transacción corta que solo bloquea las filas del bloque. Los pedidos
+    de clientes o productos eliminados se dejan para purge_deleted.
+
+    Args:
+        before (date): Fecha de entrega límite.
+        batch_size (int): Pedidos a mover.
+
+    Returns:
+        int: La cantidad de pedidos archivados.
+    """
+
+    with transaction.atomic():
+        # Los clientes y productos eliminados se excluyen con subconsultas y
+        # no con el JOIN de visible(), que con FOR UPDATE también bloquearía
+        # sus filas y frenaría las ediciones de clientes y productos
+        orders = list(
+            Order.objects.select_for_update()
+            .filter(delivered__lt=before)
+            .exclude(customer__in=Customer.objects.filter(
+                deleted_at__isnull=False).values('id'))
+            .exclude(product__in=Product.objects.filter(
+                deleted_at__isnull=False).values('id'))
+            .order_by('delivered', 'id')[:batch_size]
+        )
+        if not orders:
+            return 0
+
+        ids = [order.id for order in orders]
+        ArchivedOrder.objects.bulk_create([
+            ArchivedOrder(**{name: getattr(order, name) for name in FIELDS})
+            for order in orders
+        ], batch_size=500)
+        Order.objects.filter(id__in=ids).delete()
+        search.remove(SearchEntry.ORDER, ids)
+        search.index(SearchEntry.ARCHIVED_ORDER, ids, replace=False)
+        rollups.archive_orders(orders)
+        bump_table_version()
+
+    return len(orders)
+
+
+def archive_orders(before, batch_size=BATCH_SIZE, pause=0, progress=None):
+    """
+    Mueve al archivo todos los pedidos entregados antes de una fecha, de a
+    un bloque por transacción. Se puede interrumpir y volver a ejecutar:
+    cada bloque queda archivado al confirmarse.
+
+    Args:
+        before (date): Fecha de entrega límite.
+        batch_size (int): Pedidos por bloque.
+        pause (float): Segundos de espera entre bloques, para dejar pasar
+        las escrituras de las demás solicitudes.
+        progress (function): Se llama con la cantidad archivada después de
+        cada bloque.
+
+    Returns:
+        int: La cantidad de pedidos archivados.
+    """
+
+    total = 0
+    while True:
+        count = archive_batch(before, batch_size)
+        total += count
+        if count and progress:
+            progress(total)
+        if count < batch_size:
+            return total
+        if pause:
+            time.sleep(pause)
@@ -0,0 +1,206 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.templatetags.static import static
+
+try:
+    import brotli
+except ImportError:  # Opcional: sin el paquete solo se generan los .gz
+    brotli = None
+
+# Archivos de 'static' que forman cada paquete, en orden de carga. Los
+# '.min' ya vienen minificados y se copian tal cual.
+BUNDLES = {
+    # Estilos propios y de los mensajes, en todas las páginas
+    'app.css': [
+        'css/styles.css',
+        'css/jquery.toast.css',
+    ],
+    # Scripts propios y de los mensajes, en todas las páginas
+    'app.js': [
+        'js/jquery.toast.js',
+        'js/script.js',
+    ],
+    # DataTables y sus botones, solo en las páginas con tablas
+    'tables.css': [
+        'dataTables/DataTables-1.13.6/css/dataTables.bootstrap5.min.css',
+        'dataTables/Buttons-2.4.2/css/buttons.bootstrap5.min.css',
+    ],
+    'tables.js': [
+        'dataTables/DataTables-1.13.6/js/jquery.dataTables.min.js',
+        'dataTables/DataTables-1.13.6/js/dataTables.bootstrap5.min.js',
+        'dataTables/Buttons-2.4.2/js/dataTables.buttons.min.js',
+        'dataTables/Buttons-2.4.2/js/buttons.bootstrap5.min.js',
+        'dataTables/Buttons-2.4.2/js/buttons.html5.min.js',
+        'dataTables/Buttons-2.4.2/js/buttons.print.min.js',
+    ],
+    # Exportación a Excel y PDF en el navegador; script.js la carga al
+    # hacer clic en un botón que la necesita
+    'export.js': [
+        'dataTables/JSZip-3.10.1/jszip.min.js',
+        'dataTables/pdfmake-0.2.7/pdfmake.min.js',
+        'dataTables/pdfmake-0.2.7/vfs_fonts.js',
+    ],
+}
+
+# Nombre del manifiesto dentro de ASSET_BUNDLES_DIR
+MANIFEST = 'manifest.json'
+
+# Prefijo de los paquetes en STATIC_URL
+PREFIX = 'bundles'
+
+_CSS_COMMENTS = re.compile(r'/\*.*?\*/', re.S)
+_CSS_SPACES = re.compile(r'\s+')
+_CSS_PUNCTUATION = re.compile(r'\s*([{};,])\s*')
+
+
+def minify_css(text):
+    """
+    Quita los comentarios y los espacios sobrantes de una hoja de estilos.
+
+    Args:
+        text (str): El CSS.
+
+    Returns:
+        str: El CSS minificado.
+    """
+
+    text = _CSS_SPACES.sub(' ', _CSS_COMMENTS.sub('', text))
+    return _CSS_PUNCTUATION.sub(r'\1', text).strip()
+
+
+def minify_js(text):
+    """
+    Quita la sangría, las líneas vacías y las líneas que solo tienen un
+    comentario '//'. No cambia nada dentro de las líneas, así que no puede
+    romper cadenas ni expresiones regulares.
+
+    Args:
+        text (str): El JavaScript.
+
+    Returns:
+        str: El JavaScript minificado.
+    """
+
+    lines = (line.strip() for line in text.splitlines())
+    return '\n'.join(
+        line for line in lines if line and not line.startswith('//'))
+
+
+def bundle(name, root=None):
+    """
+    Une y minifica los archivos de un paquete.
+
+    Args:
+        name (str): El nombre del paquete en BUNDLES.
+        root (str): Carpeta de los archivos; por defecto la primera de
+        STATICFILES_DIRS.
+
+    Returns:
+        bytes: El contenido del paquete.
+    """
+
+    root = root or settings.STATICFILES_DIRS[0]
+    parts = []
+    for path in BUNDLES[name]:
+        with open(os.path.join(root, path), encoding='utf-8') as file:
+            text = file.read()
+        if '.min.' not in path:
+            text = minify_css(text) if name.endswith('.css') else \
+                minify_js(text)
+        parts.append(text)
+
+    # El ';' evita que dos scripts se unan en una sola expresión
+    separator = '\n' if name.endswith('.css') else ';\n'
+    return separator.join(parts).encode('utf-8')
+
+
+def build(output_dir=None, root=None):
+    """
+    Genera cada paquete con el hash de su contenido en el nombre, sus
+    versiones comprimidas con gzip (y brotli, si está instalado) y el
+    manifiesto que usan las plantillas. Los paquetes que no cambiaron
+    conservan su nombre, así que el navegador sigue usando su copia.
+
+    Args:
+        output_dir (str): Carpeta de salida; por defecto ASSET_BUNDLES_DIR.
+        root (str): Carpeta de los archivos originales.
+
+    Returns:
+        dict: Nombre de cada paquete a su archivo con hash.
+    """
+
+    output_dir = output_dir or settings.ASSET_BUNDLES_DIR
+    os.makedirs(output_dir, exist_ok=True)
+
+    manifest = {}
+    for name in BUNDLES:
+        content = bundle(name, root)
+        stem, extension = os.path.splitext(name)
+        digest = hashlib.sha256(content).hexdigest()[:12]
+        hashed = f'{stem}.{digest}{extension}'
+
+        variants = {hashed: content,
+                    f'{hashed}.gz': gzip.compress(content, 9, mtime=0)}
+        if brotli is not None:
+            variants[f'{hashed}.br'] = brotli.compress(content)
+        for filename, data in variants.items():
+            with open(os.path.join(output_dir, filename), 'wb') as file:
+                file.write(data)
+
+        manifest[name] = hashed
+
+    # Se escribe al final, para que las plantillas nunca apunten a un
+    # paquete que todavía no existe
+    path = os.path.join(output_dir, MANIFEST)
+    with open(f'{path}.tmp', 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    os.replace(f'{path}.tmp', path)
+    load_manifest.cache_clear()
+
+    return manifest
+
+
+@lru_cache(maxsize=None)
+def load_manifest():
+    """
+    Lee el manifiesto de los paquetes una vez por proceso.
+
+    Returns:
+        dict: Nombre de cada paquete a su archivo con hash, o vacío si no
+        se generaron o ASSET_BUNDLES está desactivado.
+    """
+
+    if not settings.ASSET_BUNDLES:
+        return {}
+
+    path = os.path.join(settings.ASSET_BUNDLES_DIR, MANIFEST)
+    try:
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def urls(name):
+    """
+    Obtiene las URLs a cargar para un paquete: el archivo con hash si está
+    en el manifiesto, o los archivos originales si no.
+
+    Args:
+        name (str): El nombre del paquete en BUNDLES.
+
+    Returns:
+        list: Las URLs en orden de carga.
+    """
+
+    hashed = load_manifest().get(name)
+    if hashed:
+        return [static(f'{PREFIX}/{hashed}')]
+
+    return [static(path) for path in BUNDLES[name]]
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import time
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import JsonResponse
+
+from .routers import on_replica
+
+# Clave de la versión actual de las tablas de pedidos
+VERSION_KEY = 'orders:tables:version'
+
+# Segundos que se conserva cada página en caché
+PAGE_TIMEOUT = 60 * 60
+
+
+def _new_version():
+    # El momento del cambio va al principio para saber su antigüedad
+    return f'{time.time():.3f}-{uuid.uuid4().hex}'
+
+
+def table_version():
+    """
+    Obtiene la versión actual de las tablas de pedidos, creándola si no
+    existe.
+
+    Returns:
+        str: La versión actual.
+    """
+
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = _new_version()
+        # add() no pisa la versión que otro proceso haya creado antes
+        if not cache.add(VERSION_KEY, version, None):
+            version = cache.get(VERSION_KEY, version)
+
+    return version
+
+
+def bump_table_version():
+    """
+    Invalida las páginas en caché de las tablas cambiando su versión.
+
+    La nueva versión es un valor único en lugar de un contador, así dos
+    procesos que escriben a la vez nunca terminan con la misma versión. El
+    cambio se hace al confirmar la transacción, para que ninguna solicitud
+    guarde con la nueva versión datos anteriores a la escritura.
+    """
+
+    transaction.on_commit(
+        lambda: cache.set(VERSION_KEY, _new_version(), None))
+
+
+def can_store(version):
+    """
+    Indica si se puede guardar en caché lo calculado bajo una versión.
+
+    Lo leído de la réplica durante los primeros REPLICA_STICKY_SECONDS de
+    una versión puede no incluir todavía la escritura que la cambió; se
+    responde igual, pero no se guarda para las solicitudes siguientes.
+
+    Args:
+        version (str): La versión usada en la clave.
+
+    Returns:
+        bool: True si el resultado puede guardarse.
+    """
+
+    if not on_replica():
+        return True
+
+    try:
+        changed = float(version.split('-', 1)[0])
+    except ValueError:
+        return True
+
+    return time.time() - changed >= settings.REPLICA_STICKY_SECONDS
+
+
+def cached_table(view):
+    """
+    Decorador para las fuentes de datos de las tablas: guarda el JSON de
+    cada página bajo la versión actual y lo reutiliza mientras no haya
+    escrituras en pedidos, clientes o productos.
+
+    Args:
+        view (function): Vista que devuelve un JsonResponse.
+
+    Returns:
+        function: La vista con caché.
+    """
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        # 'draw' cambia en cada solicitud y no forma parte de la página
+        params = sorted(
+            (key, value) for key, value in request.GET.items()
+            if key != 'draw')
+        digest = hashlib.sha1(
+            json.dumps([request.path, params]).encode()).hexdigest()
+        version = table_version()
+        key = f'orders:tables:{version}:{digest}'
+
+        data = cache.get(key)
+        if data is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            data = json.loads(response.content)
+            if can_store(version):
+                cache.set(key, data, PAGE_TIMEOUT)
+
+        try:
+            data['draw'] = int(request.GET.get('draw', 0))
+        except ValueError:
+            data['draw'] = 0
+
+        return JsonResponse(data)
+
+    return wrapper
@@ -0,0 +1,197 @@
+import hashlib
+from functools import wraps
+
+from django.contrib import messages
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .cache import PAGE_TIMEOUT, can_store, table_version
+from .models import Customer, Order, Product
+from .rollups import balance_totals
+
+
+def _state(request, compute, *args, **kwargs):
+    """
+    Calcula una sola vez por solicitud la fecha de modificación y el ETag.
+
+    Si hay mensajes pendientes no se usa la validación, porque la página
+    guardada en el navegador mostraría un mensaje anterior.
+
+    Args:
+        request (HttpRequest): La solicitud HTTP recibida.
+        compute (function): Devuelve la fecha de modificación y los valores
+        que identifican el contenido.
+
+    Returns:
+        tuple: La fecha de modificación y el ETag, o (None, None).
+    """
+
+    if not hasattr(request, '_orders_state'):
+        if len(messages.get_messages(request)):
+            request._orders_state = (None, None)
+        else:
+            last_modified, values = compute(*args, **kwargs)
+            digest = hashlib.sha1(
+                repr([request.get_full_path(), values]).encode()).hexdigest()
+            request._orders_state = (last_modified, digest)
+
+    return request._orders_state
+
+
+def _latest(*dates):
+    """
+    Devuelve la fecha más reciente, ignorando las tablas vacías.
+    """
+
+    dates = [value for value in dates if value is not None]
+    return max(dates) if dates else None
+
+
+def _versioned(name, compute):
+    """
+    Guarda el estado calculado bajo la versión de las tablas, que cambia con
+    cada escritura en pedidos, clientes o productos; así las consultas de
+    MAX/COUNT se hacen una sola vez por versión.
+
+    Args:
+        name (str): Nombre del estado.
+        compute (function): Calcula el estado.
+
+    Returns:
+        tuple: La fecha de modificación y los valores del ETag.
+    """
+
+    version = table_version()
+    key = f'orders:state:{version}:{name}'
+    state = cache.get(key)
+    if state is None:
+        state = compute()
+        if can_store(version):
+            cache.set(key, state, PAGE_TIMEOUT)
+
+    return state
+
+
+def orders_state():
+    """
+    Estado de las tablas de pedidos: la última modificación de pedidos,
+    clientes y productos, y sus cantidades para detectar eliminaciones. El
+    máximo usa el índice de updated_at y la cantidad de pedidos sale del
+    resumen diario, así que no se recorre la tabla de pedidos.
+
+    Returns:
+        tuple: La fecha de modificación y los valores del ETag.
+    """
+
+    return _versioned('orders', _compute_orders_state)
+
+
+def _compute_orders_state():
+    """
+    Calcula el estado de las tablas de pedidos con consultas MAX/COUNT.
+    """
+
+    order_modified = Order.objects.aggregate(
+        latest=Max('updated_at'))['latest']
+    customers = Customer.objects.aggregate(
+        latest=Max('updated_at'), count=Count('id'))
+    products = Product.objects.aggregate(
+        latest=Max('updated_at'), count=Count('id'))
+
+    last_modified = _latest(
+        order_modified, customers['latest'], products['latest'])
+    values = [last_modified, balance_totals(), customers['count'],
+              products['count']]
+
+    return last_modified, values
+
+
+def agenda_state():
+    """
+    Estado de la agenda y del tablero de vencidos, que cambian con los
+    pedidos y también con el día, aunque no haya escrituras.
+
+    Returns:
+        tuple: Ninguna fecha de modificación, para validar solo con el ETag,
+        y los valores del ETag de los pedidos más la fecha de hoy.
+    """
+
+    last_modified, values = orders_state()
+    return None, values + [timezone.localdate()]
+
+
+def catalog_state(model):
+    """
+    Estado de la lista de clientes o de productos.
+
+    Args:
+        model (Model): Customer o Product.
+
+    Returns:
+        function: Calcula la fecha de modificación y los valores del ETag.
+    """
+
+    def compute():
+        state = model.objects.aggregate(
+            latest=Max('updated_at'), count=Count('id'))
+        return state['latest'], [state['latest'], state['count']]
+
+    return lambda: _versioned(model.__name__, compute)
+
+
+def order_detail_state(id):
+    """
+    Estado de un pedido y de su producto y cliente.
+
+    Args:
+        id (int): El ID del pedido.
+
+    Returns:
+        tuple: La fecha de modificación y los valores del ETag.
+    """
+
+    dates = Order.objects.filter(id=id).values_list(
+        'updated_at', 'product__updated_at', 'customer__updated_at').first()
+    if dates is None:
+        return None, None
+
+    return _latest(*dates), list(dates)
+
+
+def conditional_page(compute):
+    """
+    Decorador que responde 304 sin cuerpo cuando el navegador ya tiene la
+    versión actual de la página, antes de ejecutar la vista.
+
+    Args:
+        compute (function): Devuelve la fecha de modificación y los valores
+        del ETag; recibe los argumentos de la URL.
+
+    Returns:
+        function: El decorador.
+    """
+
+    def etag(request, *args, **kwargs):
+        return _state(request, compute, *args, **kwargs)[1]
+
+    def last_modified(request, *args, **kwargs):
+        return _state(request, compute, *args, **kwargs)[0]
+
+    def decorator(view):
+        conditional_view = condition(
+            etag_func=etag, last_modified_func=last_modified)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            # Obliga al navegador a validar la página en cada recarga en
+            # lugar de mostrar su copia sin preguntar
+            patch_cache_control(response, no_cache=True)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,279 @@
+import json
+
+from django.db.models import Count, Q, Sum
+from django.http import JsonResponse
+
+# Columnas de las tablas de balance en el orden en que se muestran. Cada
+# entrada indica la clave del JSON, el campo de la base de datos utilizado
+# para ordenar y si admite paginación por cursor (campos sin valores nulos).
+COLUMNS = [
+    ('id', 'id', True),
+    ('product', 'product__name', True),
+    ('customer', 'customer__first_name', True),
+    ('amount', 'amount', True),
+    ('price', 'price', True),
+    ('total', 'total', True),
+    ('deadline', 'deadline', True),
+    ('delivered', 'delivered', False),
+    ('bill', 'bill', False),
+]
+
+# Campos sobre los que se aplica la búsqueda global de DataTables
+SEARCH_FIELDS = [
+    'product__name',
+    'customer__first_name',
+    'customer__last_name',
+    'bill',
+    'observation',
+]
+
+# Columnas que se cargan por fila, incluidas las de cliente y producto que se
+# obtienen en la misma consulta mediante select_related
+ROW_FIELDS = [
+    'id',
+    'amount',
+    'price',
+    'deadline',
+    'delivered',
+    'bill',
+    'product__name',
+    'customer__first_name',
+    'customer__last_name',
+]
+
+# Límite de filas por página para no permitir respuestas sin tope
+MAX_LENGTH = 100
+
+
+def _int_param(params, name, default):
+    """
+    Obtiene un parámetro entero de la solicitud.
+
+    Args:
+        params (QueryDict): Parámetros de la solicitud.
+        name (str): Nombre del parámetro.
+        default (int): Valor por defecto si falta o no es válido.
+
+    Returns:
+        int: El valor del parámetro.
+    """
+
+    try:
+        return int(params.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def parse_request(params):
+    """
+    Interpreta los parámetros del protocolo de DataTables.
+
+    Args:
+        params (QueryDict): Parámetros GET enviados por DataTables.
+
+    Returns:
+        dict: Un diccionario con draw, start, length, search, el total
+        mínimo, la columna de orden, la dirección y el cursor (si existe).
+    """
+
+    column = _int_param(params, 'order[0][column]', 0)
+    if column < 0 or column >= len(COLUMNS):
+        column = 0
+
+    length = _int_param(params, 'length', 10)
+    if length <= 0 or length > MAX_LENGTH:
+        length = MAX_LENGTH
+
+    cursor = None
+    if params.get('cursor'):
+        try:
+            cursor = json.loads(params['cursor'])
+        except ValueError:
+            cursor = None
+
+    return {
+        'draw': _int_param(params, 'draw', 0),
+        'start': max(_int_param(params, 'start', 0), 0),
+        'length': length,
+        'search': params.get('search[value]', '').strip(),
+        'min_total': _int_param(params, 'min_total', None),
+        'column': column,
+        'descending': params.get('order[0][dir]') == 'desc',
+        'cursor': cursor,
+    }
+
+
+def apply_search(queryset, search, min_total=None):
+    """
+    Filtra el queryset en la base de datos con el texto de búsqueda y el
+    total mínimo.
+
+    Args:
+        queryset (QuerySet): Pedidos anotados con 'total' a filtrar.
+        search (str): Texto introducido en el buscador.
+        min_total (int): Si se indica, solo pedidos con total mayor o igual.
+
+    Returns:
+        QuerySet: Los pedidos que coinciden con la búsqueda.
+    """
+
+    for term in search.split():
+        condition = Q()
+        for field in SEARCH_FIELDS:
+            condition |= Q(**{f'{field}__icontains': term})
+        queryset = queryset.filter(condition)
+
+    if min_total is not None:
+        queryset = queryset.filter(total__gte=min_total)
+
+    return queryset
+
+
+def summarize(queryset):
+    """
+    Cuenta los pedidos y suma sus totales en una sola consulta.
+
+    Args:
+        queryset (QuerySet): Pedidos anotados con 'total'.
+
+    Returns:
+        tuple: La cantidad de pedidos y la suma de sus totales.
+    """
+
+    summary = queryset.aggregate(count=Count('id'), revenue=Sum('total'))
+    return summary['count'], summary['revenue'] or 0
+
+
+def paginate(queryset, options):
+    """
+    Ordena y pagina el queryset en la base de datos.
+
+    Si la columna admite cursor y la solicitud trae uno válido, se utiliza
+    paginación por clave (keyset) para que el costo no crezca con el
+    desplazamiento; en caso contrario se usa OFFSET.
+
+    Args:
+        queryset (QuerySet): Pedidos ya filtrados.
+        options (dict): Opciones devueltas por parse_request().
+
+    Returns:
+        QuerySet: La página solicitada.
+    """
+
+    key, field, keyset = COLUMNS[options['column']]
+    prefix = '-' if options['descending'] else ''
+
+    if field == 'id':
+        queryset = queryset.order_by(f'{prefix}id')
+    else:
+        queryset = queryset.order_by(f'{prefix}{field}', f'{prefix}id')
+
+    cursor = options['cursor']
+    if keyset and isinstance(cursor, list) and len(cursor) == 2:
+        value, last_id = cursor
+        lookup = 'lt' if options['descending'] else 'gt'
+        if field == 'id':
+            condition = Q(**{f'id__{lookup}': last_id})
+        else:
+            condition = (
+                Q(**{f'{field}__{lookup}': value}) |
+                Q(**{field: value, f'id__{lookup}': last_id})
+            )
+        return queryset.filter(condition)[:options['length']]
+
+    start = options['start']
+    return queryset[start:start + options['length']]
+
+
+def serialize_order(order):
+    """
+    Convierte un pedido en una fila JSON para DataTables.
+
+    Args:
+        order (Order): El pedido a convertir.
+
+    Returns:
+        dict: Los valores de cada columna de la tabla.
+    """
+
+    return {
+        'id': order.id,
+        'product': order.product.name,
+        'customer': (f'{order.customer.first_name} '
+                     f'{order.customer.last_name or ""}'),
+        'amount': order.amount,
+        'price': order.price,
+        'total': order.total,
+        'deadline': order.deadline.isoformat(),
+        'delivered': order.delivered.isoformat() if order.delivered else None,
+        'bill': order.bill,
+    }
+
+
+def _cursor_for(order, options):
+    """
+    Calcula el cursor de la siguiente página a partir de la última fila.
+
+    Args:
+        order (Order): Último pedido de la página actual.
+        options (dict): Opciones devueltas por parse_request().
+
+    Returns:
+        str: El cursor codificado en JSON, o None si la columna no lo admite.
+    """
+
+    key, field, keyset = COLUMNS[options['column']]
+    if not keyset:
+        return None
+
+    value = order
+    for attribute in field.split('__'):
+        value = getattr(value, attribute)
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+
+    return json.dumps([value, order.id])
+
+
+def server_side_response(request, queryset, totals=None):
+    """
+    Responde a una solicitud de procesamiento del lado del servidor de
+    DataTables.
+
+    Args:
+        request (HttpRequest): La solicitud HTTP recibida.
+        queryset (QuerySet): Los pedidos que muestra la tabla de balance.
+        totals (callable): Si se indica, devuelve la cantidad de pedidos y la
+        suma de sus totales sin filtrar, para no contarlos recorriendo la
+        tabla de pedidos.
+
+    Returns:
+        JsonResponse: La página solicitada junto con los totales de filas y
+        la suma de los totales de los pedidos filtrados.
+    """
+
+    options = parse_request(request.GET)
+
+    queryset = queryset.with_total()
+    if totals is not None:
+        records_total, revenue = totals()
+    else:
+        records_total, revenue = summarize(queryset)
+    filtered = apply_search(
+        queryset, options['search'], options['min_total'])
+    if options['search'] or options['min_total'] is not None:
+        records_filtered, revenue = summarize(filtered)
+    else:
+        records_filtered = records_total
+
+    rows = filtered.select_related('product', 'customer').only(*ROW_FIELDS)
+    page = list(paginate(rows, options))
+
+    return JsonResponse({
+        'draw': options['draw'],
+        'recordsTotal': records_total,
+        'recordsFiltered': records_filtered,
+        'revenue': revenue,
+        'data': [serialize_order(order) for order in page],
+        'cursor': _cursor_for(page[-1], options) if page else None,
+    })
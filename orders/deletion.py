@@ -0,0 +1,122 @@
+import time
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import rollups, search
+from .cache import bump_table_version
+from .models import ArchivedOrder, Customer, Order, Product, SearchEntry
+
+# Filas borradas por transacción
+BATCH_SIZE = 1000
+
+# Modelos que se eliminan de forma diferida y el campo de los pedidos que
+# los referencia
+CATALOG = [(Customer, 'customer'), (Product, 'product')]
+
+
+def soft_delete(instance):
+    """
+    Marca un cliente o producto como eliminado sin borrar sus pedidos, que
+    se ocultan y quedan para purge_deleted. Sus pedidos se restan de los
+    resúmenes y se quitan del índice de búsqueda en el momento, con
+    consultas agrupadas que no recorren los pedidos uno por uno.
+
+    Args:
+        instance (Customer or Product): El cliente o producto a eliminar.
+    """
+
+    now = timezone.now()
+
+    with transaction.atomic():
+        # Los pedidos de un producto o cliente ya eliminado se restaron con
+        # él, así que solo se restan los visibles
+        rollups.apply_orders(instance.orders.visible(), sign=-1)
+        rollups.remove_archived(instance.archived_orders.visible())
+        search.remove(search.MODEL_KINDS[type(instance)], [instance.id])
+        search.remove(SearchEntry.ORDER, instance.orders.values('id'))
+        search.remove(SearchEntry.ARCHIVED_ORDER,
+                      instance.archived_orders.values('id'))
+        type(instance).objects.filter(id=instance.id).update(
+            deleted_at=now, updated_at=now)
+        bump_table_version()
+
+
+def purge_batch(queryset, batch_size=BATCH_SIZE):
+    """
+    Borra un bloque de filas en una transacción corta que solo bloquea las
+    filas del bloque.
+
+    Args:
+        queryset (QuerySet): Las filas a borrar.
+        batch_size (int): Filas a borrar.
+
+    Returns:
+        int: La cantidad de filas borradas.
+    """
+
+    with transaction.atomic():
+        ids = list(queryset.values_list('id', flat=True)[:batch_size])
+        if ids:
+            queryset.model.objects.filter(id__in=ids).delete()
+
+    return len(ids)
+
+
+def pending():
+    """
+    Arma los conjuntos de filas a purgar, en el orden en que se borran:
+    primero los pedidos y los pedidos archivados, y al final los clientes y
+    productos que ya no tienen pedidos, cuyo borrado en cascada solo alcanza
+    a sus filas de resumen.
+
+    Returns:
+        list: Querysets de las filas a borrar.
+    """
+
+    querysets = []
+    for model, field in CATALOG:
+        deleted = model.objects.filter(deleted_at__isnull=False)
+        querysets += [
+            Order.objects.filter(**{f'{field}__in': deleted.values('id')}),
+            ArchivedOrder.objects.filter(
+                **{f'{field}__in': deleted.values('id')}),
+        ]
+    for model, field in CATALOG:
+        querysets.append(model.objects.filter(
+            deleted_at__isnull=False, orders__isnull=True,
+            archived_orders__isnull=True))
+
+    return querysets
+
+
+def purge_deleted(batch_size=BATCH_SIZE, pause=0, progress=None):
+    """
+    Borra por bloques los clientes y productos eliminados y sus pedidos. Se
+    puede interrumpir y volver a ejecutar: cada bloque queda borrado al
+    confirmarse.
+
+    Args:
+        batch_size (int): Filas por bloque.
+        pause (float): Segundos de espera entre bloques, para dejar pasar
+        las escrituras de las demás solicitudes.
+        progress (function): Se llama con la cantidad borrada después de
+        cada bloque.
+
+    Returns:
+        int: La cantidad de filas borradas.
+    """
+
+    total = 0
+    for queryset in pending():
+        while True:
+            count = purge_batch(queryset, batch_size)
+            total += count
+            if count and progress:
+                progress(total)
+            if count < batch_size:
+                break
+            if pause:
+                time.sleep(pause)
+
+    return total
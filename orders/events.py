@@ -0,0 +1,137 @@
+import json
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+
+from .models import Order, OrderEvent
+
+# Campos de Order cuyos cambios se registran
+FIELDS = ['customer_id', 'product_id', 'amount', 'price', 'deadline',
+          'delivered', 'observation', 'bill']
+
+# Nombre de cada campo en el historial
+LABELS = {
+    'customer_id': 'Cliente', 'product_id': 'Producto', 'amount': 'Cantidad',
+    'price': 'Precio', 'deadline': 'Entrega', 'delivered': 'Entregado',
+    'observation': 'Observación', 'bill': 'Factura',
+}
+
+_local = threading.local()
+
+
+def snapshot(order):
+    """
+    Obtiene los valores de un pedido que se comparan entre eventos,
+    convertidos a su tipo aunque vengan como texto de un formulario.
+
+    Args:
+        order (Order): El pedido.
+
+    Returns:
+        dict: El valor de cada campo de FIELDS.
+    """
+
+    return {
+        name: Order._meta.get_field(name).to_python(getattr(order, name))
+        for name in FIELDS
+    }
+
+
+def diff(before, after):
+    """
+    Compara dos estados de un pedido.
+
+    Args:
+        before (dict): Valores anteriores; vacío para un pedido nuevo.
+        after (dict): Valores nuevos.
+
+    Returns:
+        dict: Campo a [valor anterior, valor nuevo] de los que cambiaron.
+    """
+
+    return {
+        name: [before.get(name), value]
+        for name, value in after.items() if before.get(name) != value
+    }
+
+
+def record(order_id, kind, changes=None):
+    """
+    Registra un evento de un pedido. Dentro de recording() se acumula para
+    insertarlo junto con los demás al final del bloque; fuera, se inserta en
+    el momento.
+
+    Args:
+        order_id (int): El ID del pedido.
+        kind (str): OrderEvent.CREATED, EDITED, DELIVERED, REOPENED o
+        DELETED.
+        changes (dict): Campo a [valor anterior, valor nuevo].
+    """
+
+    event = OrderEvent(
+        order_id=order_id, kind=kind,
+        changes=json.dumps(changes, default=str, ensure_ascii=False)
+        if changes else '')
+
+    buffer = getattr(_local, 'buffer', None)
+    if buffer is None:
+        event.save()
+    else:
+        buffer.append(event)
+
+
+def record_created(ids):
+    """
+    Registra la creación de pedidos insertados con bulk_create, que no
+    devuelve los ID (salvo en PostgreSQL).
+
+    Args:
+        ids (list): Los ID de los pedidos creados.
+    """
+
+    rows = Order.objects.filter(id__in=ids).order_by('id').values_list(
+        'id', *FIELDS)
+    for id, *values in rows:
+        record(id, OrderEvent.CREATED, diff({}, dict(zip(FIELDS, values))))
+
+
+@contextmanager
+def recording():
+    """
+    Bloque atómico que acumula los eventos registrados dentro y los inserta
+    con un solo bulk_create al final, en la misma transacción que los
+    cambios: si el bloque falla, los eventos se descartan con ellos.
+    """
+
+    previous = getattr(_local, 'buffer', None)
+    _local.buffer = []
+    try:
+        with transaction.atomic():
+            yield
+            OrderEvent.objects.bulk_create(_local.buffer, batch_size=500)
+    finally:
+        _local.buffer = previous
+
+
+def timeline(order_id):
+    """
+    Obtiene el historial de un pedido usando el índice (pedido, fecha).
+
+    Args:
+        order_id (int): El ID del pedido.
+
+    Returns:
+        list: Los eventos del más antiguo al más nuevo, con 'change_list':
+        tuplas (nombre del campo, valor anterior, valor nuevo).
+    """
+
+    events = list(OrderEvent.objects.filter(order_id=order_id).order_by(
+        'created_at', 'id'))
+    for event in events:
+        changes = json.loads(event.changes) if event.changes else {}
+        event.change_list = [
+            (LABELS.get(name, name), old, new)
+            for name, (old, new) in changes.items()]
+
+    return events
@@ -0,0 +1,108 @@
+import re
+
+from django.db import connection
+
+# Tablas que crecen con el historial y no deben recorrerse completas
+LARGE_TABLES = ['orders_order', 'orders_archivedorder', 'orders_orderevent',
+                'orders_searchentry']
+
+# Tablas que se listan por páginas (ORDER BY ... LIMIT): el orden tiene que
+# salir de un índice y no de ordenar todas las filas que cumplen el filtro.
+# Las coincidencias del índice de búsqueda sí se ordenan, acotadas por el
+# rango de cada palabra
+ORDERED_TABLES = ['orders_order', 'orders_archivedorder', 'orders_orderevent']
+
+
+def explain(sql, params=None, using=connection):
+    """
+    Obtiene el plan de ejecución de una consulta.
+
+    Args:
+        sql (str): La consulta SQL.
+        params (list): Parámetros de la consulta.
+        using (DatabaseWrapper): Conexión sobre la que se ejecuta.
+
+    Returns:
+        list: Una cadena por cada paso del plan.
+    """
+
+    if using.vendor == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    else:
+        prefix = 'EXPLAIN '
+
+    with using.cursor() as cursor:
+        cursor.execute(prefix + sql, params or [])
+        columns = [column[0] for column in cursor.description]
+        rows = cursor.fetchall()
+
+    if using.vendor == 'sqlite':
+        # (id, parent, notused, detail)
+        return [row[-1] for row in rows]
+
+    return [
+        ' '.join(f'{name}={value}' for name, value in zip(columns, row))
+        for row in rows
+    ]
+
+
+def _walks_primary_key(table, sql):
+    """
+    Indica si la consulta recorre la tabla en el orden de su clave primaria
+    hasta un LIMIT. SQLite lo muestra como "SCAN tabla", igual que un
+    recorrido completo, aunque lee el árbol de la clave primaria en orden y
+    se detiene al juntar las filas.
+    """
+
+    return bool(sql) and re.search(
+        rf'ORDER BY [`"]?{table}[`"]?\.[`"]?id[`"]? (ASC|DESC)\s+LIMIT',
+        sql) is not None
+
+
+def full_scans(plan, tables=LARGE_TABLES, sql=None):
+    """
+    Busca en un plan recorridos de las tablas grandes que no usan un índice.
+
+    Un LIMIT no alcanza para aceptar un recorrido: con un filtro selectivo
+    el motor puede leer casi toda la tabla antes de juntar las filas. Solo
+    se aceptan los pasos que buscan o recorren la tabla por un índice,
+    incluido el recorrido por la clave primaria de un ORDER BY id. Tampoco
+    se acepta que un listado de ORDERED_TABLES se ordene aparte (TEMP B-TREE
+    en SQLite, filesort en MySQL): aunque la búsqueda use un índice, el
+    motor lee y ordena todas las filas antes de aplicar el LIMIT.
+
+    Args:
+        plan (list): El plan devuelto por explain().
+        tables (list): Tablas que no deben recorrerse completas.
+        sql (str): La consulta del plan, para reconocer los recorridos por
+        la clave primaria en SQLite.
+
+    Returns:
+        list: Los pasos del plan que recorren una tabla grande sin índice o
+        que ordenan las filas de un listado.
+    """
+
+    sorts = [step for step in plan
+             if re.search(r'TEMP B-TREE FOR (RIGHT PART OF )?ORDER BY|'
+                          r'Using filesort', step)]
+    listed = [table for table in ORDERED_TABLES if table in tables and any(
+        re.search(rf'\b{table}\b', step) for step in plan)]
+
+    scans = []
+    for step in plan:
+        for table in tables:
+            # SQLite: "SCAN orders_order" o "SCAN TABLE orders_order", sin
+            # "USING INDEX", "USING COVERING INDEX" ni la clave primaria
+            if (re.match(rf'SCAN (TABLE )?{table}\b', step) and
+                    not re.search(r'USING (COVERING )?INDEX|PRIMARY KEY',
+                                  step) and
+                    (sorts or not _walks_primary_key(table, sql))):
+                scans.append(step)
+            # MySQL: "table=orders_order ... type=ALL"
+            elif f'table={table} ' in step and ' type=ALL ' in step:
+                scans.append(step)
+
+    if listed:
+        scans.extend(step for step in sorts if step not in scans)
+
+    return scans
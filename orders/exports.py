@@ -0,0 +1,272 @@
+import csv
+import zipfile
+from xml.sax.saxutils import escape
+
+from .datatables import apply_search
+from .models import ArchivedOrder, Customer, Order, Product
+
+# Filas leídas de la base de datos por consulta
+CHUNK_SIZE = 2000
+
+# Columnas de cada exportación: (encabezado, campo)
+ORDER_COLUMNS = [
+    ('N°', 'id'),
+    ('Producto', 'product__name'),
+    ('Nombre', 'customer__first_name'),
+    ('Apellido', 'customer__last_name'),
+    ('Cantidad', 'amount'),
+    ('Precio', 'price'),
+    ('P. Total', 'total'),
+    ('Entrega', 'deadline'),
+    ('Entregado', 'delivered'),
+    ('Factura', 'bill'),
+    ('Observación', 'observation'),
+]
+
+CUSTOMER_COLUMNS = [
+    ('id', 'id'),
+    ('Nombre', 'first_name'),
+    ('Apellido', 'last_name'),
+    ('Numero', 'phone_number'),
+    ('Correo', 'email'),
+    ('Documento', 'document'),
+    ('Dirección', 'address'),
+]
+
+PRODUCT_COLUMNS = [
+    ('id', 'id'),
+    ('Nombre', 'name'),
+    ('Descripción', 'description'),
+]
+
+
+def order_queryset(params):
+    """
+    Construye el queryset de pedidos a exportar con los mismos filtros que
+    las tablas de balance.
+
+    Args:
+        params (QueryDict): Parámetros de la solicitud: 'estado'
+        ('por_entregar' o 'entregados'), 'buscar', 'min_total' y 'archivo'
+        ('1' para exportar los pedidos archivados).
+
+    Returns:
+        QuerySet: Los pedidos filtrados y anotados con 'total'.
+    """
+
+    model = ArchivedOrder if params.get('archivo') == '1' else Order
+    queryset = model.objects.visible().with_total()
+
+    status = params.get('estado')
+    if status == 'por_entregar':
+        queryset = queryset.filter(delivered__isnull=True)
+    elif status == 'entregados':
+        queryset = queryset.filter(delivered__isnull=False)
+
+    try:
+        min_total = int(params['min_total'])
+    except (KeyError, ValueError):
+        min_total = None
+
+    return apply_search(queryset, params.get('buscar', ''), min_total)
+
+
+# Exportaciones disponibles: nombre -> (función que arma el queryset, columnas)
+DATASETS = {
+    'pedidos': (order_queryset, ORDER_COLUMNS),
+    'clientes': (lambda params: Customer.objects.visible(), CUSTOMER_COLUMNS),
+    'productos': (lambda params: Product.objects.visible(), PRODUCT_COLUMNS),
+}
+
+
+def iter_rows(queryset, fields, chunk_size=CHUNK_SIZE):
+    """
+    Recorre el queryset por bloques ordenados por id, de modo que nunca haya
+    más de un bloque en memoria sin importar el tamaño de la exportación.
+
+    Args:
+        queryset (QuerySet): Las filas a exportar.
+        fields (list): Campos a leer de cada fila.
+        chunk_size (int): Filas leídas por consulta.
+
+    Yields:
+        tuple: Los valores de cada fila.
+    """
+
+    last_id = 0
+    while True:
+        chunk = list(
+            queryset.filter(id__gt=last_id)
+            .order_by('id')
+            .values_list(*fields)[:chunk_size]
+        )
+        if not chunk:
+            return
+
+        yield from chunk
+        last_id = chunk[-1][0]
+
+
+class Echo:
+    """
+    Objeto con un método write() que devuelve lo que recibe, para que
+    csv.writer genere cada línea sin acumularla.
+    """
+
+    def write(self, value):
+        return value
+
+
+def csv_stream(headers, rows):
+    """
+    Genera un CSV línea por línea.
+
+    Args:
+        headers (list): Encabezados de las columnas.
+        rows (iterable): Valores de cada fila.
+
+    Yields:
+        str: Cada línea del archivo.
+    """
+
+    writer = csv.writer(Echo())
+
+    # Marca BOM para que Excel reconozca los acentos
+    yield '\ufeff' + writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow(['' if value is None else value
+                               for value in row])
+
+
+class StreamBuffer:
+    """
+    Destino de escritura sin posición para zipfile: guarda los bytes
+    escritos hasta que el generador los entrega.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        self.size = 0
+        return data
+
+
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/'
+        'content-types">'
+        '<Default Extension="rels" ContentType="application/'
+        'vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/'
+        'vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="'
+        'application/vnd.openxmlformats-officedocument.spreadsheetml.'
+        'worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/'
+        '2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/'
+        'officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/'
+        '2006/main" xmlns:r="http://schemas.openxmlformats.org/'
+        'officeDocument/2006/relationships">'
+        '<sheets><sheet name="Datos" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/'
+        '2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/'
+        'officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_row(values):
+    """
+    Convierte una fila en XML de SpreadsheetML.
+
+    Args:
+        values (iterable): Valores de la fila.
+
+    Returns:
+        str: El elemento <row> con una celda por valor.
+    """
+
+    cells = []
+    for value in values:
+        if value is None:
+            cells.append('<c/>')
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            cells.append(f'<c><v>{value}</v></c>')
+        else:
+            cells.append(
+                f'<c t="inlineStr"><is><t>{escape(str(value))}</t></is></c>')
+
+    return f'<row>{"".join(cells)}</row>'
+
+
+def xlsx_stream(headers, rows, flush_size=64 * 1024):
+    """
+    Genera un archivo XLSX mientras se leen las filas. La hoja se escribe
+    dentro del ZIP como un flujo comprimido, así que solo se mantiene en
+    memoria lo que falta entregar al cliente.
+
+    Args:
+        headers (list): Encabezados de las columnas.
+        rows (iterable): Valores de cada fila.
+        flush_size (int): Bytes acumulados antes de entregar un bloque.
+
+    Yields:
+        bytes: Los bloques del archivo.
+    """
+
+    buffer = StreamBuffer()
+
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_PARTS.items():
+            archive.writestr(name, content)
+        yield buffer.pop()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w',
+                          force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/'
+                'spreadsheetml/2006/main"><sheetData>'
+                + _xlsx_row(headers)
+            ).encode())
+
+            for row in rows:
+                sheet.write(_xlsx_row(row).encode())
+                if buffer.size >= flush_size:
+                    yield buffer.pop()
+
+            sheet.write(b'</sheetData></worksheet>')
+
+    yield buffer.pop()
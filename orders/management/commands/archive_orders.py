@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from orders import archive
+
+
+class Command(BaseCommand):
+    help = ('Mueve a la tabla de archivo los pedidos entregados hace más de '
+            'ARCHIVE_AFTER_DAYS días, por bloques en transacciones cortas.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.ARCHIVE_AFTER_DAYS,
+            help='Antigüedad mínima de la entrega, en días.')
+        parser.add_argument(
+            '--batch-size', type=int, default=archive.BATCH_SIZE,
+            help='Pedidos movidos por transacción.')
+        parser.add_argument(
+            '--pause', type=float, default=0.1,
+            help='Segundos de espera entre bloques.')
+
+    def handle(self, *args, **options):
+        """
+        Archiva por bloques hasta que no quedan pedidos más antiguos que el
+        horizonte. Se puede ejecutar periódicamente o interrumpir y repetir.
+        """
+
+        before = archive.horizon(options['days'])
+
+        def progress(count):
+            if options['verbosity'] >= 2:
+                self.stdout.write(f'{count} pedidos archivados')
+
+        count = archive.archive_orders(
+            before, options['batch_size'], options['pause'], progress)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{count} pedidos entregados antes del {before:%Y-%m-%d} '
+            f'archivados'))
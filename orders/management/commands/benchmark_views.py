@@ -0,0 +1,200 @@
+import json
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from orders import urls
+from orders.exports import DATASETS
+from orders.models import Customer, Order, Product
+from orders.profiling import QueryTimer, TemplateTimer
+
+# Datos enviados por POST a las vistas que procesan formularios
+ORDER_FORM = {
+    'observation': 'Medición', 'amount': '2', 'price': '15000', 'bill': '',
+}
+CUSTOMER_FORM = {
+    'first_name': 'Medición', 'last_name': 'Prueba',
+    'phone_number': '0981000000', 'email': '', 'document': '', 'address': '',
+}
+PRODUCT_FORM = {'name': 'Medición', 'description': ''}
+
+
+class Command(BaseCommand):
+    help = ('Mide cada URL de orders con el cliente de pruebas sobre la base '
+            'de datos configurada y guarda un reporte JSON comparable entre '
+            'versiones.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default='benchmark.json',
+            help='Archivo donde se guarda el reporte.')
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Veces que se solicita cada URL; se informa la mediana.')
+
+    def samples(self):
+        """
+        Busca un pedido, un cliente y un producto para las URLs con ID.
+
+        Returns:
+            dict: El ID de ejemplo según el prefijo de la URL.
+
+        Raises:
+            CommandError: Si la base de datos no tiene pedidos.
+        """
+
+        order = Order.objects.order_by('-id').first()
+        if order is None:
+            raise CommandError(
+                'No hay pedidos; crear datos con "manage.py generate_data"')
+
+        return {
+            'pedido': order,
+            'clientes': Customer.objects.order_by('-id').first(),
+            'productos': Product.objects.order_by('-id').first(),
+        }
+
+    def requests(self):
+        """
+        Arma una solicitud por cada URL de orders/urls.py, con IDs de la base
+        de datos y datos de formulario válidos para las que usan POST.
+
+        Returns:
+            list: Tuplas (nombre, método, url, datos).
+        """
+
+        samples = self.samples()
+        order = samples['pedido']
+        forms = {
+            'process_order': ORDER_FORM,
+            'process_edit': ORDER_FORM,
+            'process_customer': CUSTOMER_FORM,
+            'customer_edit_process': CUSTOMER_FORM,
+            'process_product': PRODUCT_FORM,
+            'product_edit_process': PRODUCT_FORM,
+            'bulk_orders': {
+                'accion': 'entregar',
+                'ids': [str(id) for id in Order.objects.order_by(
+                    '-id').values_list('id', flat=True)[:100]],
+            },
+        }
+        for name in ('process_order', 'process_edit'):
+            forms[name] = dict(
+                forms[name], product_id=str(order.product_id),
+                customer_id=str(order.customer_id),
+                deadline=timezone.localdate().isoformat())
+
+        requests = []
+        for pattern in urls.urlpatterns:
+            converters = pattern.pattern.converters
+            if 'dataset' in converters:
+                kwargs_list = [{'dataset': name} for name in DATASETS]
+            elif 'id' in converters:
+                prefix = str(pattern.pattern).split('/')[0]
+                kwargs_list = [{'id': samples[prefix].id}]
+            else:
+                kwargs_list = [{}]
+
+            for kwargs in kwargs_list:
+                url = reverse(pattern.name, kwargs=kwargs)
+                data = forms.get(pattern.name)
+                requests.append((pattern.name, 'POST' if data else 'GET',
+                                 url, data or {}))
+
+        return requests
+
+    def measure(self, method, url, data):
+        """
+        Ejecuta una solicitud dentro de una transacción que se revierte, para
+        que las vistas que modifican datos no cambien la base de datos. Cada
+        solicitud usa un cliente nuevo, sin los mensajes ni las cookies de
+        las anteriores.
+
+        Returns:
+            dict: Estado, tiempos en milisegundos, consultas y bytes.
+        """
+
+        host = (settings.ALLOWED_HOSTS or ['localhost'])[0].lstrip('.')
+        client = Client(HTTP_HOST=host)
+        queries = QueryTimer()
+        start = time.perf_counter()
+
+        with transaction.atomic():
+            with connection.execute_wrapper(queries), \
+                    TemplateTimer() as templates:
+                try:
+                    if method == 'POST':
+                        response = client.post(url, data)
+                    else:
+                        response = client.get(url, data)
+                    status = response.status_code
+                    if response.streaming:
+                        size = sum(len(chunk)
+                                   for chunk in response.streaming_content)
+                    else:
+                        size = len(response.content)
+                except Exception as error:
+                    self.stderr.write(f'{method} {url}: {error!r}')
+                    status, size = 500, 0
+            transaction.set_rollback(True)
+
+        return {
+            'status': status,
+            'wall_ms': (time.perf_counter() - start) * 1000,
+            'sql_count': queries.count,
+            'sql_ms': queries.duration * 1000,
+            'template_ms': templates.duration * 1000,
+            'bytes': size,
+        }
+
+    def handle(self, *args, **options):
+        """
+        Mide todas las URLs y guarda el reporte ordenado por nombre, para
+        compararlo con diff entre commits.
+        """
+
+        repeat = max(options['repeat'], 1)
+
+        results = []
+        for name, method, url, data in self.requests():
+            runs = [self.measure(method, url, data)
+                    for i in range(repeat)]
+            result = {'name': name, 'method': method, 'url': url,
+                      'status': runs[-1]['status']}
+            for metric in ('wall_ms', 'sql_count', 'sql_ms', 'template_ms',
+                           'bytes'):
+                value = statistics.median(run[metric] for run in runs)
+                result[metric] = round(value, 2)
+            # La primera solicitud puede no encontrar las páginas en caché
+            result['first_wall_ms'] = round(runs[0]['wall_ms'], 2)
+            results.append(result)
+
+            if options['verbosity'] >= 1:
+                self.stdout.write(
+                    f'{result["status"]} {method} {url} '
+                    f'{result["wall_ms"]} ms, {result["sql_count"]} consultas')
+
+        report = {
+            'database': connection.vendor,
+            'repeat': repeat,
+            'rows': {
+                'orders': Order.objects.count(),
+                'customers': Customer.objects.count(),
+                'products': Product.objects.count(),
+            },
+            'results': sorted(results, key=lambda r: (r['name'], r['url'])),
+        }
+
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2, ensure_ascii=False,
+                      sort_keys=True)
+            file.write('\n')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Reporte guardado en {options["output"]}'))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from orders import assets
+
+
+class Command(BaseCommand):
+    help = ('Une y minifica el CSS y JS de static en paquetes con el hash de '
+            'su contenido en el nombre, con versiones gzip y brotli, y '
+            'escribe el manifiesto que usan las plantillas.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default=None,
+            help='Carpeta de salida; por defecto ASSET_BUNDLES_DIR.')
+
+    def handle(self, *args, **options):
+        """
+        Genera los paquetes y muestra el archivo de cada uno.
+        """
+
+        manifest = assets.build(options['output'])
+
+        for name, hashed in sorted(manifest.items()):
+            self.stdout.write(f'{name} -> {hashed}')
+        if assets.brotli is None:
+            self.stdout.write(self.style.WARNING(
+                'El paquete brotli no está instalado: solo se generaron '
+                'las versiones .gz'))
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(manifest)} paquetes generados'))
@@ -0,0 +1,196 @@
+import tempfile
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from orders import rollups
+from orders.explain import explain, full_scans
+from orders.models import Customer, Order, Product
+
+# Caché que no guarda nada, para que cada solicitud ejecute sus consultas
+NO_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+
+
+class Command(BaseCommand):
+    help = ('Ejecuta EXPLAIN sobre cada consulta que hacen las vistas de '
+            'orders y falla si alguna recorre sin índice una tabla grande.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--orders', type=int, default=20000,
+            help='Cantidad de pedidos de prueba a crear (0 para usar los '
+                 'datos existentes).')
+
+    def seed(self, count):
+        """
+        Crea pedidos de prueba repartidos entre clientes y productos.
+
+        Args:
+            count (int): Cantidad de pedidos a crear.
+
+        Returns:
+            Order: Uno de los pedidos creados, para las vistas de detalle.
+        """
+
+        customers = Customer.objects.bulk_create([
+            Customer(first_name=f'Cliente{i}', phone_number='0981000000')
+            for i in range(max(count // 20, 1))
+        ])
+        products = Product.objects.bulk_create([
+            Product(name=f'Producto{i}') for i in range(50)
+        ])
+        # bulk_create solo devuelve los id en PostgreSQL
+        customers = list(Customer.objects.order_by('-id')[:len(customers)])
+        products = list(Product.objects.order_by('-id')[:len(products)])
+
+        Order.objects.bulk_create([
+            Order(
+                customer=customers[i % len(customers)],
+                product=products[i % len(products)],
+                amount=(i % 5) + 1,
+                price=1000 + (i % 7) * 500,
+                deadline=date(2020, 1, 1) + timedelta(days=i % 1500),
+                delivered=(date(2020, 1, 1) + timedelta(days=i % 1500)
+                           if i % 3 else None),
+                bill=f'F-{i:07d}',
+            )
+            for i in range(count)
+        ], batch_size=500)
+        rollups.rebuild_rollups()
+
+        return Order.objects.order_by('-id').first()
+
+    def requests(self, order):
+        """
+        Solicitudes GET que cubren las consultas de orders/views.py.
+
+        Args:
+            order (Order): Pedido usado en las vistas de detalle y edición.
+
+        Returns:
+            list: Tuplas (url, parámetros).
+        """
+
+        by_deadline = {'order[0][column]': 6, 'order[0][dir]': 'asc'}
+        # La búsqueda de DataTables compara partes de textos (icontains) y
+        # no puede usar un índice: sobre todos los pedidos los recorre
+        # completos. Se revisa en la tabla por entregar, filtrada por estado
+        searching = {'search[value]': 'F-00001'}
+        archived = {'archivo': '1'}
+
+        return [
+            (reverse('index'), {}),
+            (reverse('index_data'), {}),
+            (reverse('index_data'), by_deadline),
+            (reverse('index_data'), archived),
+            (reverse('to_deliver'), {}),
+            (reverse('to_deliver_data'), {}),
+            (reverse('to_deliver_data'), by_deadline),
+            (reverse('to_deliver_data'), searching),
+            (reverse('delivered'), {}),
+            (reverse('delivered_data'), {}),
+            (reverse('delivered_data'), by_deadline),
+            (reverse('delivered_data'), archived),
+            (reverse('summary'), {}),
+            (reverse('agenda'), {'mes': '2021-03'}),
+            (reverse('overdue'), {}),
+            (reverse('global_search'), {'q': 'Cliente1'}),
+            (reverse('global_search'), {'q': 'F-00001'}),
+            (reverse('customer_search'), {'q': 'Cliente1'}),
+            (reverse('product_search'), {'q': 'Producto1'}),
+            (reverse('export', args=['pedidos']), {}),
+            (reverse('export', args=['pedidos']),
+             {'estado': 'entregados', 'buscar': 'F-00001'}),
+            (reverse('export', args=['pedidos']),
+             {'formato': 'xlsx', 'min_total': 3000}),
+            (reverse('export', args=['clientes']), {}),
+            (reverse('export', args=['productos']), {}),
+            (reverse('balance_pdf'), {'estado': 'por_entregar'}),
+            (reverse('order_pdf', args=[order.id]), {}),
+            (reverse('order_form'), {}),
+            (reverse('edit_order_form', args=[order.id]), {}),
+            (reverse('order_detail', args=[order.id]), {}),
+            (reverse('customers'), {}),
+            (reverse('products'), {}),
+        ]
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+
+        # Las páginas y los PDF de los pedidos de prueba no se guardan en
+        # las cachés compartidas: se servirían a los usuarios después del
+        # rollback (que no cambia la versión de las tablas) y la próxima
+        # revisión las leería de la caché sin ejecutar sus consultas
+        with tempfile.TemporaryDirectory() as pdf_dir, \
+                override_settings(CACHES=NO_CACHE, PDF_CACHE_DIR=pdf_dir), \
+                transaction.atomic():
+            if options['orders']:
+                order = self.seed(options['orders'])
+            else:
+                order = Order.objects.order_by('-id').first()
+            if order is None:
+                raise CommandError('No hay pedidos para revisar')
+
+            failures = self.check_plans(order)
+
+            # Los pedidos de prueba no se guardan
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(
+                f'{failures} consultas recorren sin índice una tabla grande')
+
+        self.stdout.write(self.style.SUCCESS('Ningún recorrido completo'))
+
+    def check_plans(self, order):
+        """
+        Ejecuta las solicitudes, captura sus consultas y revisa sus planes.
+
+        Args:
+            order (Order): Pedido usado en las vistas de detalle y edición.
+
+        Returns:
+            int: Cantidad de consultas con recorridos completos.
+        """
+
+        statements = []
+
+        def capture(execute, sql, params, many, context):
+            statements.append((sql, params))
+            return execute(sql, params, many, context)
+
+        host = (settings.ALLOWED_HOSTS or ['localhost'])[0].lstrip('.')
+        client = Client(HTTP_HOST=host)
+        failures = 0
+
+        for url, params in self.requests(order):
+            statements.clear()
+            with connection.execute_wrapper(capture):
+                response = client.get(url, params)
+                # Las exportaciones consultan a medida que se envían
+                if response.streaming:
+                    for chunk in response.streaming_content:
+                        pass
+
+            for sql, sql_params in statements:
+                if not sql.lstrip().upper().startswith('SELECT'):
+                    continue
+                plan = explain(sql, sql_params)
+                scans = full_scans(plan, sql=sql)
+                if scans:
+                    failures += 1
+                    self.stdout.write(self.style.ERROR(f'{url} {params}'))
+                    self.stdout.write(f'  {sql}')
+                    for step in scans:
+                        self.stdout.write(f'  -> {step}')
+                elif self.verbosity >= 2:
+                    self.stdout.write(f'{url}: {" | ".join(plan)}')
+
+        return failures
+
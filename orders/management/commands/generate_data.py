@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders import synthetic
+
+
+class Command(BaseCommand):
+    help = ('Crea clientes, productos y pedidos de prueba con valores '
+            'realistas para medir las vistas con volúmenes de producción.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--orders', type=int, default=1000,
+            help='Cantidad de pedidos a crear (de 1000 a 1000000).')
+        parser.add_argument(
+            '--customers', type=int,
+            help='Cantidad de clientes (por defecto uno cada 20 pedidos).')
+        parser.add_argument(
+            '--products', type=int, default=60,
+            help='Cantidad de productos.')
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Semilla para generar siempre los mismos datos.')
+        parser.add_argument(
+            '--batch-size', type=int, default=synthetic.BATCH_SIZE,
+            help='Filas creadas por transacción.')
+
+    def handle(self, *args, **options):
+        """
+        Genera los datos mostrando el avance de los pedidos creados.
+        """
+
+        orders = options['orders']
+        customers = options['customers']
+        if customers is None:
+            customers = max(orders // 20, 1)
+
+        def progress(created):
+            if options['verbosity'] >= 1:
+                self.stdout.write(f'{created}/{orders} pedidos')
+
+        start = time.perf_counter()
+        try:
+            synthetic.generate(
+                customers, options['products'], orders,
+                seed=options['seed'], batch_size=options['batch_size'],
+                progress=progress)
+        except ValueError as error:
+            raise CommandError(str(error))
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{customers} clientes, {options["products"]} productos y '
+            f'{orders} pedidos creados en {elapsed:.1f} s'))
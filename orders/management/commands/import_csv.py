@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.imports import BATCH_SIZE, IMPORTERS, import_csv
+
+
+class Command(BaseCommand):
+    help = ('Importa clientes, productos o pedidos desde un archivo CSV, '
+            'validando e insertando por bloques.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(IMPORTERS),
+                            help='Tipo de datos del archivo.')
+        parser.add_argument('path', help='Ruta del archivo CSV.')
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Filas validadas e insertadas por transacción.')
+
+    def handle(self, *args, **options):
+        """
+        Importa el archivo y muestra los errores de cada fila rechazada.
+        """
+
+        try:
+            with open(options['path'], encoding='utf-8-sig',
+                      newline='') as file:
+                report = import_csv(options['kind'], file,
+                                    options['batch_size'])
+        except OSError as error:
+            raise CommandError(f'No se pudo leer el archivo: {error}')
+
+        for line, errors in report.errors:
+            self.stdout.write(f'Línea {line}: {", ".join(errors)}')
+        if report.failed > len(report.errors):
+            self.stdout.write(
+                f'... y {report.failed - len(report.errors)} filas más '
+                'con errores')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{report.created} filas importadas, {report.failed} con errores'))
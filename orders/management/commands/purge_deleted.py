@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from orders import deletion
+
+
+class Command(BaseCommand):
+    help = ('Borra por bloques los clientes y productos eliminados y sus '
+            'pedidos, en transacciones cortas.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=deletion.BATCH_SIZE,
+            help='Filas borradas por transacción.')
+        parser.add_argument(
+            '--pause', type=float, default=0.1,
+            help='Segundos de espera entre bloques.')
+
+    def handle(self, *args, **options):
+        """
+        Purga por bloques hasta que no quedan filas eliminadas. Se puede
+        ejecutar periódicamente o interrumpir y repetir.
+        """
+
+        def progress(count):
+            if options['verbosity'] >= 2:
+                self.stdout.write(f'{count} filas borradas')
+
+        count = deletion.purge_deleted(
+            options['batch_size'], options['pause'], progress)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{count} clientes, productos y pedidos eliminados purgados'))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from orders import rollups
+
+
+class Command(BaseCommand):
+    help = ('Vuelve a generar las tablas de resumen de balances a partir de '
+            'los pedidos, o comprueba que no tengan diferencias.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Solo comprueba las diferencias, sin modificar los resúmenes.')
+
+    def handle(self, *args, **options):
+        """
+        Comprueba o vuelve a generar los resúmenes.
+
+        Con --check termina con error si algún resumen no coincide con los
+        pedidos, para poder usarlo en tareas programadas.
+        """
+
+        if options['check']:
+            drift = rollups.find_drift()
+            for table, key, stored, expected in drift:
+                self.stdout.write(
+                    f'{table} {key}: guardado {stored}, esperado {expected}')
+            if drift:
+                raise CommandError(
+                    f'{len(drift)} resúmenes no coinciden con los pedidos')
+            self.stdout.write(self.style.SUCCESS('Resúmenes al día'))
+            return
+
+        with transaction.atomic():
+            rollups.rebuild_rollups()
+
+        self.stdout.write(self.style.SUCCESS('Resúmenes regenerados'))
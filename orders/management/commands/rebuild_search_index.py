@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from orders import search
+from orders.models import SearchEntry
+
+
+class Command(BaseCommand):
+    help = ('Vuelve a generar el índice de la búsqueda global a partir de '
+            'los pedidos, clientes y productos.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=search.BATCH_SIZE,
+            help='Objetos indexados por consulta.')
+
+    def handle(self, *args, **options):
+        """
+        Vacía el índice y lo vuelve a llenar por bloques, en una transacción
+        para que la búsqueda no quede a medias mientras tanto.
+        """
+
+        def progress(kind, count):
+            if options['verbosity'] >= 2:
+                self.stdout.write(f'{kind}: {count}')
+
+        start = time.perf_counter()
+        with transaction.atomic():
+            counts = search.rebuild(options['batch_size'], progress)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{counts[SearchEntry.ORDER]} pedidos, '
+            f'{counts[SearchEntry.ARCHIVED_ORDER]} pedidos archivados, '
+            f'{counts[SearchEntry.CUSTOMER]} clientes y '
+            f'{counts[SearchEntry.PRODUCT]} productos indexados en '
+            f'{time.perf_counter() - start:.1f} s'))
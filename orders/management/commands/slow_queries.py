@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from orders.models import SlowQuery
+from orders.slowlog import top_offenders
+
+
+class Command(BaseCommand):
+    help = ('Muestra las consultas lentas guardadas, agrupadas por SQL '
+            'normalizado, de la que más tiempo suma a la que menos.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=10,
+            help='Cantidad de consultas a mostrar.')
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Borra las consultas guardadas después de mostrarlas.')
+
+    def handle(self, *args, **options):
+        offenders = top_offenders(options['limit'])
+        if not offenders:
+            self.stdout.write('No hay consultas lentas guardadas')
+
+        for rank, offender in enumerate(offenders, 1):
+            sample = offender['sample']
+            self.stdout.write(self.style.WARNING(
+                f'{rank}. {offender["total"] * 1000:.1f} ms en '
+                f'{offender["count"]} consultas '
+                f'(máx. {offender["slowest"] * 1000:.1f} ms) desde '
+                f'{", ".join(offender["views"])}'))
+            self.stdout.write(f'   {sample.statement}')
+            self.stdout.write(f'   Parámetros: {sample.params}')
+            for step in sample.plan.splitlines():
+                self.stdout.write(f'   -> {step}')
+
+        if options['clear']:
+            SlowQuery.objects.all().delete()
+            self.stdout.write(self.style.SUCCESS('Consultas lentas borradas'))
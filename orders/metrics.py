@@ -0,0 +1,376 @@
+import atexit
+import json
+import os
+import re
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+# Límites de los intervalos del histograma de latencia, en segundos
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Cuantiles calculados para cada URL a partir de los histogramas
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Segundos mínimos entre dos escrituras del archivo de cada proceso
+FLUSH_INTERVAL = 1.0
+
+# Archivo con la suma de los procesos que ya terminaron
+AGGREGATE = 'aggregate.json'
+
+# Carpeta que crea el proceso que está compactando; si tiene más de
+# STALE_LOCK segundos, quedó de un proceso que murió a mitad
+COMPACT_LOCK = 'compact.lock'
+STALE_LOCK = 60
+
+# Archivo de un proceso: '<pid>-<sufijo>.json' o su temporal
+_PROCESS_FILE = re.compile(r'(\d+)-[0-9a-f]+\.json(\.tmp)?$')
+
+_registry = None
+_lock = threading.Lock()
+
+
+def _empty():
+    return {'count': 0, 'sum': 0.0, 'buckets': [0] * len(BUCKETS),
+            'queries': 0, 'db': 0.0}
+
+
+def _add(merged, series):
+    """
+    Suma unas series a las acumuladas.
+
+    Args:
+        merged (dict): Series acumuladas, que se modifican.
+        series (dict): Series a sumar.
+    """
+
+    for key, values in series.items():
+        total = merged.setdefault(key, _empty())
+        for field in ('count', 'sum', 'queries', 'db'):
+            total[field] += values[field]
+        for index, value in enumerate(values['buckets']):
+            total['buckets'][index] += value
+
+
+def _read(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _write(path, series):
+    # Se escribe en un archivo temporal y se renombra, para que nunca se
+    # lea a medias
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w') as file:
+        json.dump(series, file)
+    os.replace(temporary, path)
+
+
+def _alive(pid):
+    """
+    Indica si un proceso de esta máquina sigue en ejecución.
+    """
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Existe, pero es de otro usuario
+        return True
+    return True
+
+
+class Registry:
+    """
+    Métricas acumuladas por un proceso. Cada proceso escribe las suyas en
+    un archivo propio dentro de METRICS_DIR y el endpoint /metrics suma los
+    archivos de todos, de modo que funciona con varios workers WSGI sin
+    bloqueos entre procesos. Los archivos de los procesos que terminaron se
+    pasan a AGGREGATE al iniciar y al salir cada proceso (ver compact()).
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.pid = os.getpid()
+        # El sufijo evita pisar el archivo de un proceso anterior con el
+        # mismo PID
+        self.path = os.path.join(
+            directory, f'{self.pid}-{uuid.uuid4().hex[:8]}.json')
+        self.series = {}
+        self.last_flush = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, url_name, status, duration, queries, db_duration):
+        """
+        Registra una solicitud.
+
+        Args:
+            url_name (str): Nombre de la URL resuelta.
+            status (int): Código de estado de la respuesta.
+            duration (float): Duración total en segundos.
+            queries (int): Consultas SQL ejecutadas.
+            db_duration (float): Segundos en la base de datos.
+        """
+
+        key = f'{url_name}|{status}'
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = _empty()
+            series['count'] += 1
+            series['sum'] += duration
+            series['queries'] += queries
+            series['db'] += db_duration
+            for index, limit in enumerate(BUCKETS):
+                if duration <= limit:
+                    series['buckets'][index] += 1
+                    break
+
+        if time.monotonic() - self.last_flush >= FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        """
+        Escribe las métricas del proceso en su archivo.
+        """
+
+        with self.lock:
+            series = dict(self.series)
+            self.last_flush = time.monotonic()
+
+        os.makedirs(self.directory, exist_ok=True)
+        _write(self.path, series)
+
+    def close(self):
+        """
+        Al salir el proceso, pasa sus métricas a AGGREGATE. Los hijos de un
+        fork heredan el registro del padre y no deben escribirlo.
+        """
+
+        if os.getpid() != self.pid or not os.path.isdir(self.directory):
+            return
+        if self.series:
+            self.flush()
+        compact(self.directory, own=self.path)
+
+
+def compact(directory, own=None):
+    """
+    Suma a AGGREGATE los archivos de los procesos que ya no existen y los
+    borra, para que la carpeta y el costo de /metrics no crezcan con cada
+    reinicio de los workers. Un solo proceso compacta a la vez; si otro lo
+    está haciendo, no hace nada.
+
+    Args:
+        directory (str): Directorio de los archivos.
+        own (str): Archivo del proceso que llama, que se compacta aunque el
+        proceso siga en ejecución (al salir).
+
+    Returns:
+        int: La cantidad de archivos compactados.
+    """
+
+    lock = os.path.join(directory, COMPACT_LOCK)
+    try:
+        os.mkdir(lock)
+    except FileNotFoundError:
+        return 0
+    except FileExistsError:
+        try:
+            if time.time() - os.path.getmtime(lock) < STALE_LOCK:
+                return 0
+        except FileNotFoundError:
+            return 0
+        # Otro proceso puede liberar el bloqueo viejo al mismo tiempo
+        try:
+            os.rmdir(lock)
+            os.mkdir(lock)
+        except (FileNotFoundError, FileExistsError):
+            return 0
+
+    try:
+        dead = []
+        for name in os.listdir(directory):
+            match = _PROCESS_FILE.match(name)
+            path = os.path.join(directory, name)
+            if not match or (path != own and _alive(int(match.group(1)))):
+                continue
+            if match.group(2):
+                # Temporal de un proceso que murió a mitad de escribir
+                os.remove(path)
+            else:
+                dead.append(path)
+
+        if not dead:
+            return 0
+
+        aggregate = os.path.join(directory, AGGREGATE)
+        merged = _read(aggregate) or {}
+        for path in dead:
+            _add(merged, _read(path) or {})
+        _write(aggregate, merged)
+        for path in dead:
+            os.remove(path)
+
+        return len(dead)
+    finally:
+        os.rmdir(lock)
+
+
+def get_registry():
+    """
+    Devuelve el registro del proceso actual, creando uno nuevo después de
+    un fork o si cambió METRICS_DIR. Al crearlo se compactan los archivos de
+    los procesos que terminaron.
+
+    Returns:
+        Registry: El registro del proceso.
+    """
+
+    global _registry
+
+    directory = settings.METRICS_DIR
+    with _lock:
+        if (_registry is None or _registry.pid != os.getpid()
+                or _registry.directory != directory):
+            if _registry is not None:
+                atexit.unregister(_registry.close)
+            _registry = Registry(directory)
+            compact(directory)
+            atexit.register(_registry.close)
+
+    return _registry
+
+
+def collect(directory):
+    """
+    Suma las métricas de los archivos de todos los procesos y de AGGREGATE.
+
+    Args:
+        directory (str): Directorio de los archivos.
+
+    Returns:
+        dict: Las series sumadas por URL y estado.
+    """
+
+    merged = {}
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return merged
+
+    for name in names:
+        if not name.endswith('.json'):
+            continue
+        series = _read(os.path.join(directory, name))
+        if series is not None:
+            _add(merged, series)
+
+    return merged
+
+
+def quantile(buckets, count, q):
+    """
+    Estima un cuantil de un histograma interpolando dentro del intervalo,
+    como histogram_quantile() de Prometheus.
+
+    Args:
+        buckets (list): Cantidad de solicitudes en cada intervalo.
+        count (int): Cantidad total de solicitudes.
+        q (float): El cuantil, entre 0 y 1.
+
+    Returns:
+        float: La latencia estimada en segundos.
+    """
+
+    rank = q * count
+    seen = 0
+    lower = 0.0
+    for limit, value in zip(BUCKETS, buckets):
+        if value and seen + value >= rank:
+            return lower + (limit - lower) * (rank - seen) / value
+        seen += value
+        lower = limit
+
+    # Por encima del último límite
+    return BUCKETS[-1]
+
+
+def _labels(**labels):
+    escaped = (
+        (name, str(value).replace('\\', r'\\').replace('"', r'\"')
+         .replace('\n', r'\n'))
+        for name, value in labels.items()
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def render(series):
+    """
+    Genera el formato de texto de Prometheus.
+
+    Args:
+        series (dict): Series sumadas por collect().
+
+    Returns:
+        str: Las métricas en formato de exposición de Prometheus.
+    """
+
+    name = 'orders_http_request_duration_seconds'
+    lines = [
+        f'# HELP {name} Duración de las solicitudes por URL y estado.',
+        f'# TYPE {name} histogram',
+    ]
+    by_url = {}
+    for key in sorted(series):
+        url_name, status = key.rsplit('|', 1)
+        values = series[key]
+
+        cumulative = 0
+        for limit, value in zip(BUCKETS, values['buckets']):
+            cumulative += value
+            labels = _labels(url_name=url_name, status=status, le=limit)
+            lines.append(f'{name}_bucket{labels} {cumulative}')
+        labels = _labels(url_name=url_name, status=status)
+        lines.append(
+            f'{name}_bucket{labels[:-1]},le="+Inf"}} {values["count"]}')
+        lines.append(f'{name}_sum{labels} {values["sum"]:.6f}')
+        lines.append(f'{name}_count{labels} {values["count"]}')
+
+        total = by_url.setdefault(
+            url_name, {'count': 0, 'buckets': [0] * len(BUCKETS)})
+        total['count'] += values['count']
+        for index, value in enumerate(values['buckets']):
+            total['buckets'][index] += value
+
+    for metric, field, kind, help_text in [
+        ('orders_http_requests_total', 'count', 'counter',
+         'Solicitudes por URL y estado.'),
+        ('orders_db_queries_total', 'queries', 'counter',
+         'Consultas SQL por URL y estado.'),
+        ('orders_db_duration_seconds_total', 'db', 'counter',
+         'Segundos en la base de datos por URL y estado.'),
+    ]:
+        lines.append(f'# HELP {metric} {help_text}')
+        lines.append(f'# TYPE {metric} {kind}')
+        for key in sorted(series):
+            url_name, status = key.rsplit('|', 1)
+            labels = _labels(url_name=url_name, status=status)
+            lines.append(f'{metric}{labels} {series[key][field]}')
+
+    metric = 'orders_http_request_duration_quantile_seconds'
+    lines.append(f'# HELP {metric} Latencia estimada por URL (p50, p95, p99).')
+    lines.append(f'# TYPE {metric} gauge')
+    for url_name, total in by_url.items():
+        for q in QUANTILES:
+            value = quantile(total['buckets'], total['count'], q)
+            labels = _labels(url_name=url_name, quantile=q)
+            lines.append(f'{metric}{labels} {value:.6f}')
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,121 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import routers, slowlog
+from .metrics import get_registry
+from .profiling import (QueryInspector, QueryTimer, TemplateTimer,
+                        report_duplicates)
+
+logger = logging.getLogger('orders.timing')
+
+
+def _url_name(request):
+    """
+    Nombre de la URL resuelta, o '-' si la solicitud no llegó a una vista.
+    """
+
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else '-'
+
+
+class ServerTimingMiddleware:
+    """
+    Mide cada solicitud y agrega los tiempos en el encabezado Server-Timing,
+    visible en las herramientas de desarrollo del navegador, en una línea
+    JSON del logger 'orders.timing' y en los histogramas de /metrics. Con
+    QUERY_INSPECTION activo señala además las consultas repetidas (N+1) en
+    el logger 'orders.queries'. Las consultas que tardan al menos
+    SLOW_QUERY_THRESHOLD segundos se guardan con su plan de ejecución.
+
+    Va al principio de MIDDLEWARE y se complementa con ViewTimingMiddleware
+    al final, para separar el tiempo de la vista del de los demás
+    middlewares (sesiones, mensajes, CSRF). El cuerpo de las respuestas en
+    streaming se genera después y no se incluye.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryInspector if settings.QUERY_INSPECTION else QueryTimer
+        queries = timer(settings.SLOW_QUERY_THRESHOLD)
+        start = time.perf_counter()
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(queries))
+            templates = stack.enter_context(TemplateTimer())
+            response = self.get_response(request)
+
+        total = (time.perf_counter() - start) * 1000
+        view = getattr(request, '_view_duration', 0) * 1000
+        timings = {
+            'db': queries.duration * 1000,
+            'tpl': templates.duration * 1000,
+            'view': view,
+            'mw': max(total - view, 0),
+            'total': total,
+        }
+
+        metrics = [f'db;dur={timings["db"]:.1f};desc="{queries.count} SQL"']
+        metrics += [f'{name};dur={value:.1f}'
+                    for name, value in timings.items() if name != 'db']
+        response['Server-Timing'] = ', '.join(metrics)
+
+        url_name = _url_name(request)
+        get_registry().observe(url_name, response.status_code, total / 1000,
+                               queries.count, queries.duration)
+        if isinstance(queries, QueryInspector):
+            report_duplicates(queries, url_name)
+        slowlog.record(queries.slow, url_name)
+
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(dict(
+                {name: round(value, 2) for name, value in timings.items()},
+                url_name=url_name, method=request.method,
+                status=response.status_code, queries=queries.count,
+            ), sort_keys=True))
+
+        return response
+
+
+class ViewTimingMiddleware:
+    """
+    Mide el tiempo de la vista, incluido el renderizado de su plantilla,
+    para ServerTimingMiddleware. Va al final de MIDDLEWARE.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        request._view_duration = time.perf_counter() - start
+        return response
+
+
+class ReplicaMiddleware:
+    """
+    Después de una solicitud que escribió en orders, guarda en la sesión
+    hasta cuándo sus lecturas deben ir al primario (ver read_replica()). Va
+    después de SessionMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routers.start_request()
+        response = self.get_response(request)
+
+        if settings.REPLICA_DATABASE and routers.wrote():
+            request.session[routers.STICKY_KEY] = (
+                time.time() + settings.REPLICA_STICKY_SECONDS)
+
+        return response
@@ -0,0 +1,136 @@
+# Generated by Django 2.2.4 on 2026-10-18 10:00
+
+import re
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations, models
+
+# Cantidad de pedidos convertidos por lote
+BATCH_SIZE = 1000
+
+# Símbolos de moneda y espacios que se descartan antes de convertir
+_NOISE = re.compile(r'(?i)gs\.?|₲|\$|\s')
+
+
+def parse_price(value):
+    """
+    Convierte un precio guardado como texto a entero. Acepta separadores de
+    miles y decimales con punto o coma: si aparecen los dos, el último es el
+    decimal; si aparece uno solo, es de miles cuando se repite o le siguen
+    exactamente tres dígitos ('1.500'), y decimal en otro caso ('1500.50').
+    Los decimales se redondean.
+
+    Args:
+        value (str): El precio como texto.
+
+    Returns:
+        int: El precio, o None si no se puede interpretar.
+    """
+
+    text = _NOISE.sub('', value or '')
+    if not re.fullmatch(r'\d[\d.,]*', text):
+        return None
+
+    separators = [char for char in text if char in '.,']
+    decimal = None
+    if len(set(separators)) == 2:
+        decimal = separators[-1]
+    elif len(separators) == 1 and not re.search(r'[.,]\d{3}$', text):
+        decimal = separators[0]
+
+    whole, fraction = text, ''
+    if decimal is not None:
+        whole, _, fraction = text.rpartition(decimal)
+        if not fraction.isdigit():
+            return None
+
+    # Los separadores de miles tienen que agrupar de a tres dígitos
+    if not re.fullmatch(r'\d+|\d{1,3}(?:\.\d{3})+|\d{1,3}(?:,\d{3})+',
+                        whole):
+        return None
+    whole = re.sub(r'[.,]', '', whole)
+
+    number = Decimal(f'{whole}.{fraction or 0}')
+    return int(number.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def price_to_numeric(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+
+    # Se revisan todos los precios antes de escribir, para no dejar la
+    # conversión a medias (en MySQL los cambios de esquema no se deshacen)
+    invalid = [
+        id for id, price in Order.objects.order_by('id').values_list(
+            'id', 'price').iterator(chunk_size=BATCH_SIZE)
+        if parse_price(price) is None
+    ]
+    if invalid:
+        raise ValueError(
+            'No se pudo interpretar el precio de los pedidos '
+            f'{", ".join(map(str, invalid))}; corríjalos y vuelva a migrar')
+
+    last_id = 0
+    while True:
+        batch = list(
+            Order.objects.filter(id__gt=last_id)
+            .order_by('id')
+            .only('id', 'price')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+
+        for order in batch:
+            order.price_numeric = parse_price(order.price)
+        Order.objects.bulk_update(batch, ['price_numeric'])
+
+        last_id = batch[-1].id
+
+
+def price_to_text(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+
+    last_id = 0
+    while True:
+        batch = list(
+            Order.objects.filter(id__gt=last_id)
+            .order_by('id')
+            .only('id', 'price_numeric')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+
+        for order in batch:
+            order.price = str(order.price_numeric)
+        Order.objects.bulk_update(batch, ['price'])
+
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_auto_20230926_1838'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='price_numeric',
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.RunPython(price_to_numeric, price_to_text),
+        migrations.RemoveField(
+            model_name='order',
+            name='price',
+        ),
+        migrations.RenameField(
+            model_name='order',
+            old_name='price_numeric',
+            new_name='price',
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='price',
+            field=models.PositiveIntegerField(),
+        ),
+    ]
@@ -0,0 +1,113 @@
+# Generated by Django 2.2.4 on 2026-10-18 16:03
+
+from django.db import migrations, models
+from django.db.models import (BigIntegerField, Case, Count, ExpressionWrapper,
+                              F, IntegerField, Sum, When)
+import django.db.models.deletion
+
+# Tablas de resumen, su campo clave y el campo de Order que le corresponde
+ROLLUPS = [
+    ('DailyBalance', 'day', 'deadline'),
+    ('CustomerBalance', 'customer_id', 'customer_id'),
+    ('ProductBalance', 'product_id', 'product_id'),
+]
+
+COUNTERS = ['orders', 'units', 'revenue', 'delivered_orders',
+            'delivered_revenue']
+
+
+def fill_rollups(apps, schema_editor):
+    """
+    Carga los resúmenes con los pedidos que ya existen, agrupándolos en la
+    base de datos igual que rollups.rebuild_rollups. Sin esto los resúmenes
+    empiezan vacíos y los contadores quedan negativos al borrar pedidos
+    anteriores a la migración.
+    """
+
+    Order = apps.get_model('orders', 'Order')
+
+    total = ExpressionWrapper(F('price') * F('amount'),
+                              output_field=BigIntegerField())
+    delivered = Case(When(delivered__isnull=False, then=1), default=0,
+                     output_field=IntegerField())
+    counters = {
+        'orders': Count('id'),
+        'units': Sum('amount'),
+        'revenue': Sum('total'),
+        'delivered_orders': Sum(delivered),
+        'delivered_revenue': Sum(
+            Case(When(delivered__isnull=False, then=F('total')),
+                 default=0, output_field=BigIntegerField())),
+    }
+
+    for model_name, key_field, order_field in ROLLUPS:
+        model = apps.get_model('orders', model_name)
+        rows = (
+            Order.objects.annotate(total=total)
+            .order_by()
+            .values(key=F(order_field))
+            .annotate(**counters)
+        )
+        model.objects.all().delete()
+        model.objects.bulk_create(
+            [model(**{key_field: row['key']},
+                   **{name: row[name] or 0 for name in COUNTERS})
+             for row in rows],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_order_price_numeric'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyBalance',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orders', models.IntegerField(default=0)),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.BigIntegerField(default=0)),
+                ('delivered_orders', models.IntegerField(default=0)),
+                ('delivered_revenue', models.BigIntegerField(default=0)),
+                ('day', models.DateField(unique=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductBalance',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orders', models.IntegerField(default=0)),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.BigIntegerField(default=0)),
+                ('delivered_orders', models.IntegerField(default=0)),
+                ('delivered_revenue', models.BigIntegerField(default=0)),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='balance', to='orders.Product')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='CustomerBalance',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orders', models.IntegerField(default=0)),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.BigIntegerField(default=0)),
+                ('delivered_orders', models.IntegerField(default=0)),
+                ('delivered_revenue', models.BigIntegerField(default=0)),
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='balance', to='orders.Customer')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
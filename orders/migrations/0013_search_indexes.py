@@ -0,0 +1,38 @@
+# Generated by Django 2.2.4 on 2026-10-18 16:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0012_order_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customer',
+            name='document',
+            field=models.CharField(db_index=True, max_length=150, null=True),
+        ),
+        migrations.AlterField(
+            model_name='customer',
+            name='first_name',
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='customer',
+            name='last_name',
+            field=models.CharField(db_index=True, max_length=100, null=True),
+        ),
+        migrations.AlterField(
+            model_name='customer',
+            name='phone_number',
+            field=models.CharField(db_index=True, max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='name',
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 2.2.4 on 2026-10-18 16:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0014_slow_queries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('order', 'Pedido'), ('customer', 'Cliente'), ('product', 'Producto')], max_length=10)),
+                ('object_id', models.PositiveIntegerField()),
+                ('token', models.CharField(max_length=50)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='searchentry',
+            index=models.Index(fields=['token', 'kind', 'object_id'], name='orders_sear_token_39aecc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='searchentry',
+            index=models.Index(fields=['kind', 'object_id'], name='orders_sear_kind_145fa7_idx'),
+        ),
+    ]
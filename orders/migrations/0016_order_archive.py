@@ -0,0 +1,52 @@
+# Generated by Django 2.2.4 on 2026-10-18 16:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0015_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchiveBalance',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orders', models.IntegerField(default=0)),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.BigIntegerField(default=0)),
+                ('delivered_orders', models.IntegerField(default=0)),
+                ('delivered_revenue', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('observation', models.CharField(max_length=255, null=True)),
+                ('amount', models.SmallIntegerField()),
+                ('price', models.PositiveIntegerField()),
+                ('deadline', models.DateField()),
+                ('delivered', models.DateField()),
+                ('bill', models.CharField(max_length=15, null=True)),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_orders', to='orders.Customer')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_orders', to='orders.Product')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['deadline'], name='archived_deadline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['delivered'], name='archived_delivered_idx'),
+        ),
+    ]
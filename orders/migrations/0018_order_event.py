@@ -0,0 +1,28 @@
+# Generated by Django 2.2.4 on 2026-10-18 16:46
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0017_catalog_soft_delete'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.PositiveIntegerField()),
+                ('kind', models.CharField(choices=[('created', 'Creado'), ('edited', 'Editado'), ('delivered', 'Entregado'), ('reopened', 'Reabierto'), ('deleted', 'Eliminado')], max_length=10)),
+                ('changes', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='orderevent',
+            index=models.Index(fields=['order_id', 'created_at'], name='event_order_time_idx'),
+        ),
+    ]
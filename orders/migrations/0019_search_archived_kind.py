@@ -0,0 +1,18 @@
+# Generated by Django 2.2.4 on 2026-10-18 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0018_order_event'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='searchentry',
+            name='kind',
+            field=models.CharField(choices=[('order', 'Pedido'), ('archived', 'Pedido archivado'), ('customer', 'Cliente'), ('product', 'Producto')], max_length=10),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.4 on 2026-10-18 17:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0019_search_archived_kind'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='import_batch',
+            field=models.UUIDField(db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='import_batch',
+            field=models.UUIDField(db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='import_batch',
+            field=models.UUIDField(db_index=True, editable=False, null=True),
+        ),
+    ]
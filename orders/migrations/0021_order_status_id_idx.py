@@ -0,0 +1,17 @@
+# Generated by Django 2.2.4 on 2026-10-18 17:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0020_import_batch_marker'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['delivered', 'id'], name='order_status_id_idx'),
+        ),
+    ]
@@ -1,10 +1,26 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import (BigIntegerField, Case, DateField,
+                              ExpressionWrapper, F, Value, When)
 from django.utils import timezone
 
 # Create your models here.
 
 
-class CustomerValidator(models.Manager):
+class CatalogQuerySet(models.QuerySet):
+
+    def visible(self):
+        """
+        Excluye los clientes o productos eliminados, que esperan a que
+        purge_deleted borre sus pedidos.
+
+        Returns:
+            QuerySet: Los clientes o productos sin eliminar.
+        """
+
+        return self.filter(deleted_at__isnull=True)
+
+
+class CustomerValidator(models.Manager.from_queryset(CatalogQuerySet)):
 
     def customer_validator(self, post_data):
         """
@@ -30,18 +46,21 @@ class CustomerValidator(models.Manager):
 
 class Customer(models.Model):
 
-    first_name = models.CharField(max_length=100)
-    last_name = models.CharField(max_length=100, null=True)
-    phone_number = models.CharField(max_length=20)
+    first_name = models.CharField(max_length=100, db_index=True)
+    last_name = models.CharField(max_length=100, null=True, db_index=True)
+    phone_number = models.CharField(max_length=20, db_index=True)
     email = models.CharField(max_length=150, null=True)
-    document = models.CharField(max_length=150, null=True)
+    document = models.CharField(max_length=150, null=True, db_index=True)
     address = models.CharField(max_length=255, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    deleted_at = models.DateTimeField(null=True, db_index=True)
+    # Bloque de importación que creó la fila (ver orders/imports.py)
+    import_batch = models.UUIDField(null=True, editable=False, db_index=True)
     objects = CustomerValidator()
 
 
-class ProductValidator(models.Manager):
+class ProductValidator(models.Manager.from_queryset(CatalogQuerySet)):
 
     def product_validator(self, post_data):
         """
@@ -65,10 +84,13 @@ class ProductValidator(models.Manager):
 
 class Product(models.Model):
 
-    name = models.CharField(max_length=100)
+    name = models.CharField(max_length=100, db_index=True)
     description = models.CharField(max_length=100, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    deleted_at = models.DateTimeField(null=True, db_index=True)
+    # Bloque de importación que creó la fila (ver orders/imports.py)
+    import_batch = models.UUIDField(null=True, editable=False, db_index=True)
     objects = ProductValidator()
 
     def __str__(self) -> str:
@@ -81,7 +103,74 @@ class Product(models.Model):
         return f"Producto {self.name}"
 
 
-class OrderValidator(models.Manager):
+class OrderQuerySet(models.QuerySet):
+
+    def visible(self):
+        """
+        Excluye los pedidos de clientes o productos eliminados, que ya no se
+        cuentan en los resúmenes y esperan a que purge_deleted los borre.
+
+        Los eliminados se excluyen con subconsultas y no con un JOIN: así el
+        recorrido de los pedidos puede seguir usando sus índices por fecha
+        o por ID para los listados con LIMIT, en lugar de partir de los
+        clientes y ordenar después.
+
+        Returns:
+            QuerySet: Los pedidos de clientes y productos sin eliminar.
+        """
+
+        return self.exclude(
+            customer_id__in=Customer.objects.filter(
+                deleted_at__isnull=False).values('id'),
+        ).exclude(
+            product_id__in=Product.objects.filter(
+                deleted_at__isnull=False).values('id'),
+        )
+
+    def with_total(self):
+        """
+        Anota cada pedido con su precio total calculado en la base de datos.
+
+        Returns:
+            QuerySet: Los pedidos con el campo 'total' (precio * cantidad),
+            que se puede sumar, ordenar y filtrar en SQL.
+        """
+
+        return self.annotate(total=ExpressionWrapper(
+            F('price') * F('amount'), output_field=BigIntegerField()))
+
+    def toggle_delivered(self, id):
+        """
+        Marca un pedido como entregado o no entregado con un solo UPDATE
+        condicional que solo escribe 'delivered' y 'updated_at', de modo que
+        dos cambios simultáneos nunca se pisan.
+
+        Args:
+            id (int): El ID del pedido.
+
+        Returns:
+            Order: El pedido con su estado nuevo y los campos que usan los
+            resúmenes, o None si no existe.
+        """
+
+        with transaction.atomic():
+            updated = self.filter(id=id).update(
+                delivered=Case(
+                    When(delivered__isnull=True,
+                         then=Value(timezone.localdate())),
+                    default=Value(None), output_field=DateField()),
+                updated_at=timezone.now())
+            if not updated:
+                return None
+
+            # La fila queda bloqueada por el UPDATE hasta el final de la
+            # transacción, así que se lee el estado que escribió
+            return self.only(
+                'id', 'delivered', 'updated_at', 'amount', 'price',
+                'deadline', 'customer_id', 'product_id').get(id=id)
+
+
+class OrderValidator(models.Manager.from_queryset(OrderQuerySet)):
 
     def order_validator(self, post_data):
         """
@@ -101,10 +190,18 @@ class OrderValidator(models.Manager):
             errors['product_id'] = 'Elige un producto para el pedido'
         if post_data['customer_id'] == 'Lista de clientes':
             errors['customer_id'] = 'Elige un cliente para el pedido'
-        if int(post_data['amount']) <= 0:
+        # Una cantidad que no es un número se informa junto con los demás
+        # errores en lugar de interrumpir la validación
+        try:
+            amount = int(post_data['amount'])
+        except (TypeError, ValueError):
+            amount = 0
+        if amount <= 0:
             errors['amount'] = 'Introducir cantidad'
         if len(post_data['price']) < 4:
             errors['price'] = 'Introducir precio'
+        elif not post_data['price'].isdigit():
+            errors['price'] = 'El precio debe contener solo números'
 
         return errors
 
@@ -113,7 +210,7 @@ class Order(models.Model):
 
     observation = models.CharField(max_length=255, null=True)
     amount = models.SmallIntegerField()
-    price = models.CharField(max_length=255)
+    price = models.PositiveIntegerField()
     deadline = models.DateField()
     delivered = models.DateField(null=True, blank=True)
     bill = models.CharField(max_length=15, null=True)
@@ -121,23 +218,45 @@ class Order(models.Model):
         Customer, related_name="orders", on_delete=models.CASCADE)
     product = models.ForeignKey(
         Product, related_name="orders", on_delete=models.CASCADE)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # Bloque de importación que creó la fila (ver orders/imports.py)
+    import_batch = models.UUIDField(null=True, editable=False, db_index=True)
     objects = OrderValidator()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['deadline'], name='order_deadline_idx'),
+            models.Index(fields=['delivered', 'deadline'],
+                         name='order_status_deadline_idx'),
+            models.Index(fields=['delivered', 'id'],
+                         name='order_status_id_idx'),
+            models.Index(fields=['customer', 'deadline'],
+                         name='order_customer_deadline_idx'),
+            models.Index(fields=['product', 'deadline'],
+                         name='order_product_deadline_idx'),
+        ]
+
     def deliver_product(self):
         """
         Marca el pedido como entregado o no entregado.
 
         Si el pedido ya ha sido entregado, se marca como no entregado.
-        Si el pedido aún no ha sido entregado, se marca como entregado y se guarda la fecha actual.
+        Si el pedido aún no ha sido entregado, se marca como entregado con la
+        fecha actual. El cambio se hace con un UPDATE condicional sobre el
+        valor guardado, sin reescribir el resto de las columnas.
 
+        Returns:
+            bool: True si el pedido quedó entregado.
         """
 
-        if self.delivered == None:
-            self.delivered = timezone.now()
-            self.save()
-        else:
-            self.delivered = None
-            self.save()
+        order = Order.objects.toggle_delivered(self.id)
+        if order is None:
+            raise Order.DoesNotExist('El pedido ya no existe')
+
+        self.delivered = order.delivered
+        self.updated_at = order.updated_at
+
+        return self.delivered is not None
 
 
     def calculate_total_price(self):
@@ -148,4 +267,150 @@ class Order(models.Model):
             int: El precio total del pedido.
         """
         
-        return int(self.price) * self.amount
+        return self.price * self.amount
+
+
+class BalanceRollup(models.Model):
+
+    orders = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.BigIntegerField(default=0)
+    delivered_orders = models.IntegerField(default=0)
+    delivered_revenue = models.BigIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class DailyBalance(BalanceRollup):
+
+    day = models.DateField(unique=True)
+
+
+class CustomerBalance(BalanceRollup):
+
+    customer = models.OneToOneField(
+        Customer, related_name="balance", on_delete=models.CASCADE)
+
+
+class ProductBalance(BalanceRollup):
+
+    product = models.OneToOneField(
+        Product, related_name="balance", on_delete=models.CASCADE)
+
+
+class ArchiveBalance(BalanceRollup):
+    """
+    Una sola fila con los contadores de los pedidos archivados, que se
+    restan de los resúmenes para obtener los totales de las tablas de
+    balance sin recorrer el archivo.
+    """
+
+
+class ArchivedOrder(models.Model):
+    """
+    Pedido entregado hace más de ARCHIVE_AFTER_DAYS, movido desde Order con
+    el mismo ID y las mismas columnas por orders/archive.py. Sigue contando
+    en los resúmenes, pero ya no se modifica.
+    """
+
+    id = models.IntegerField(primary_key=True)
+    observation = models.CharField(max_length=255, null=True)
+    amount = models.SmallIntegerField()
+    price = models.PositiveIntegerField()
+    deadline = models.DateField()
+    delivered = models.DateField()
+    bill = models.CharField(max_length=15, null=True)
+    customer = models.ForeignKey(
+        Customer, related_name="archived_orders", on_delete=models.CASCADE)
+    product = models.ForeignKey(
+        Product, related_name="archived_orders", on_delete=models.CASCADE)
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deadline'], name='archived_deadline_idx'),
+            models.Index(fields=['delivered'], name='archived_delivered_idx'),
+        ]
+
+
+class SlowQuery(models.Model):
+    """
+    Consulta que superó SLOW_QUERY_THRESHOLD, con su plan de ejecución. La
+    tabla guarda solo las últimas SLOW_QUERY_LIMIT (ver orders/slowlog.py).
+    """
+
+    fingerprint = models.CharField(max_length=40, db_index=True)
+    statement = models.TextField()
+    params = models.TextField(blank=True)
+    view = models.CharField(max_length=100)
+    duration = models.FloatField()
+    plan = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class SearchEntry(models.Model):
+    """
+    Una palabra normalizada de un pedido, cliente o producto, para la
+    búsqueda global por prefijo (ver orders/search.py).
+    """
+
+    ORDER = 'order'
+    ARCHIVED_ORDER = 'archived'
+    CUSTOMER = 'customer'
+    PRODUCT = 'product'
+    KINDS = [
+        (ORDER, 'Pedido'),
+        (ARCHIVED_ORDER, 'Pedido archivado'),
+        (CUSTOMER, 'Cliente'),
+        (PRODUCT, 'Producto'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KINDS)
+    object_id = models.PositiveIntegerField()
+    token = models.CharField(max_length=50)
+
+    class Meta:
+        indexes = [
+            # Búsqueda por prefijo sin leer la tabla
+            models.Index(fields=['token', 'kind', 'object_id']),
+            # Borrado y comprobación de las demás palabras de un objeto
+            models.Index(fields=['kind', 'object_id']),
+        ]
+
+
+class OrderEvent(models.Model):
+    """
+    Un cambio de un pedido: su creación, edición, entrega, reapertura o
+    eliminación, con los campos modificados. Solo se agregan filas (ver
+    orders/events.py); la columna del pedido no es una clave foránea para
+    que el historial quede aunque el pedido se elimine o se archive.
+    """
+
+    CREATED = 'created'
+    EDITED = 'edited'
+    DELIVERED = 'delivered'
+    REOPENED = 'reopened'
+    DELETED = 'deleted'
+    KINDS = [
+        (CREATED, 'Creado'),
+        (EDITED, 'Editado'),
+        (DELIVERED, 'Entregado'),
+        (REOPENED, 'Reabierto'),
+        (DELETED, 'Eliminado'),
+    ]
+
+    order_id = models.PositiveIntegerField()
+    kind = models.CharField(max_length=10, choices=KINDS)
+    # Diccionario JSON de campo a [valor anterior, valor nuevo]
+    changes = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Historial de un pedido en orden cronológico
+            models.Index(fields=['order_id', 'created_at'],
+                         name='event_order_time_idx'),
+        ]
@@ -0,0 +1,364 @@
+import hashlib
+import io
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from django.conf import settings
+
+# Tamaños de página en puntos (A4)
+LANDSCAPE = (842, 595)
+PORTRAIT = (595, 842)
+
+MARGIN = 36
+FONT_SIZE = 8
+ROW_HEIGHT = 14
+
+# Ancho medio de un carácter de Helvetica respecto al tamaño de la fuente
+CHAR_WIDTH = 0.52
+
+_executor = None
+_slots = None
+_lock = threading.Lock()
+
+
+class PdfBusy(Exception):
+    """
+    Se lanza cuando el grupo de procesos tiene todos sus lugares ocupados.
+    """
+
+
+def _escape(text):
+    """
+    Codifica un texto para una cadena literal de PDF con WinAnsiEncoding.
+
+    Args:
+        text (str): El texto a escribir.
+
+    Returns:
+        bytes: El texto codificado y con los paréntesis escapados.
+    """
+
+    data = str(text).encode('cp1252', errors='replace')
+    return (data.replace(b'\\', b'\\\\')
+                .replace(b'(', b'\\(')
+                .replace(b')', b'\\)'))
+
+
+def _fit(text, width, size=FONT_SIZE):
+    """
+    Recorta un texto para que entre en el ancho de una columna.
+
+    Args:
+        text: El valor de la celda.
+        width (float): Ancho de la columna en puntos.
+        size (int): Tamaño de la fuente.
+
+    Returns:
+        str: El texto recortado.
+    """
+
+    text = '' if text is None else str(text)
+    max_chars = int(width / (size * CHAR_WIDTH))
+    if len(text) > max_chars:
+        return text[:max(max_chars - 1, 0)] + '.'
+    return text
+
+
+def _text(x, y, text, size=FONT_SIZE, bold=False):
+    """
+    Instrucciones de PDF que dibujan un texto en una posición.
+    """
+
+    font = b'/F2' if bold else b'/F1'
+    return (b'BT ' + font + b' %d Tf %.2f %.2f Td (' % (size, x, y) +
+            _escape(text) + b') Tj ET\n')
+
+
+def build_pdf(pages, page_size):
+    """
+    Arma un documento PDF a partir del contenido de cada página.
+
+    Args:
+        pages (list): Las instrucciones de dibujo de cada página, en bytes.
+        page_size (tuple): Ancho y alto de las páginas en puntos.
+
+    Returns:
+        bytes: El documento PDF.
+    """
+
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        None,
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica '
+        b'/Encoding /WinAnsiEncoding >>',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold '
+        b'/Encoding /WinAnsiEncoding >>',
+    ]
+
+    kids = []
+    for content in pages:
+        objects.append(
+            b'<< /Length %d >>\nstream\n' % len(content) + content +
+            b'\nendstream')
+        content_id = len(objects)
+        objects.append(
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] '
+            b'/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> '
+            b'/Contents %d 0 R >>' % (page_size[0], page_size[1], content_id))
+        kids.append(b'%d 0 R' % len(objects))
+
+    objects[1] = (b'<< /Type /Pages /Kids [' + b' '.join(kids) +
+                  b'] /Count %d >>' % len(kids))
+
+    output = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+
+    xref = len(output)
+    output += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    for offset in offsets:
+        output += b'%010d 00000 n \n' % offset
+    output += (b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+               % (len(objects) + 1, xref))
+
+    return bytes(output)
+
+
+def render_table(title, headers, widths, rows, footer=None):
+    """
+    Dibuja una tabla en páginas A4 apaisadas, repitiendo los encabezados en
+    cada página.
+
+    Args:
+        title (str): Título del documento.
+        headers (list): Encabezados de las columnas.
+        widths (list): Ancho relativo de cada columna.
+        rows (list): Valores de cada fila.
+        footer (str): Texto opcional al final de la tabla.
+
+    Returns:
+        bytes: El documento PDF.
+    """
+
+    page_width, page_height = LANDSCAPE
+    scale = (page_width - 2 * MARGIN) / sum(widths)
+    widths = [width * scale for width in widths]
+    rows_per_page = int((page_height - 2 * MARGIN - 40) / ROW_HEIGHT)
+
+    def line(values, y, bold=False):
+        x = MARGIN
+        content = b''
+        for value, width in zip(values, widths):
+            content += _text(x, y, _fit(value, width), bold=bold)
+            x += width
+        return content
+
+    pages = []
+    chunks = [rows[i:i + rows_per_page]
+              for i in range(0, len(rows), rows_per_page)] or [[]]
+    for number, chunk in enumerate(chunks, start=1):
+        y = page_height - MARGIN - 14
+        content = _text(MARGIN, y, title, size=14, bold=True)
+        content += _text(page_width - MARGIN - 60, y,
+                         f'Página {number}/{len(chunks)}')
+        y -= 26
+        content += line(headers, y, bold=True)
+        for row in chunk:
+            y -= ROW_HEIGHT
+            content += line(row, y)
+        if footer and number == len(chunks):
+            content += _text(MARGIN, y - ROW_HEIGHT - 4, footer, bold=True)
+        pages.append(content)
+
+    return build_pdf(pages, LANDSCAPE)
+
+
+def render_slip(title, fields):
+    """
+    Dibuja una ficha con pares de etiqueta y valor en una página A4.
+
+    Args:
+        title (str): Título del documento.
+        fields (list): Tuplas (etiqueta, valor).
+
+    Returns:
+        bytes: El documento PDF.
+    """
+
+    page_width, page_height = PORTRAIT
+    y = page_height - MARGIN - 18
+    content = _text(MARGIN, y, title, size=18, bold=True)
+    y -= 20
+
+    for label, value in fields:
+        y -= 28
+        content += _text(MARGIN, y, label, size=10, bold=True)
+        content += _text(MARGIN + 120, y,
+                         _fit(value, page_width - 2 * MARGIN - 120, 10),
+                         size=10)
+
+    return build_pdf([content], PORTRAIT)
+
+
+RENDERERS = {
+    'table': render_table,
+    'slip': render_slip,
+}
+
+
+def _render(kind, payload):
+    """
+    Punto de entrada de los procesos del grupo.
+    """
+
+    return RENDERERS[kind](**payload)
+
+
+def _get_executor():
+    """
+    Crea, la primera vez que se necesita, el grupo de procesos que genera
+    los PDF y el semáforo que limita los trabajos en curso.
+
+    Returns:
+        tuple: El grupo de procesos y el semáforo.
+    """
+
+    global _executor, _slots
+
+    with _lock:
+        if _executor is None:
+            workers = getattr(settings, 'PDF_WORKERS', 2)
+            _executor = ProcessPoolExecutor(max_workers=workers)
+            _slots = threading.BoundedSemaphore(workers * 2)
+
+    return _executor, _slots
+
+
+def _store(path, document):
+    """
+    Guarda un PDF en la caché escribiendo un archivo temporal y renombrándolo,
+    para que otra solicitud nunca lea un PDF a medio escribir.
+
+    Args:
+        path (str): Ruta final del archivo.
+        document (bytes): El PDF.
+    """
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(document)
+    os.replace(temporary, path)
+
+
+def prune(cache_dir, keep):
+    """
+    Borra los PDF usados hace más tiempo hasta dejar solo 'keep'. Cada
+    cambio en los datos genera un archivo nuevo, así que sin esto la
+    carpeta crecería sin límite.
+
+    Args:
+        cache_dir (str): Carpeta de la caché.
+        keep (int): Cantidad de archivos a conservar.
+
+    Returns:
+        int: La cantidad de archivos borrados.
+    """
+
+    try:
+        entries = [entry for entry in os.scandir(cache_dir)
+                   if entry.name.endswith('.pdf')]
+    except FileNotFoundError:
+        return 0
+
+    # Al reutilizar un PDF se actualiza su fecha, así que los más viejos
+    # son los que hace más tiempo no se piden
+    entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+
+    removed = 0
+    for entry in entries[keep:]:
+        try:
+            os.remove(entry.path)
+            removed += 1
+        except FileNotFoundError:
+            # Otro proceso lo borró primero
+            pass
+
+    return removed
+
+
+def render_cached(kind, payload, timeout=60):
+    """
+    Genera un PDF en el grupo de procesos, o lo lee del disco si ya se generó
+    con el mismo contenido. Después de generar uno nuevo se borran los más
+    viejos, dejando PDF_CACHE_MAX_FILES.
+
+    Args:
+        kind (str): 'table' o 'slip'.
+        payload (dict): Argumentos del renderizador; solo datos simples.
+        timeout (int): Segundos máximos de espera por un lugar y por el PDF.
+
+    Returns:
+        file: El PDF abierto en modo binario. Se devuelve abierto y no la
+        ruta para que un borrado de prune en otra solicitud no lo quite
+        entre que se genera y se envía.
+
+    Raises:
+        PdfBusy: Si no se libera un lugar en el grupo a tiempo o el PDF no se
+        termina de generar a tiempo.
+    """
+
+    digest = hashlib.sha256(
+        json.dumps([kind, payload], sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+    cache_dir = getattr(settings, 'PDF_CACHE_DIR',
+                        os.path.join(settings.BASE_DIR, 'pdf_cache'))
+    path = os.path.join(cache_dir, f'{digest}.pdf')
+    try:
+        document = open(path, 'rb')
+    except FileNotFoundError:
+        pass
+    else:
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # Se borró después de abrirlo; el archivo abierto sigue sirviendo
+            pass
+        return document
+
+    executor, slots = _get_executor()
+    if not slots.acquire(timeout=timeout):
+        raise PdfBusy('Demasiados PDF en proceso')
+    try:
+        future = executor.submit(_render, kind, payload)
+    except BaseException:
+        slots.release()
+        raise
+
+    # El lugar se libera cuando el proceso termina el PDF, no cuando la
+    # solicitud deja de esperarlo, para que nunca haya más de workers * 2
+    # trabajos en el grupo
+    future.add_done_callback(lambda future: slots.release())
+
+    try:
+        document = future.result(timeout)
+    except FutureTimeout:
+        # Se guarda cuando termine, para que el siguiente intento lo lea
+        # del disco
+        def store_late(future):
+            if not future.cancelled() and future.exception() is None:
+                _store(path, future.result())
+
+        future.add_done_callback(store_late)
+        raise PdfBusy('El PDF tardó demasiado en generarse')
+
+    _store(path, document)
+    prune(cache_dir, getattr(settings, 'PDF_CACHE_MAX_FILES', 500))
+
+    return io.BytesIO(document)
@@ -0,0 +1,272 @@
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+from django.template.base import Node, Template
+
+logger = logging.getLogger('orders.queries')
+
+_local = threading.local()
+_original_render = Template.render
+
+# Medidores de plantillas activos en todos los hilos; Template.render solo
+# se reemplaza mientras haya alguno
+_active_timers = 0
+_timers_lock = threading.Lock()
+
+# Veces que debe repetirse una consulta en una solicitud para señalarla como
+# un posible N+1
+DUPLICATE_THRESHOLD = 3
+
+# Literales y listas de parámetros que se reemplazan al normalizar el SQL
+_STRING = re.compile(r"'(?:''|[^'])*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PARAMS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_SPACES = re.compile(r'\s+')
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class QueryTimer:
+    """
+    Envoltorio para connection.execute_wrapper() que cuenta las consultas y
+    suma el tiempo que pasan en la base de datos. Si se indica threshold,
+    guarda en slow las consultas que tardan al menos esos segundos, como
+    tuplas (alias, sql, params, many, duración).
+    """
+
+    def __init__(self, threshold=None):
+        self.count = 0
+        self.duration = 0.0
+        self.threshold = threshold
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.duration += duration
+            self.count += 1
+            if self.threshold is not None and duration >= self.threshold:
+                self.slow.append((context['connection'].alias, sql, params,
+                                  many, duration))
+
+
+class QueryBudgetExceeded(Exception):
+    """
+    Se lanza en las pruebas cuando una vista ejecuta más consultas que las
+    declaradas con query_budget().
+    """
+
+
+def normalize_sql(sql):
+    """
+    Reemplaza los valores de una consulta por '?' y las listas de IN por
+    '(...)', para agrupar las consultas que solo cambian en sus parámetros.
+
+    Args:
+        sql (str): La consulta.
+
+    Returns:
+        str: La consulta normalizada.
+    """
+
+    sql = _STRING.sub('?', sql.replace('%s', '?'))
+    sql = _NUMBER.sub('?', sql)
+    sql = _PARAMS.sub('(...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+def _origin():
+    """
+    Busca qué provocó la consulta en curso: la línea de la plantilla que se
+    está renderizando o, si no hay ninguna, la última línea de código de
+    orders fuera de este módulo.
+
+    Returns:
+        str: 'archivo:línea', o '?' si no se encuentra.
+    """
+
+    code = None
+    frame = sys._getframe(2)
+    while frame is not None:
+        if frame.f_code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            if isinstance(node, Node) and getattr(node, 'token', None):
+                name = node.origin.template_name or node.origin.name
+                return f'{name}:{node.token.lineno}'
+        filename = frame.f_code.co_filename
+        if (code is None and filename.startswith(_PACKAGE_DIR)
+                and filename != __file__):
+            code = f'{os.path.relpath(filename, _PACKAGE_DIR)}:{frame.f_lineno}'
+        frame = frame.f_back
+
+    return code or '?'
+
+
+class QueryInspector(QueryTimer):
+    """
+    QueryTimer que además agrupa las consultas por SQL normalizado y guarda
+    de dónde salió cada una, para encontrar consultas repetidas (N+1). Es
+    más lento; se usa cuando QUERY_INSPECTION está activo.
+    """
+
+    def __init__(self, threshold=None):
+        super().__init__(threshold)
+        self.statements = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        origins = self.statements.setdefault(normalize_sql(sql), [])
+        origins.append(_origin())
+        return super().__call__(execute, sql, params, many, context)
+
+    def duplicates(self, threshold=DUPLICATE_THRESHOLD):
+        """
+        Devuelve las lecturas que se repitieron al menos threshold veces.
+        Las escrituras repetidas, como las de los resúmenes por clave, no
+        se consideran.
+
+        Args:
+            threshold (int): Repeticiones mínimas.
+
+        Returns:
+            list: Tuplas (sql, veces, orígenes distintos), de la más
+            repetida a la menos.
+        """
+
+        repeated = [
+            (sql, len(origins), sorted(set(origins)))
+            for sql, origins in self.statements.items()
+            if len(origins) >= threshold and sql.startswith('SELECT')
+        ]
+        return sorted(repeated, key=lambda item: -item[1])
+
+
+def report_duplicates(inspector, url_name):
+    """
+    Registra en el logger 'orders.queries' las consultas repetidas de una
+    solicitud.
+
+    Args:
+        inspector (QueryInspector): Las consultas de la solicitud.
+        url_name (str): Nombre de la URL, para el mensaje.
+    """
+
+    for sql, count, origins in inspector.duplicates():
+        logger.warning('Posible N+1 en %s: %d veces desde %s: %s',
+                       url_name, count, ', '.join(origins), sql)
+
+
+def query_budget(limit):
+    """
+    Decorador que declara cuántas consultas puede ejecutar una vista,
+    incluido el renderizado de su plantilla. Si las supera, lanza
+    QueryBudgetExceeded cuando QUERY_BUDGET_RAISE está activo (en las
+    pruebas) o lo registra en el logger 'orders.queries'.
+
+    Args:
+        limit (int): Máximo de consultas por solicitud.
+
+    Returns:
+        function: El decorador.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            inspect = settings.QUERY_INSPECTION
+            queries = QueryInspector() if inspect else QueryTimer()
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(queries))
+                response = view(request, *args, **kwargs)
+
+            if queries.count > limit:
+                message = (f'{view.__name__} ejecutó {queries.count} '
+                           f'consultas; su límite es {limit}')
+                if inspect:
+                    message += ''.join(
+                        f'\n  {count} veces desde {", ".join(origins)}: {sql}'
+                        for sql, count, origins in queries.duplicates(2))
+                if settings.QUERY_BUDGET_RAISE:
+                    raise QueryBudgetExceeded(message)
+                logger.error(message)
+
+            return response
+
+        wrapper.query_budget = limit
+        return wrapper
+
+    return decorator
+
+
+def _timed_render(self, context):
+    """
+    Reemplazo de Template.render que suma el tiempo de renderizado al
+    medidor activo del hilo. Las plantillas incluidas o extendidas se cuentan
+    dentro de la plantilla que las contiene.
+    """
+
+    timer = getattr(_local, 'template_timer', None)
+    if timer is None or timer.depth:
+        return _original_render(self, context)
+
+    timer.depth += 1
+    start = time.perf_counter()
+    try:
+        return _original_render(self, context)
+    finally:
+        timer.duration += time.perf_counter() - start
+        timer.depth -= 1
+
+
+class TemplateTimer:
+    """
+    Mide el tiempo de renderizado de plantillas mientras está activo, solo
+    en el hilo que lo activa.
+
+    Uso:
+        with TemplateTimer() as timer:
+            response = view(request)
+        timer.duration
+    """
+
+    def __init__(self):
+        self.duration = 0.0
+        self.depth = 0
+
+    def __enter__(self):
+        global _active_timers
+
+        # El reemplazo se instala con el primer medidor activo y se quita
+        # con el último; mientras tanto, los hilos sin medidor solo hacen
+        # una búsqueda en un atributo del hilo
+        with _timers_lock:
+            _active_timers += 1
+            if _active_timers == 1:
+                Template.render = _timed_render
+        self._previous = getattr(_local, 'template_timer', None)
+        _local.template_timer = self
+        return self
+
+    def __exit__(self, *exc_info):
+        global _active_timers
+
+        # Un medidor anidado entrega lo que midió al que lo contiene
+        _local.template_timer = self._previous
+        if self._previous is not None:
+            self._previous.duration += self.duration
+
+        with _timers_lock:
+            _active_timers -= 1
+            if _active_timers == 0:
+                Template.render = _original_render
@@ -0,0 +1,389 @@
+from django.db.models import (BigIntegerField, Case, Count, F, IntegerField,
+                              Sum, Value, When)
+
+from .models import (ArchiveBalance, ArchivedOrder, CustomerBalance,
+                     DailyBalance, Order, ProductBalance)
+
+# Tablas de resumen y el campo de Order que corresponde a su clave
+ROLLUPS = [
+    (DailyBalance, 'day', 'deadline'),
+    (CustomerBalance, 'customer_id', 'customer_id'),
+    (ProductBalance, 'product_id', 'product_id'),
+]
+
+COUNTERS = ['orders', 'units', 'revenue', 'delivered_orders',
+            'delivered_revenue']
+
+# Clave de la única fila de ArchiveBalance
+ARCHIVE_KEY = 1
+
+# Claves por UPDATE al aplicar contadores agrupados; alcanza para una
+# acción en bloque completa (BULK_MAX_ORDERS) en una sola consulta
+BATCH_SIZE = 1000
+
+
+def order_counters(order, sign=1):
+    """
+    Calcula lo que aporta un pedido a los contadores de los resúmenes.
+
+    Args:
+        order (Order): El pedido.
+        sign (int): 1 para sumar el pedido, -1 para restarlo.
+
+    Returns:
+        dict: El valor a sumar a cada contador.
+    """
+
+    total = int(order.price) * int(order.amount)
+    delivered = order.delivered is not None
+
+    return {
+        'orders': sign,
+        'units': sign * int(order.amount),
+        'revenue': sign * total,
+        'delivered_orders': sign if delivered else 0,
+        'delivered_revenue': sign * total if delivered else 0,
+    }
+
+
+def _increment(model, key_field, key, counters):
+    """
+    Suma los contadores a la fila de resumen de una clave, creándola si no
+    existe. La suma se hace con un UPDATE sobre F() para no perder cambios
+    de solicitudes concurrentes; la fila que falta se crea con un INSERT
+    que ignora la que otra solicitud haya creado al mismo tiempo.
+
+    Args:
+        model (Model): La tabla de resumen.
+        key_field (str): Campo clave de la tabla.
+        key: Valor de la clave.
+        counters (dict): Valor a sumar a cada contador.
+    """
+
+    updates = {name: F(name) + value for name, value in counters.items()}
+    if not model.objects.filter(**{key_field: key}).update(**updates):
+        model.objects.bulk_create([model(**{key_field: key})],
+                                  ignore_conflicts=True)
+        model.objects.filter(**{key_field: key}).update(**updates)
+
+
+
+def _apply_grouped(model, key_field, grouped):
+    """
+    Suma los contadores de varias claves a una tabla de resumen por bloques
+    de claves: un INSERT crea las filas que faltan, ignorando las que otra
+    solicitud haya creado al mismo tiempo, y un solo UPDATE suma a cada fila
+    su valor con un CASE por contador, sobre F() para no perder cambios
+    concurrentes.
+
+    Args:
+        model (Model): La tabla de resumen.
+        key_field (str): Campo clave de la tabla.
+        grouped (dict): Por cada clave, el valor a sumar a cada contador.
+    """
+
+    # Las filas se actualizan siempre en el mismo orden para que dos
+    # solicitudes en bloque no se bloqueen mutuamente
+    keys = sorted(grouped)
+    for start in range(0, len(keys), BATCH_SIZE):
+        batch = keys[start:start + BATCH_SIZE]
+        model.objects.bulk_create([model(**{key_field: key}) for key in batch],
+                                  batch_size=500, ignore_conflicts=True)
+
+        updates = {}
+        for name in COUNTERS:
+            deltas = [When(**{key_field: key}, then=Value(grouped[key][name]))
+                      for key in batch if grouped[key][name]]
+            if deltas:
+                updates[name] = F(name) + Case(
+                    *deltas, default=Value(0),
+                    output_field=BigIntegerField())
+        if updates:
+            model.objects.filter(**{f'{key_field}__in': batch}).update(
+                **updates)
+
+def add_order(order, sign=1):
+    """
+    Suma (o resta) un pedido en las tablas de resumen. Debe llamarse dentro
+    de la misma transacción que modifica el pedido.
+
+    Args:
+        order (Order): El pedido con sus valores actuales.
+        sign (int): 1 para sumar el pedido, -1 para restarlo.
+    """
+
+    counters = order_counters(order, sign)
+    for model, key_field, order_field in ROLLUPS:
+        _increment(model, key_field, getattr(order, order_field), counters)
+
+
+def remove_order(order):
+    """
+    Resta un pedido de las tablas de resumen.
+
+    Args:
+        order (Order): El pedido con los valores que tenía al sumarse.
+    """
+
+    add_order(order, sign=-1)
+
+
+def add_orders(orders):
+    """
+    Suma una lista de pedidos recién creados en las tablas de resumen,
+    agrupando en memoria para hacer un INSERT y un UPDATE por tabla y no
+    una actualización por pedido.
+
+    Args:
+        orders (list): Los pedidos creados.
+    """
+
+    for model, key_field, order_field in ROLLUPS:
+        grouped = {}
+        for order in orders:
+            key = getattr(order, order_field)
+            counters = grouped.setdefault(key, dict.fromkeys(COUNTERS, 0))
+            for name, value in order_counters(order).items():
+                counters[name] += value
+        _apply_grouped(model, key_field, grouped)
+
+
+def toggle_order(order):
+    """
+    Ajusta los contadores de entregados después de marcar o desmarcar un
+    pedido, con una actualización por tabla de resumen.
+
+    Args:
+        order (Order): El pedido con su estado de entrega nuevo.
+    """
+
+    sign = 1 if order.delivered is not None else -1
+    counters = {
+        'delivered_orders': sign,
+        'delivered_revenue': sign * int(order.price) * int(order.amount),
+    }
+    for model, key_field, order_field in ROLLUPS:
+        _increment(model, key_field, getattr(order, order_field), counters)
+
+
+def _counter_aggregates():
+    """
+    Expresiones que calculan los contadores de los resúmenes sobre pedidos
+    anotados con 'total'.
+    """
+
+    delivered = Case(When(delivered__isnull=False, then=1), default=0,
+                     output_field=IntegerField())
+
+    return {
+        'orders': Count('id'),
+        'units': Sum('amount'),
+        'revenue': Sum('total'),
+        'delivered_orders': Sum(delivered),
+        'delivered_revenue': Sum(
+            Case(When(delivered__isnull=False, then=F('total')),
+                 default=0, output_field=BigIntegerField())),
+    }
+
+
+def aggregate_orders(queryset, order_field):
+    """
+    Agrupa los pedidos por la clave de un resumen y calcula sus contadores
+    en la base de datos.
+
+    Args:
+        queryset (QuerySet): Los pedidos a agrupar.
+        order_field (str): Campo de Order por el que se agrupa.
+
+    Returns:
+        QuerySet: Un diccionario por clave con 'key' y los contadores.
+    """
+
+    return (
+        queryset.with_total()
+        .order_by()
+        .values(key=F(order_field))
+        .annotate(**_counter_aggregates())
+    )
+
+
+def _archive_counters(queryset):
+    """
+    Calcula los contadores de un conjunto de pedidos archivados.
+    """
+
+    totals = queryset.with_total().order_by().aggregate(
+        **_counter_aggregates())
+    return {name: totals[name] or 0 for name in COUNTERS}
+
+
+def apply_orders(queryset, sign=1):
+    """
+    Suma (o resta) un conjunto de pedidos en las tablas de resumen con una
+    consulta agrupada, un INSERT y un UPDATE por tabla, en lugar de una
+    actualización por pedido o por clave.
+
+    Args:
+        queryset (QuerySet): Los pedidos a sumar o restar.
+        sign (int): 1 para sumar los pedidos, -1 para restarlos.
+    """
+
+    for model, key_field, order_field in ROLLUPS:
+        grouped = {
+            row['key']: {name: sign * (row[name] or 0) for name in COUNTERS}
+            for row in aggregate_orders(queryset, order_field)
+        }
+        _apply_grouped(model, key_field, grouped)
+
+
+def archive_orders(orders):
+    """
+    Suma en ArchiveBalance los pedidos que se acaban de archivar. Los demás
+    resúmenes no cambian, porque los pedidos archivados siguen contando.
+
+    Args:
+        orders (list): Los pedidos archivados.
+    """
+
+    counters = dict.fromkeys(COUNTERS, 0)
+    for order in orders:
+        for name, value in order_counters(order).items():
+            counters[name] += value
+    if orders:
+        _increment(ArchiveBalance, 'id', ARCHIVE_KEY, counters)
+
+
+def remove_archived(queryset):
+    """
+    Resta de todos los resúmenes, incluido ArchiveBalance, los pedidos
+    archivados de un cliente o producto que se elimina.
+
+    Args:
+        queryset (QuerySet): Los pedidos archivados.
+    """
+
+    apply_orders(queryset, sign=-1)
+    counters = {name: -value
+                for name, value in _archive_counters(queryset).items()}
+    if counters['orders']:
+        _increment(ArchiveBalance, 'id', ARCHIVE_KEY, counters)
+
+
+def archive_totals():
+    """
+    Obtiene la cantidad de pedidos archivados y la suma de sus totales.
+
+    Returns:
+        tuple: La cantidad de pedidos y la suma de sus totales.
+    """
+
+    archived = ArchiveBalance.objects.filter(id=ARCHIVE_KEY).values_list(
+        'orders', 'revenue').first()
+
+    return archived or (0, 0)
+
+
+def balance_totals(status=None):
+    """
+    Obtiene la cantidad de pedidos y la suma de sus totales de una tabla de
+    balance desde el resumen diario, sin recorrer los pedidos. Los pedidos
+    archivados, todos entregados, no se cuentan.
+
+    Args:
+        status (str): None para todos los pedidos, 'delivered' para los
+        entregados o 'to_deliver' para los que faltan entregar.
+
+    Returns:
+        tuple: La cantidad de pedidos y la suma de sus totales.
+    """
+
+    totals = {
+        name: value or 0
+        for name, value in DailyBalance.objects.aggregate(
+            orders=Sum('orders'),
+            revenue=Sum('revenue'),
+            delivered_orders=Sum('delivered_orders'),
+            delivered_revenue=Sum('delivered_revenue'),
+        ).items()
+    }
+
+    if status == 'to_deliver':
+        return (totals['orders'] - totals['delivered_orders'],
+                totals['revenue'] - totals['delivered_revenue'])
+
+    archived_orders, archived_revenue = archive_totals()
+    if status == 'delivered':
+        return (totals['delivered_orders'] - archived_orders,
+                totals['delivered_revenue'] - archived_revenue)
+
+    return (totals['orders'] - archived_orders,
+            totals['revenue'] - archived_revenue)
+
+
+def expected_rollups():
+    """
+    Calcula desde cero el contenido que deberían tener los resúmenes.
+
+    Returns:
+        list: Por cada tabla, una tupla (tabla, campo clave, diccionario de
+        clave a contadores).
+    """
+
+    expected = []
+    for model, key_field, order_field in ROLLUPS:
+        # Los pedidos archivados siguen contando en los resúmenes; los de
+        # clientes o productos eliminados ya no
+        counters_by_key = {}
+        for queryset in (Order.objects.visible(),
+                         ArchivedOrder.objects.visible()):
+            for row in aggregate_orders(queryset, order_field):
+                counters = counters_by_key.setdefault(
+                    row['key'], dict.fromkeys(COUNTERS, 0))
+                for name in COUNTERS:
+                    counters[name] += row[name] or 0
+        expected.append((model, key_field, counters_by_key))
+
+    archived = _archive_counters(ArchivedOrder.objects.visible())
+    expected.append((ArchiveBalance, 'id',
+                     {ARCHIVE_KEY: archived} if archived['orders'] else {}))
+
+    return expected
+
+
+def find_drift():
+    """
+    Compara los resúmenes guardados con los calculados desde los pedidos.
+
+    Returns:
+        list: Tuplas (tabla, clave, guardado, esperado) de cada diferencia.
+    """
+
+    drift = []
+    empty = {name: 0 for name in COUNTERS}
+
+    for model, key_field, counters_by_key in expected_rollups():
+        stored = {
+            row.pop(key_field): row
+            for row in model.objects.values(key_field, *COUNTERS)
+        }
+        for key in set(stored) | set(counters_by_key):
+            current = stored.get(key, empty)
+            expected = counters_by_key.get(key, empty)
+            if current != expected:
+                drift.append((model.__name__, key, current, expected))
+
+    return drift
+
+
+def rebuild_rollups():
+    """
+    Vuelve a generar todas las tablas de resumen a partir de los pedidos,
+    incluidos los archivados. Debe llamarse dentro de una transacción.
+    """
+
+    for model, key_field, counters_by_key in expected_rollups():
+        model.objects.all().delete()
+        model.objects.bulk_create([
+            model(**{key_field: key}, **counters)
+            for key, counters in counters_by_key.items()
+        ], batch_size=500)
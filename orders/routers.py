@@ -0,0 +1,127 @@
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+
+# Clave de la sesión con el momento hasta el que se lee del primario
+STICKY_KEY = 'orders_primary_until'
+
+_local = threading.local()
+
+
+class ReplicaRouter:
+    """
+    Envía a REPLICA_DATABASE las lecturas de los modelos de orders hechas
+    dentro de una vista marcada con read_replica(); todo lo demás, incluidas
+    las escrituras y las sesiones, va a la base de datos 'default'.
+
+    Registra además si la solicitud escribió en orders, para que
+    ReplicaMiddleware lea del primario durante un tiempo después.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (getattr(_local, 'replica', False) and settings.REPLICA_DATABASE
+                and model._meta.app_label == 'orders'):
+            return settings.REPLICA_DATABASE
+        return None
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label == 'orders':
+            _local.wrote = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # La réplica tiene los mismos datos que el primario
+        return True
+
+
+def on_replica():
+    """
+    Indica si las lecturas en curso van a la réplica.
+
+    Returns:
+        bool: True dentro de una vista read_replica() con réplica activa.
+    """
+
+    return bool(getattr(_local, 'replica', False)
+                and settings.REPLICA_DATABASE)
+
+
+@contextmanager
+def use_replica():
+    """
+    Envía a la réplica las lecturas hechas dentro del bloque.
+    """
+
+    previous = getattr(_local, 'replica', False)
+    _local.replica = True
+    try:
+        yield
+    finally:
+        _local.replica = previous
+
+
+def start_request():
+    """
+    Olvida el estado de la solicitud anterior del mismo hilo.
+    """
+
+    _local.replica = False
+    _local.wrote = False
+
+
+def wrote():
+    """
+    Indica si la solicitud en curso escribió en los modelos de orders.
+
+    Returns:
+        bool: True si hubo alguna escritura.
+    """
+
+    return getattr(_local, 'wrote', False)
+
+
+def _sticky(request):
+    session = getattr(request, 'session', None)
+    return session is not None and session.get(STICKY_KEY, 0) > time.time()
+
+
+def _stream(content):
+    """
+    Lee de la réplica mientras se generan las respuestas en streaming, que
+    consultan la base de datos después de que la vista terminó.
+    """
+
+    with use_replica():
+        yield from content
+
+
+def read_replica(view):
+    """
+    Decorador para las vistas de solo lectura: sus consultas van a la
+    réplica, salvo que la sesión haya escrito hace menos de
+    REPLICA_STICKY_SECONDS, para que vea sus propios cambios aunque la
+    réplica tenga retraso.
+
+    Args:
+        view (function): Vista que no modifica datos.
+
+    Returns:
+        function: La vista que lee de la réplica.
+    """
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not settings.REPLICA_DATABASE or _sticky(request):
+            return view(request, *args, **kwargs)
+
+        with use_replica():
+            response = view(request, *args, **kwargs)
+        if response.streaming:
+            response.streaming_content = _stream(response.streaming_content)
+
+        return response
+
+    return wrapper
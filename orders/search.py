@@ -0,0 +1,282 @@
+import re
+import unicodedata
+
+from django.db.models import Exists, OuterRef, Q
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from .models import ArchivedOrder, Customer, Order, Product, SearchEntry
+
+# Largo máximo de cada palabra del índice
+TOKEN_LENGTH = 50
+
+# Pedidos, clientes o productos que se vuelven a indexar por consulta
+BATCH_SIZE = 1000
+
+# Palabras por búsqueda; las demás se ignoran
+MAX_TERMS = 5
+
+# Campos de las palabras de los pedidos, también de los archivados
+ORDER_FIELDS = ['id', 'bill', 'observation', 'customer__phone_number',
+                'customer__document']
+
+# Campos de los que salen las palabras de cada tipo. El primero es el ID.
+SOURCES = {
+    SearchEntry.ORDER: (Order, ORDER_FIELDS),
+    # Los pedidos archivados se siguen encontrando, con su propio tipo
+    SearchEntry.ARCHIVED_ORDER: (ArchivedOrder, ORDER_FIELDS),
+    SearchEntry.CUSTOMER: (Customer, [
+        'id', 'first_name', 'last_name', 'phone_number', 'document', 'email',
+    ]),
+    SearchEntry.PRODUCT: (Product, ['id', 'name', 'description']),
+}
+
+# Tipo del índice de cada modelo
+MODEL_KINDS = {model: kind for kind, (model, fields) in SOURCES.items()}
+
+_SEPARATORS = re.compile(r'[^0-9a-z]+')
+
+
+def normalize(text):
+    """
+    Pasa un texto a minúsculas y le quita los acentos.
+
+    Args:
+        text (str): El texto.
+
+    Returns:
+        str: El texto normalizado.
+    """
+
+    text = unicodedata.normalize('NFKD', str(text).lower())
+    return ''.join(char for char in text if not unicodedata.combining(char))
+
+
+def tokenize(*values):
+    """
+    Separa los valores en palabras normalizadas, sin repetir. Los números de
+    factura o de teléfono con guiones quedan en varias palabras.
+
+    Args:
+        *values: Textos o números; se ignoran los vacíos.
+
+    Returns:
+        list: Las palabras en orden de aparición.
+    """
+
+    tokens = []
+    for value in values:
+        if value is None:
+            continue
+        for token in _SEPARATORS.split(normalize(value)):
+            token = token[:TOKEN_LENGTH]
+            if token and token not in tokens:
+                tokens.append(token)
+
+    return tokens
+
+
+def _entries(kind, rows):
+    return [
+        SearchEntry(kind=kind, object_id=row[0], token=token)
+        for row in rows for token in tokenize(*row)
+    ]
+
+
+def index(kind, ids, replace=True):
+    """
+    Vuelve a indexar pedidos, clientes o productos: borra sus palabras y las
+    inserta de nuevo a partir de los valores actuales, una consulta por
+    paso y por bloque.
+
+    Args:
+        kind (str): SearchEntry.ORDER, CUSTOMER o PRODUCT.
+        ids (list): IDs a indexar; los que ya no existen o están eliminados
+        solo se borran.
+        replace (bool): False para objetos recién creados, que todavía no
+        tienen palabras que borrar.
+    """
+
+    model, fields = SOURCES[kind]
+    ids = list(ids)
+
+    for start in range(0, len(ids), BATCH_SIZE):
+        batch = ids[start:start + BATCH_SIZE]
+        rows = model.objects.visible().filter(
+            id__in=batch).values_list(*fields)
+        entries = _entries(kind, rows)
+        if replace:
+            remove(kind, batch)
+        SearchEntry.objects.bulk_create(entries, batch_size=500)
+
+
+def index_after(kind, last_id=0, batch_size=BATCH_SIZE, progress=None):
+    """
+    Indexa los objetos de un tipo creados después de last_id, que todavía
+    no tienen palabras en el índice, recorriendo por bloques de IDs para no
+    cargar la tabla completa.
+
+    Args:
+        kind (str): SearchEntry.ORDER, CUSTOMER o PRODUCT.
+        last_id (int): Se indexan los IDs mayores a este.
+        batch_size (int): Objetos por bloque.
+        progress (function): Se llama con la cantidad indexada después de
+        cada bloque.
+
+    Returns:
+        int: La cantidad de objetos indexados.
+    """
+
+    model, fields = SOURCES[kind]
+    count = 0
+
+    while True:
+        rows = list(model.objects.visible().filter(id__gt=last_id).order_by(
+            'id').values_list(*fields)[:batch_size])
+        SearchEntry.objects.bulk_create(_entries(kind, rows), batch_size=500)
+        count += len(rows)
+        if progress and rows:
+            progress(count)
+        if len(rows) < batch_size:
+            return count
+        last_id = rows[-1][0]
+
+
+def remove(kind, ids):
+    """
+    Borra las palabras de los objetos indicados.
+
+    Args:
+        kind (str): SearchEntry.ORDER, CUSTOMER o PRODUCT.
+        ids (list or QuerySet): IDs a borrar; puede ser una subconsulta.
+    """
+
+    SearchEntry.objects.filter(kind=kind, object_id__in=ids).delete()
+
+
+def rebuild(batch_size=BATCH_SIZE, progress=None):
+    """
+    Vacía el índice y lo vuelve a generar completo.
+
+    Args:
+        batch_size (int): Objetos por bloque.
+        progress (function): Se llama con el tipo y la cantidad indexada.
+
+    Returns:
+        dict: La cantidad de objetos indexados por tipo.
+    """
+
+    SearchEntry.objects.all().delete()
+
+    counts = {}
+    for kind in SOURCES:
+        counts[kind] = index_after(
+            kind, batch_size=batch_size,
+            progress=progress and (lambda count: progress(kind, count)))
+
+    return counts
+
+
+def _prefix(term):
+    # Las palabras ya están en minúsculas y sin acentos, así que alcanza con
+    # un rango. En MySQL es el mismo recorrido por rango del índice que haría
+    # LIKE 'term%'; en SQLite, donde corren las pruebas y check_query_plans,
+    # LIKE no usa el índice. '\uffff' queda después de cualquier [0-9a-z] en
+    # los dos motores.
+    return Q(token__gte=term, token__lt=term + '\uffff')
+
+
+def find(query, limit):
+    """
+    Busca los objetos que tienen, para cada palabra de la búsqueda, alguna
+    palabra que empieza con ella.
+
+    Args:
+        query (str): El texto buscado.
+        limit (int): Máximo de resultados.
+
+    Returns:
+        list: Pares (tipo, id), agrupados por tipo y de los más nuevos a
+        los más antiguos.
+    """
+
+    terms = tokenize(query)[:MAX_TERMS]
+    if not terms:
+        return []
+
+    # La palabra más larga es la que menos filas del índice recorre
+    terms.sort(key=len, reverse=True)
+    matches = SearchEntry.objects.filter(_prefix(terms[0]))
+    for number, term in enumerate(terms[1:]):
+        name = f'term{number}'
+        matches = matches.annotate(**{name: Exists(
+            SearchEntry.objects.filter(
+                _prefix(term), kind=OuterRef('kind'),
+                object_id=OuterRef('object_id'))
+        )}).filter(**{name: True})
+
+    return list(matches.values_list('kind', 'object_id').order_by(
+        'kind', '-object_id').distinct()[:limit])
+
+
+def search(query, limit):
+    """
+    Busca pedidos, clientes y productos y arma los resultados a mostrar.
+
+    Args:
+        query (str): El texto buscado.
+        limit (int): Máximo de resultados.
+
+    Returns:
+        list: Diccionarios con el tipo, el ID, el texto y la URL de cada
+        resultado.
+    """
+
+    matches = find(query, limit)
+
+    ids = {}
+    for kind, id in matches:
+        ids.setdefault(kind, []).append(id)
+
+    texts = {}
+    for kind, model, label in [
+            (SearchEntry.ORDER, Order, 'Pedido'),
+            (SearchEntry.ARCHIVED_ORDER, ArchivedOrder, 'Pedido archivado')]:
+        if kind not in ids:
+            continue
+        orders = model.objects.filter(id__in=ids[kind]).values_list(
+            'id', 'product__name', 'customer__first_name',
+            'customer__last_name', 'bill')
+        for id, product, first_name, last_name, bill in orders:
+            text = f'{label} {id}: {product} - {first_name} {last_name or ""}'
+            if bill:
+                text += f' ({bill})'
+            if kind == SearchEntry.ORDER:
+                url = reverse('order_detail', args=[id])
+            else:
+                # Los archivados no tienen detalle: la tabla del archivo
+                # filtrada por su factura o su producto y cliente
+                url = reverse('index') + '?' + urlencode({
+                    'archivo': 1, 'buscar': bill or f'{product} {first_name}'})
+            texts[kind, id] = (text, url)
+    if SearchEntry.CUSTOMER in ids:
+        customers = Customer.objects.filter(
+            id__in=ids[SearchEntry.CUSTOMER]).values_list(
+            'id', 'first_name', 'last_name', 'phone_number')
+        for id, first_name, last_name, phone in customers:
+            texts[SearchEntry.CUSTOMER, id] = (
+                f'Cliente: {first_name} {last_name or ""} ({phone})',
+                reverse('customer_edit_form', args=[id]))
+    if SearchEntry.PRODUCT in ids:
+        products = Product.objects.filter(
+            id__in=ids[SearchEntry.PRODUCT]).values_list('id', 'name')
+        for id, name in products:
+            texts[SearchEntry.PRODUCT, id] = (
+                f'Producto: {name}', reverse('product_edit_form', args=[id]))
+
+    # Un objeto borrado sin actualizar el índice no se muestra
+    return [
+        {'kind': kind, 'id': id, 'text': texts[kind, id][0],
+         'url': texts[kind, id][1]}
+        for kind, id in matches if (kind, id) in texts
+    ]
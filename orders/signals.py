@@ -0,0 +1,55 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import search
+from .cache import bump_table_version
+from .models import Customer, Order, Product, SearchEntry
+
+
+# No se escucha post_delete de Order: con un receptor conectado, Django deja
+# de borrar en bloque los pedidos en cascada y los carga uno por uno. Las
+# vistas que eliminan pedidos invalidan la caché y quitan los pedidos del
+# índice de búsqueda de forma explícita.
+@receiver(post_save, sender=Order)
+@receiver(post_save, sender=Customer)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Customer)
+@receiver(post_delete, sender=Product)
+def invalidate_tables(sender, **kwargs):
+    """
+    Invalida las tablas en caché cuando se guarda o elimina un pedido,
+    cliente o producto.
+    """
+
+    bump_table_version()
+
+
+# Las palabras de los pedidos incluyen el teléfono y el documento del
+# cliente; al editarlos, customer_edit_process vuelve a indexar sus pedidos.
+@receiver(post_save, sender=Order)
+@receiver(post_save, sender=Customer)
+@receiver(post_save, sender=Product)
+def index_object(sender, instance, created, **kwargs):
+    """
+    Actualiza las palabras de un pedido, cliente o producto en el índice de
+    búsqueda.
+    """
+
+    search.index(search.MODEL_KINDS[sender], [instance.id],
+                 replace=not created)
+
+
+@receiver(pre_delete, sender=Customer)
+@receiver(pre_delete, sender=Product)
+def unindex_catalog(sender, instance, **kwargs):
+    """
+    Quita del índice un cliente o producto y los pedidos que se eliminan en
+    cascada con él, antes de que desaparezcan.
+    """
+
+    kind = (SearchEntry.CUSTOMER if sender is Customer
+            else SearchEntry.PRODUCT)
+    search.remove(kind, [instance.id])
+    search.remove(SearchEntry.ORDER, instance.orders.values('id'))
+    search.remove(SearchEntry.ARCHIVED_ORDER,
+                  instance.archived_orders.values('id'))
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.db.models import Count, Max, Sum
+
+from .explain import explain
+from .models import SlowQuery
+from .profiling import normalize_sql
+
+logger = logging.getLogger('orders.queries')
+
+# Consultas sobre las que se puede pedir EXPLAIN en MySQL y SQLite
+EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+
+
+def _plan(alias, sql, params, many):
+    """
+    Obtiene el plan de una consulta lenta, o una cadena vacía si no se puede
+    explicar (executemany, SAVEPOINT, DDL).
+    """
+
+    if many or not sql.lstrip().upper().startswith(EXPLAINABLE):
+        return ''
+
+    try:
+        # El punto de guardado permite seguir usando la transacción actual
+        # si EXPLAIN falla
+        with transaction.atomic(using=alias):
+            return '\n'.join(explain(sql, params, using=connections[alias]))
+    except DatabaseError as error:
+        return f'EXPLAIN falló: {error}'
+
+
+def record(samples, view):
+    """
+    Guarda las consultas lentas de una solicitud con su plan de ejecución y
+    borra las más antiguas para que la tabla no pase de SLOW_QUERY_LIMIT
+    filas.
+
+    Se llama después de la vista, fuera de los medidores de consultas, para
+    que EXPLAIN y los INSERT no se midan ni se registren a sí mismos. Un
+    error al guardar se registra y no afecta a la respuesta.
+
+    Args:
+        samples (list): Tuplas (alias, sql, params, many, duración) de
+        QueryTimer.slow.
+        view (str): Nombre de la URL que ejecutó las consultas.
+    """
+
+    if not samples:
+        return
+
+    rows = []
+    for alias, sql, params, many, duration in samples:
+        statement = normalize_sql(sql)
+        rows.append(SlowQuery(
+            fingerprint=hashlib.sha1(statement.encode()).hexdigest(),
+            statement=statement,
+            params=json.dumps(params, default=str, ensure_ascii=False),
+            view=view,
+            duration=duration,
+            plan=_plan(alias, sql, params, many),
+        ))
+
+    try:
+        with transaction.atomic():
+            SlowQuery.objects.bulk_create(rows)
+            last_id = SlowQuery.objects.order_by('-id').values_list(
+                'id', flat=True).first()
+            SlowQuery.objects.filter(
+                id__lte=last_id - settings.SLOW_QUERY_LIMIT).delete()
+    except DatabaseError:
+        logger.exception('No se pudieron guardar las consultas lentas')
+
+
+def top_offenders(limit=10):
+    """
+    Agrupa las consultas lentas guardadas por SQL normalizado.
+
+    Args:
+        limit (int): Cantidad de consultas a devolver.
+
+    Returns:
+        list: Diccionarios con el SQL, las veces, el tiempo total y máximo
+        en segundos, las vistas y la muestra más lenta (con parámetros y
+        plan), del mayor tiempo total al menor.
+    """
+
+    groups = SlowQuery.objects.values('fingerprint').annotate(
+        count=Count('id'), total=Sum('duration'), slowest=Max('duration'),
+    ).order_by('-total')[:limit]
+
+    offenders = []
+    for group in groups:
+        samples = SlowQuery.objects.filter(fingerprint=group['fingerprint'])
+        group['views'] = sorted(set(samples.values_list('view', flat=True)))
+        group['sample'] = samples.order_by('-duration').first()
+        offenders.append(group)
+
+    return offenders
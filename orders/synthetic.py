@@ -0,0 +1,167 @@
+import random
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import rollups, search
+from .cache import bump_table_version
+from .models import Customer, Order, Product, SearchEntry
+
+FIRST_NAMES = [
+    'María', 'José', 'Juan', 'Ana', 'Carlos', 'Rosa', 'Luis', 'Carmen',
+    'Jorge', 'Laura', 'Pedro', 'Sofía', 'Miguel', 'Lucía', 'Diego', 'Paula',
+    'Andrés', 'Elena', 'Fernando', 'Valeria', 'Ricardo', 'Gabriela',
+    'Sergio', 'Natalia',
+]
+
+LAST_NAMES = [
+    'González', 'Benítez', 'Martínez', 'López', 'Giménez', 'Vera',
+    'Rodríguez', 'Duarte', 'Fernández', 'Ramírez', 'Acosta', 'Báez',
+    'Villalba', 'Ortiz', 'Rojas', 'Cáceres', 'Núñez', 'Ayala',
+]
+
+STREETS = [
+    'Avda. España', 'Mcal. López', 'Avda. Artigas', 'Eusebio Ayala',
+    'Brasilia', 'Sacramento', 'Avda. Santa Teresa', 'Choferes del Chaco',
+]
+
+PRODUCT_KINDS = [
+    'Bandeja', 'Posavasos', 'Mesa', 'Reloj', 'Llavero', 'Tabla', 'Portarretrato',
+    'Cuadro', 'Lámpara', 'Joyero', 'Maceta', 'Espejo',
+]
+
+PRODUCT_STYLES = [
+    'Océano', 'Mármol', 'Dorado', 'Flores', 'Galaxia', 'Madera', 'Ámbar',
+    'Cristal',
+]
+
+# Filas creadas por transacción
+BATCH_SIZE = 5000
+
+
+def _customer(rng, number):
+    first_name = rng.choice(FIRST_NAMES)
+    last_name = rng.choice(LAST_NAMES)
+
+    return Customer(
+        first_name=first_name,
+        last_name=last_name,
+        phone_number=f'09{rng.randint(71, 99)}{rng.randint(0, 999999):06d}',
+        email=f'{first_name}.{last_name}{number}@correo.com.py'.lower(),
+        document=str(rng.randint(800000, 7999999)),
+        address=f'{rng.choice(STREETS)} {rng.randint(100, 9999)}',
+    )
+
+
+def _product(rng, number):
+    kind = rng.choice(PRODUCT_KINDS)
+    style = rng.choice(PRODUCT_STYLES)
+
+    return Product(name=f'{kind} {style} {number}',
+                   description=f'{kind} de resina, estilo {style.lower()}')
+
+
+def _create(model, count, build, rng, batch_size):
+    """
+    Crea filas por bloques y devuelve sus IDs.
+
+    Args:
+        model (Model): Customer o Product.
+        count (int): Cantidad de filas.
+        build (function): Crea una instancia a partir del generador y un
+        número correlativo.
+        rng (Random): Generador de números aleatorios.
+        batch_size (int): Filas por transacción.
+
+    Returns:
+        list: Los IDs creados.
+    """
+
+    last_id = model.objects.order_by('-id').values_list(
+        'id', flat=True).first() or 0
+
+    for start in range(0, count, batch_size):
+        with transaction.atomic():
+            model.objects.bulk_create(
+                [build(rng, number)
+                 for number in range(start, min(start + batch_size, count))],
+                batch_size=500)
+
+    # bulk_create solo devuelve los id en PostgreSQL
+    return list(model.objects.filter(id__gt=last_id).values_list(
+        'id', flat=True))
+
+
+def _order(rng, customer_ids, product_prices, today, days):
+    product_id, price = rng.choice(product_prices)
+    deadline = today + timedelta(days=rng.randint(-days, 30))
+
+    # Casi todos los pedidos vencidos están entregados
+    delivered = None
+    if deadline <= today and rng.random() < 0.9:
+        delivered = min(deadline + timedelta(days=rng.randint(-3, 3)), today)
+
+    return Order(
+        # Pocos clientes concentran muchos pedidos
+        customer_id=customer_ids[
+            int(len(customer_ids) * rng.random() ** 2)],
+        product_id=product_id,
+        observation=rng.choice(['', '', '', 'Envío', 'Con tarjeta', 'Urgente']),
+        amount=min(int(rng.expovariate(0.5)) + 1, 20),
+        price=price,
+        deadline=deadline,
+        delivered=delivered,
+        bill=f'001-001-{rng.randint(1, 9999999):07d}'
+             if rng.random() < 0.7 else '',
+    )
+
+
+def generate(customers, products, orders, seed=0, days=730,
+             batch_size=BATCH_SIZE, progress=None):
+    """
+    Crea clientes, productos y pedidos con valores realistas para medir las
+    vistas con volúmenes de producción. Con la misma semilla se generan los
+    mismos datos.
+
+    Args:
+        customers (int): Clientes a crear.
+        products (int): Productos a crear.
+        orders (int): Pedidos a crear.
+        seed (int): Semilla del generador aleatorio.
+        days (int): Días hacia atrás en los que se reparten las entregas.
+        batch_size (int): Filas creadas por transacción.
+        progress (function): Se llama con la cantidad de pedidos creados
+        después de cada bloque.
+    """
+
+    rng = random.Random(seed)
+    today = timezone.localdate()
+
+    last_order_id = Order.objects.order_by('-id').values_list(
+        'id', flat=True).first() or 0
+    customer_ids = _create(Customer, customers, _customer, rng, batch_size)
+    product_ids = _create(Product, products, _product, rng, batch_size)
+    if orders and not (customer_ids and product_ids):
+        raise ValueError('Se necesita al menos un cliente y un producto')
+
+    # Cada producto tiene un precio de lista en guaraníes
+    product_prices = [(id, rng.randrange(15000, 500000, 500))
+                      for id in product_ids]
+
+    for start in range(0, orders, batch_size):
+        with transaction.atomic():
+            Order.objects.bulk_create([
+                _order(rng, customer_ids, product_prices, today, days)
+                for i in range(start, min(start + batch_size, orders))
+            ], batch_size=500)
+        if progress:
+            progress(min(start + batch_size, orders))
+
+    # Los resúmenes y el índice de búsqueda se calculan una sola vez al final
+    with transaction.atomic():
+        rollups.rebuild_rollups()
+        search.index(SearchEntry.CUSTOMER, customer_ids)
+        search.index(SearchEntry.PRODUCT, product_ids)
+        search.index_after(SearchEntry.ORDER, last_order_id)
+        bump_table_version()
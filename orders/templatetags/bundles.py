@@ -0,0 +1,45 @@
+import json
+
+from django import template
+from django.utils.html import format_html_join
+
+from orders import assets
+
+register = template.Library()
+
+
+@register.simple_tag
+def bundle(name):
+    """
+    Genera las etiquetas <link> o <script> de un paquete de orders/assets.py,
+    con el archivo con hash del manifiesto o con los archivos originales.
+
+    Args:
+        name (str): El nombre del paquete, por ejemplo 'tables.js'.
+
+    Returns:
+        str: El HTML de las etiquetas.
+    """
+
+    if name.endswith('.css'):
+        tag = '<link rel="stylesheet" href="{}">'
+    else:
+        tag = '<script src="{}"></script>'
+
+    return format_html_join('\n', tag, ((url,) for url in assets.urls(name)))
+
+
+@register.simple_tag
+def bundle_urls(name):
+    """
+    Obtiene las URLs de un paquete como JSON, para cargarlo desde
+    JavaScript cuando se necesita.
+
+    Args:
+        name (str): El nombre del paquete, por ejemplo 'export.js'.
+
+    Returns:
+        str: Lista JSON de URLs; se escapa al insertarse en la plantilla.
+    """
+
+    return json.dumps(assets.urls(name))
@@ -1,3 +1,1562 @@
-from django.test import TestCase
+import gzip
+import importlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import date, timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection, connections
+from django.http import HttpResponse
+from django.template import engines
+from django.template.base import Template
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         TransactionTestCase, override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import (archive, assets, events, metrics, pdf, rollups, routers,
+               search, views)
+from .cache import VERSION_KEY, can_store, table_version
+from .explain import explain, full_scans
+from .exports import iter_rows
+from .imports import import_csv
+from .models import (ArchivedOrder, Customer, DailyBalance, Order,
+                     OrderEvent, Product, SearchEntry, SlowQuery)
+from .profiling import (QueryBudgetExceeded, QueryInspector, TemplateTimer,
+                        normalize_sql, query_budget, report_duplicates)
+from .urls import urlpatterns
 
 # Create your tests here.
+
+
+def create_orders(count, delivered_every=0, customers=1, products=1):
+    """
+    Crea clientes, productos y una cantidad de pedidos para las pruebas.
+
+    Args:
+        count (int): Cantidad de pedidos a crear.
+        delivered_every (int): Si es mayor a cero, marca como entregado uno
+        de cada 'delivered_every' pedidos.
+        customers (int): Cantidad de clientes entre los que se reparten.
+        products (int): Cantidad de productos entre los que se reparten.
+
+    Returns:
+        tuple: Las listas de clientes y productos creados.
+
+    Los resúmenes de balances se regeneran y la caché de las tablas se vacía
+    después de crear los pedidos.
+    """
+
+    all_customers = [
+        Customer.objects.create(
+            first_name=f'Maria{i}', last_name='Lopez',
+            phone_number='0981123456')
+        for i in range(customers)
+    ]
+    all_products = [
+        Product.objects.create(name=f'Bandeja{i}', description='Resina')
+        for i in range(products)
+    ]
+
+    Order.objects.bulk_create([
+        Order(
+            customer=all_customers[i % customers],
+            product=all_products[i % products],
+            amount=(i % 5) + 1,
+            price=1000,
+            deadline=date(2023, 1, 1) + timedelta(days=i % 30),
+            delivered=(
+                date(2023, 2, 1)
+                if delivered_every and i % delivered_every == 0 else None
+            ),
+            bill=f'F-{i:05d}',
+        )
+        for i in range(count)
+    ])
+    rollups.rebuild_rollups()
+    cache.clear()
+
+    return all_customers, all_products
+
+
+class ServerSideDataTest(TestCase):
+
+    def setUp(self):
+        create_orders(45, delivered_every=3)
+
+    def get_page(self, name, **params):
+        response = self.client.get(reverse(name), params)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_first_page(self):
+        data = self.get_page('index_data', draw=1, start=0, length=10)
+
+        self.assertEqual(data['draw'], 1)
+        self.assertEqual(data['recordsTotal'], 45)
+        self.assertEqual(data['recordsFiltered'], 45)
+        self.assertEqual(len(data['data']), 10)
+        self.assertEqual(data['data'][0]['total'], 1000)
+
+    def test_status_filters(self):
+        to_deliver = self.get_page('to_deliver_data', length=100)
+        delivered = self.get_page('delivered_data', length=100)
+
+        self.assertEqual(to_deliver['recordsTotal'], 30)
+        self.assertEqual(delivered['recordsTotal'], 15)
+        self.assertTrue(all(row['delivered'] is None
+                            for row in to_deliver['data']))
+
+    def test_search(self):
+        data = self.get_page('index_data', **{'search[value]': 'F-0001'})
+
+        self.assertEqual(data['recordsTotal'], 45)
+        self.assertEqual(data['recordsFiltered'], 10)
+
+    def test_customer_without_last_name(self):
+        Customer.objects.update(last_name=None)
+        cache.clear()
+        data = self.get_page('index_data', length=1)
+
+        self.assertEqual(data['data'][0]['customer'], 'Maria0 ')
+
+    def test_totals_in_database(self):
+        data = self.get_page(
+            'index_data', length=100, min_total=4000,
+            **{'order[0][column]': 5, 'order[0][dir]': 'desc'})
+        totals = [row['total'] for row in data['data']]
+
+        self.assertEqual(data['recordsFiltered'], 18)
+        self.assertEqual(data['revenue'], sum(totals))
+        self.assertEqual(totals, sorted(totals, reverse=True))
+        self.assertTrue(all(total >= 4000 for total in totals))
+
+    def test_cursor_matches_offset(self):
+        order = {'order[0][column]': 6, 'order[0][dir]': 'desc'}
+        first = self.get_page('index_data', start=0, length=10, **order)
+        by_cursor = self.get_page(
+            'index_data', start=10, length=10, cursor=first['cursor'],
+            **order)
+        by_offset = self.get_page('index_data', start=10, length=10, **order)
+
+        self.assertEqual(
+            [row['id'] for row in by_cursor['data']],
+            [row['id'] for row in by_offset['data']])
+
+
+class QueryBudgetTest(TestCase):
+    """
+    Fija la cantidad de consultas SQL de cada vista que lista pedidos, para
+    que un acceso a una relación por fila (N+1) haga fallar las pruebas.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customers, cls.products = create_orders(
+            2000, delivered_every=2, customers=200, products=50)
+        cls.order = Order.objects.first()
+
+    def assertQueryBudget(self, budget, url, params=None):
+        # Presupuesto en frío: incluye las consultas del ETag/Last-Modified
+        cache.clear()
+        with self.assertNumQueries(budget):
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+
+    def test_balance_pages(self):
+        for name in ('index', 'to_deliver', 'delivered'):
+            with self.subTest(name=name):
+                self.assertQueryBudget(0, reverse(name))
+
+    def test_balance_data(self):
+        # Las tablas con pedidos entregados restan además los archivados
+        budgets = {'index_data': 8, 'to_deliver_data': 7, 'delivered_data': 8}
+        for name, budget in budgets.items():
+            with self.subTest(name=name):
+                self.assertQueryBudget(budget, reverse(name), {'length': 100})
+                self.assertQueryBudget(
+                    budget + 1, reverse(name),
+                    {'length': 100, 'search[value]': 'Maria1'})
+
+    def test_agenda_and_overdue(self):
+        self.assertQueryBudget(6, reverse('agenda'), {'mes': '2023-01'})
+        self.assertQueryBudget(7, reverse('overdue'))
+
+    def test_order_detail(self):
+        self.assertQueryBudget(
+            3, reverse('order_detail', args=[self.order.id]))
+
+    def test_order_forms(self):
+        self.assertQueryBudget(0, reverse('order_form'))
+        self.assertQueryBudget(
+            1, reverse('edit_order_form', args=[self.order.id]))
+
+    def test_typeahead_search(self):
+        self.assertQueryBudget(
+            1, reverse('customer_search'), {'q': 'maria1'})
+        self.assertQueryBudget(1, reverse('product_search'), {'q': 'Band'})
+
+    def test_customer_and_product_lists(self):
+        self.assertQueryBudget(2, reverse('customers'))
+        self.assertQueryBudget(2, reverse('products'))
+
+
+class PriceMigrationTest(SimpleTestCase):
+
+    def test_parse_price(self):
+        migration = importlib.import_module(
+            'orders.migrations.0009_order_price_numeric')
+        prices = {
+            '1500': 1500, '1.500': 1500, '1,500': 1500, 'Gs. 25.000': 25000,
+            '1500.50': 1501, '1500,40': 1500, '1.234,56': 1235,
+            '1,234,567.8': 1234568, '': None, 'a convenir': None,
+            '1.5.000': None, '-5': None,
+        }
+        for text, price in prices.items():
+            self.assertEqual(migration.parse_price(text), price, text)
+
+
+class RollupTest(TestCase):
+
+    def setUp(self):
+        self.customer = Customer.objects.create(
+            first_name='Maria', last_name='Lopez', phone_number='0981123456')
+        self.product = Product.objects.create(name='Bandeja')
+
+    def order_data(self, **changes):
+        data = {
+            'product_id': self.product.id,
+            'customer_id': self.customer.id,
+            'observation': '',
+            'amount': '2',
+            'price': '15000',
+            'deadline': '2023-05-10',
+            'bill': 'F-1',
+        }
+        data.update(changes)
+        return data
+
+    def test_views_keep_rollups_in_sync(self):
+        self.client.post(reverse('process_order'), self.order_data())
+        self.client.post(reverse('process_order'), self.order_data(amount='1'))
+        order = Order.objects.first()
+
+        day = DailyBalance.objects.get(day=date(2023, 5, 10))
+        self.assertEqual((day.orders, day.units, day.revenue), (2, 3, 45000))
+
+        self.client.get(reverse('order_delivered', args=[order.id]))
+        self.client.post(
+            reverse('process_edit', args=[order.id]),
+            self.order_data(deadline='2023-05-11', price='20000'))
+        self.client.get(reverse('delete_order', args=[Order.objects.last().id]))
+
+        self.assertEqual(rollups.find_drift(), [])
+        self.assertEqual(self.customer.balance.revenue, 40000)
+        self.assertEqual(self.customer.balance.delivered_revenue, 40000)
+
+        self.client.get(reverse('delete_customer', args=[self.customer.id]))
+        self.assertEqual(rollups.find_drift(), [])
+
+    def test_check_and_rebuild_command(self):
+        create_orders(30, delivered_every=4)
+        Order.objects.update(amount=9)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_rollups', check=True, stdout=StringIO())
+
+        call_command('rebuild_rollups', stdout=StringIO())
+        call_command('rebuild_rollups', check=True, stdout=StringIO())
+
+        response = self.client.get(
+            reverse('summary'), {'desde': '2023-01-01', 'hasta': '2023-01-31'})
+        self.assertEqual(response.context['totals']['orders'], 30)
+
+    def test_migration_fills_rollups(self):
+        create_orders(30, delivered_every=4, customers=3, products=2)
+        for model, _, _ in rollups.ROLLUPS:
+            model.objects.all().delete()
+
+        migration = importlib.import_module(
+            'orders.migrations.0010_balance_rollups')
+        migration.fill_rollups(django_apps, None)
+
+        self.assertEqual(rollups.find_drift(), [])
+
+
+class QueryPlanTest(TestCase):
+
+    def test_full_scans(self):
+        self.assertEqual(full_scans(['SCAN orders_order']),
+                         ['SCAN orders_order'])
+        # Un LIMIT no alcanza si el recorrido no usa un índice
+        self.assertEqual(
+            full_scans(['SCAN orders_order', 'USE TEMP B-TREE FOR ORDER BY']),
+            ['SCAN orders_order', 'USE TEMP B-TREE FOR ORDER BY'])
+        self.assertEqual(
+            full_scans(['SCAN orders_order USING INDEX '
+                        'order_status_deadline_idx']), [])
+        self.assertEqual(
+            full_scans(['SEARCH orders_order USING INDEX '
+                        'order_status_deadline_idx (delivered=?)']), [])
+        self.assertEqual(
+            full_scans(['SCAN orders_archivedorder']),
+            ['SCAN orders_archivedorder'])
+        self.assertEqual(
+            full_scans(['id=1 table=orders_order type=ALL rows=9']),
+            ['id=1 table=orders_order type=ALL rows=9'])
+        # La clave primaria se recorre en orden hasta el LIMIT
+        self.assertEqual(full_scans(
+            ['SCAN orders_order'],
+            sql='SELECT ... ORDER BY "orders_order"."id" ASC  LIMIT 10'), [])
+        # Ordenar aparte las filas de un listado tampoco se acepta
+        self.assertEqual(
+            full_scans(['SEARCH orders_order USING INDEX '
+                        'order_customer_deadline_idx (customer_id=?)',
+                        'USE TEMP B-TREE FOR ORDER BY']),
+            ['USE TEMP B-TREE FOR ORDER BY'])
+        self.assertEqual(
+            full_scans(['id=1 table=orders_order type=ref key=PRIMARY '
+                        'Extra=Using where; Using filesort']),
+            ['id=1 table=orders_order type=ref key=PRIMARY '
+             'Extra=Using where; Using filesort'])
+        self.assertEqual(
+            full_scans(['SEARCH orders_searchentry USING COVERING INDEX '
+                        'orders_sear_token_39aecc_idx (token>? AND token<?)',
+                        'USE TEMP B-TREE FOR ORDER BY']), [])
+
+    def test_catalog_join_listing_fails(self):
+        create_orders(3000, delivered_every=2, customers=300, products=50)
+        Customer.objects.filter(id__in=Customer.objects.values('id')[:3]) \
+            .update(deleted_at=timezone.now())
+
+        # El filtro de visible() con JOIN, como estaba antes: el motor parte
+        # de los clientes sin eliminar y ordena todos sus pedidos
+        listing = Order.objects.filter(
+            customer__deleted_at__isnull=True,
+            product__deleted_at__isnull=True,
+        ).select_related('customer', 'product').order_by('id')[:10]
+        sql, params = listing.query.get_compiler('default').as_sql()
+        self.assertNotEqual(full_scans(explain(sql, params), sql=sql), [])
+
+        listing = Order.objects.visible().select_related(
+            'customer', 'product').order_by('id')[:10]
+        sql, params = listing.query.get_compiler('default').as_sql()
+        self.assertEqual(full_scans(explain(sql, params), sql=sql), [])
+
+    def test_views_avoid_full_scans(self):
+        call_command('check_query_plans', orders=2000, stdout=StringIO())
+        self.assertFalse(Order.objects.exists())
+
+    def test_repeated_runs_leave_cache_clean(self):
+        cache.clear()
+        for _ in range(2):
+            output = StringIO()
+            call_command('check_query_plans', orders=300, verbosity=2,
+                         stdout=output)
+
+        # La segunda revisión también ejecuta las consultas de las tablas
+        for name in ['index_data', 'to_deliver_data', 'delivered_data']:
+            self.assertRegex(output.getvalue(),
+                             rf'{reverse(name)}: SEARCH orders_order')
+
+        response = self.client.get(reverse('index_data'))
+        self.assertEqual(json.loads(response.content)['recordsTotal'], 0)
+
+
+class ExportTest(TestCase):
+
+    def setUp(self):
+        create_orders(25, delivered_every=5)
+
+    def download(self, dataset, **params):
+        response = self.client.get(reverse('export', args=[dataset]), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_csv_uses_balance_filters(self):
+        content = self.download('pedidos', estado='entregados')
+        lines = content.decode('utf-8-sig').splitlines()
+
+        self.assertEqual(lines[0].split(',')[0], 'N°')
+        self.assertEqual(len(lines), 1 + 5)
+
+    def test_xlsx_is_valid_workbook(self):
+        content = self.download('pedidos', formato='xlsx', buscar='F-0001')
+        archive = zipfile.ZipFile(BytesIO(content))
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode()
+
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(sheet.count('<row>'), 1 + 10)
+
+    def test_customers_and_unknown_dataset(self):
+        content = self.download('clientes')
+        self.assertIn('Maria0', content.decode('utf-8-sig'))
+
+        response = self.client.get(reverse('export', args=['otros']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_rows_read_in_chunks(self):
+        with self.assertNumQueries(4):
+            rows = list(iter_rows(Order.objects.all(), ['id'], chunk_size=10))
+        self.assertEqual(len(rows), 25)
+
+
+class PdfTest(TestCase):
+
+    def setUp(self):
+        create_orders(60, delivered_every=2)
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+
+    def download(self, url, params=None):
+        with override_settings(PDF_CACHE_DIR=self.cache_dir):
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content)
+        self.assertTrue(content.startswith(b'%PDF-1.4'))
+        return content
+
+    def test_balance_pdf_is_cached_by_content(self):
+        first = self.download(reverse('balance_pdf'), {'estado': 'entregados'})
+        second = self.download(
+            reverse('balance_pdf'), {'estado': 'entregados'})
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+        Order.objects.filter(delivered__isnull=False).update(amount=3)
+        self.download(reverse('balance_pdf'), {'estado': 'entregados'})
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+
+    def test_balance_pdf_caps_rows(self):
+        revenue = rollups.balance_totals('delivered')[1]
+        with override_settings(PDF_MAX_ROWS=10):
+            with self.assertNumQueries(3):
+                content = self.download(
+                    reverse('balance_pdf'), {'estado': 'entregados'})
+
+        self.assertIn(b'Total: %d - 30 pedidos, se muestran los primeros 10'
+                      % revenue, content)
+        self.assertEqual(content.count(b'Por entregar'), 0)
+
+    def test_cache_keeps_newest_files(self):
+        with override_settings(PDF_CACHE_MAX_FILES=2):
+            for order in Order.objects.order_by('id')[:3]:
+                self.download(reverse('order_pdf', args=[order.id]))
+            # Reutilizar el segundo lo conserva frente al tercero
+            second = Order.objects.order_by('id')[1]
+            os.utime(os.path.join(self.cache_dir, os.listdir(
+                self.cache_dir)[0]), (0, 0))
+            self.download(reverse('order_pdf', args=[second.id]))
+
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+        self.assertEqual(pdf.prune(self.cache_dir, 1), 1)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+    def test_slow_render_is_busy(self):
+        payload = {'title': 'Lento', 'headers': ['A'], 'widths': [1],
+                   'rows': [[i] for i in range(20000)]}
+
+        with override_settings(PDF_CACHE_DIR=self.cache_dir):
+            with self.assertRaises(pdf.PdfBusy):
+                pdf.render_cached('table', payload, timeout=0.001)
+
+            # El PDF se guarda al terminar y el siguiente intento lo lee
+            for _ in range(100):
+                if os.listdir(self.cache_dir):
+                    break
+                time.sleep(0.1)
+            with pdf.render_cached('table', payload,
+                                   timeout=0.001) as document:
+                name = os.path.basename(document.name)
+
+        self.assertEqual(os.listdir(self.cache_dir), [name])
+
+    def test_cached_file_survives_prune(self):
+        payload = {'title': 'Corto', 'headers': ['A'], 'widths': [1],
+                   'rows': [[1]]}
+
+        with override_settings(PDF_CACHE_DIR=self.cache_dir):
+            pdf.render_cached('table', payload).close()
+            with pdf.render_cached('table', payload) as document:
+                # Otra solicitud borra el archivo después de que se abrió
+                pdf.prune(self.cache_dir, 0)
+                self.assertEqual(os.listdir(self.cache_dir), [])
+                self.assertTrue(document.read().startswith(b'%PDF-1.4'))
+
+    def test_order_slip(self):
+        order = Order.objects.first()
+        content = self.download(reverse('order_pdf', args=[order.id]))
+
+        self.assertIn(b'Pedido numero: %d' % order.id, content)
+
+
+class TableCacheTest(TransactionTestCase):
+
+    def setUp(self):
+        create_orders(30)
+
+    def get_data(self, draw):
+        response = self.client.get(reverse('index_data'), {'draw': draw})
+        return json.loads(response.content)
+
+    def test_pages_cached_until_write(self):
+        first = self.get_data(1)
+        with self.assertNumQueries(0):
+            second = self.get_data(2)
+
+        self.assertEqual(second['draw'], 2)
+        self.assertEqual(first['data'], second['data'])
+
+        order = Order.objects.get(id=first['data'][0]['id'])
+        order.bill = 'EDITADO'
+        order.save()
+
+        self.assertEqual(self.get_data(3)['data'][0]['bill'], 'EDITADO')
+
+    def test_delete_invalidates(self):
+        first = self.get_data(1)
+        self.client.get(reverse('delete_order', args=[first['data'][0]['id']]))
+
+        self.assertEqual(self.get_data(2)['recordsTotal'], 29)
+
+
+class ConditionalGetTest(TransactionTestCase):
+
+    def setUp(self):
+        create_orders(10)
+
+    def revalidate(self, url):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('no-cache', first['Cache-Control'])
+        return self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+    def test_unchanged_pages_return_304(self):
+        order = Order.objects.first()
+        for url in (reverse('index_data'), reverse('summary'),
+                    reverse('customers'), reverse('products'),
+                    reverse('order_detail', args=[order.id])):
+            with self.subTest(url=url):
+                response = self.revalidate(url)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+
+    def test_changed_pages_return_200(self):
+        url = reverse('order_detail', args=[Order.objects.first().id])
+        etag = self.client.get(url)['ETag']
+
+        product = Product.objects.first()
+        product.name = 'Otro nombre'
+        product.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = self.client.get(reverse('index_data'))['ETag']
+        self.client.get(reverse('delete_order', args=[Order.objects.first().id]))
+        response = self.client.get(
+            reverse('index_data'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_large_pages_are_compressed(self):
+        create_orders(200)
+        response = self.client.get(
+            reverse('index_data'), {'length': 100},
+            HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+
+class TypeaheadSearchTest(TestCase):
+
+    def setUp(self):
+        create_orders(0, customers=30, products=5)
+        Customer.objects.create(
+            first_name='Pedro', last_name='Benitez', phone_number='0971555000',
+            document='4123456')
+
+    def search(self, name, **params):
+        response = self.client.get(reverse(name), params)
+        return json.loads(response.content)['results']
+
+    def test_customer_prefix_fields(self):
+        self.assertEqual(len(self.search('customer_search', q='maria29')), 1)
+        self.assertEqual(len(self.search('customer_search', q='MARIA')), 10)
+        self.assertEqual(
+            len(self.search('customer_search', q='maria', limit=500)), 30)
+        for term in ('pedro', 'beni', '0971', '4123'):
+            with self.subTest(term=term):
+                results = self.search('customer_search', q=term)
+                self.assertEqual(len(results), 1)
+                self.assertIn('Pedro Benitez', results[0]['text'])
+
+    def test_prefix_only(self):
+        self.assertEqual(self.search('customer_search', q='aria'), [])
+        self.assertEqual(self.search('customer_search', q=''), [])
+
+    def test_product_search(self):
+        results = self.search('product_search', q='bandeja3')
+        self.assertEqual(results, [
+            {'id': Product.objects.get(name='Bandeja3').id,
+             'text': 'Bandeja3'}])
+
+
+class ImportTest(TestCase):
+
+    def setUp(self):
+        create_orders(0)
+
+    def test_orders_batched_with_row_errors(self):
+        rows = ['product_name,customer_phone,amount,price,deadline,bill']
+        rows += [f'Bandeja0,0981123456,2,1500,2023-03-{i % 28 + 1:02d},F-{i}'
+                 for i in range(40)]
+        rows += ['Otro,0981123456,1,1500,2023-03-01,',
+                 'Bandeja0,0981123456,x,15,03/01/2023,',
+                 'Bandeja0,0981123456,1,1500,03/01/2023,']
+
+        # Por bloque: una búsqueda de productos, una de clientes, un INSERT,
+        # un INSERT y un UPDATE por tabla de resumen, una consulta para leer
+        # los ID del bloque, dos para indexar los pedidos nuevos en la
+        # búsqueda y dos para registrar sus eventos de creación
+        with self.assertNumQueries(36):
+            report = import_csv('pedidos', StringIO('\n'.join(rows)),
+                                batch_size=20)
+
+        self.assertEqual(report.created, 40)
+        self.assertEqual([line for line, errors in report.errors],
+                         [42, 43, 44])
+        self.assertIn('Elige un producto para el pedido', report.errors[0][1])
+        # Todos los errores de la fila, aunque la cantidad no sea un número
+        self.assertEqual(report.errors[1][1], [
+            'Introducir cantidad', 'Introducir precio',
+            'Fecha de entrega inválida (AAAA-MM-DD)'])
+        self.assertEqual(Order.objects.count(), 40)
+        self.assertEqual(rollups.find_drift(), [])
+
+    def test_ignores_rows_inserted_concurrently(self):
+        customer = Customer.objects.get()
+        product = Product.objects.get()
+        add_orders = rollups.add_orders
+        others = []
+
+        def insert_other(objects):
+            # Otra solicitud crea un pedido mientras se importa el bloque
+            others.append(Order.objects.create(
+                customer=customer, product=product, amount=1, price=10,
+                deadline=date(2023, 3, 1)).id)
+            add_orders(objects)
+
+        rows = ('product_name,customer_phone,amount,price,deadline\n'
+                'Bandeja0,0981123456,2,1500,2023-03-01\n')
+        with mock.patch.object(rollups, 'add_orders', insert_other):
+            import_csv('pedidos', StringIO(rows))
+
+        imported = Order.objects.exclude(id__in=others).get()
+        self.assertEqual(list(OrderEvent.objects.values_list(
+            'order_id', flat=True)), [imported.id])
+
+        # El pedido de la otra solicitud no se indexó dos veces
+        entries = SearchEntry.objects.filter(
+            kind=SearchEntry.ORDER, object_id__in=others)
+        count = entries.count()
+        search.index(SearchEntry.ORDER, others)
+        self.assertEqual(entries.count(), count)
+
+    def test_upload_view_and_command(self):
+        upload = SimpleUploadedFile(
+            'clientes.csv',
+            '﻿first_name,phone_number\nJuana,0981000111\nAn,1\n'.encode())
+        response = self.client.post(reverse('import_data'),
+                                    {'tipo': 'clientes', 'archivo': upload})
+
+        self.assertEqual(response.context['report'].created, 1)
+        self.assertContains(response, 'Minimo 6 digitos')
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv',
+                                         delete=False) as file:
+            file.write('name,description\nBandeja Grande,Resina\n')
+        self.addCleanup(os.remove, file.name)
+        call_command('import_csv', 'productos', file.name, stdout=StringIO())
+        self.assertTrue(Product.objects.filter(name='Bandeja Grande').exists())
+
+
+class BulkActionTest(TestCase):
+
+    def setUp(self):
+        create_orders(30, delivered_every=3, customers=3, products=2)
+
+    def bulk(self, action, ids, **data):
+        return self.client.post(reverse('bulk_orders'), dict(
+            data, accion=action, ids=[str(id) for id in ids]))
+
+    def test_deliver_reopen_and_delete(self):
+        pending = list(Order.objects.filter(
+            delivered__isnull=True).values_list('id', flat=True))
+
+        response = self.bulk('entregar', pending, volver='to_deliver')
+        self.assertRedirects(response, reverse('to_deliver'))
+        self.assertFalse(Order.objects.filter(delivered__isnull=True).exists())
+        self.assertEqual(rollups.find_drift(), [])
+
+        self.bulk('reabrir', pending[:5])
+        self.assertEqual(
+            Order.objects.filter(delivered__isnull=True).count(), 5)
+        self.assertEqual(rollups.find_drift(), [])
+
+        self.bulk('eliminar', pending[:12])
+        self.assertEqual(Order.objects.count(), 18)
+        self.assertEqual(rollups.find_drift(), [])
+
+    def test_single_statement_per_action(self):
+        ids = list(Order.objects.values_list('id', flat=True))
+
+        for action, statement in [('entregar', 'UPDATE "orders_order"'),
+                                  ('reabrir', 'UPDATE "orders_order"'),
+                                  ('eliminar', 'DELETE FROM "orders_order"')]:
+            with self.subTest(action=action):
+                with CaptureQueriesContext(connection) as context:
+                    self.bulk(action, ids)
+                writes = [query['sql'] for query in context.captured_queries
+                          if query['sql'].startswith(statement)]
+                self.assertEqual(len(writes), 1)
+                # Un UPDATE por resta y otro por suma, para todos los días
+                rollup_writes = [
+                    query['sql'] for query in context.captured_queries
+                    if query['sql'].startswith('UPDATE "orders_dailybalance"')]
+                self.assertEqual(len(rollup_writes),
+                                 1 if action == 'eliminar' else 2)
+
+    def test_invalid_requests(self):
+        response = self.bulk('borrar', [1], volver='http://example.com')
+        self.assertRedirects(response, reverse('index'))
+        self.assertEqual(Order.objects.count(), 30)
+
+
+class DeliveryToggleTest(TransactionTestCase):
+
+    def setUp(self):
+        create_orders(1)
+        self.order = Order.objects.get()
+
+    def test_update_only_touches_delivery(self):
+        with CaptureQueriesContext(connection) as context:
+            self.assertTrue(self.order.deliver_product())
+
+        updates = [query['sql'] for query in context.captured_queries
+                   if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('CASE WHEN', updates[0])
+        self.assertNotIn('"price"', updates[0])
+
+        self.assertFalse(self.order.deliver_product())
+        self.assertIsNone(Order.objects.get().delivered)
+
+    def test_concurrent_toggles_are_not_lost(self):
+        threads, clicks = 8, 5
+        errors = []
+
+        def click():
+            done = 0
+            try:
+                while done < clicks:
+                    try:
+                        response = views.order_delivered(
+                            RequestFactory().get('/'), self.order.id)
+                    except OperationalError:
+                        # SQLite en memoria no espera a que se libere el
+                        # bloqueo; la transacción se revirtió, se reintenta
+                        continue
+                    if response.status_code != 302:
+                        errors.append(response.status_code)
+                    done += 1
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=click) for i in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        # Un número par de cambios deja el pedido como estaba
+        self.assertEqual(errors, [])
+        self.assertIsNone(Order.objects.get().delivered)
+        self.assertEqual(rollups.find_drift(), [])
+
+
+class BenchmarkTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_generated_data_is_valid_and_repeatable(self):
+        call_command('generate_data', orders=300, customers=20, products=6,
+                     seed=7, verbosity=0, stdout=StringIO())
+
+        self.assertEqual(Order.objects.count(), 300)
+        self.assertEqual(rollups.find_drift(), [])
+        for order in Order.objects.select_related('product', 'customer'):
+            data = {'product_id': order.product_id,
+                    'customer_id': order.customer_id,
+                    'amount': order.amount, 'price': str(order.price)}
+            self.assertEqual(Order.objects.order_validator(data), {})
+
+        fields = ['price', 'amount', 'bill', 'deadline', 'delivered']
+        first = list(Order.objects.order_by('id').values_list(*fields))
+        Customer.objects.all().delete()
+        Product.objects.all().delete()
+        call_command('generate_data', orders=300, customers=20, products=6,
+                     seed=7, verbosity=0, stdout=StringIO())
+        self.assertEqual(
+            list(Order.objects.order_by('id').values_list(*fields)), first)
+
+    def test_report_covers_every_url(self):
+        create_orders(40, delivered_every=2, customers=3, products=2)
+        output = os.path.join(self.directory, 'benchmark.json')
+
+        with override_settings(PDF_CACHE_DIR=self.directory):
+            call_command('benchmark_views', output=output, repeat=1,
+                         verbosity=0, stdout=StringIO())
+
+        with open(output, encoding='utf-8') as file:
+            report = json.load(file)
+
+        names = {result['name'] for result in report['results']}
+        self.assertEqual(names, {pattern.name for pattern in urlpatterns})
+        for result in report['results']:
+            self.assertLess(result['status'], 500, result['url'])
+        detail = next(result for result in report['results']
+                      if result['name'] == 'order_detail')
+        self.assertEqual(detail['sql_count'], 3)
+        self.assertGreater(detail['template_ms'], 0)
+
+        # Las vistas que modifican datos se revierten
+        self.assertEqual(Order.objects.count(), 40)
+        self.assertEqual(rollups.find_drift(), [])
+
+
+class ServerTimingTest(TestCase):
+
+    def setUp(self):
+        create_orders(5)
+
+    def test_header_and_log_line(self):
+        order = Order.objects.first()
+
+        with self.assertLogs('orders.timing', level='INFO') as logs:
+            response = self.client.get(
+                reverse('order_detail', args=[order.id]))
+
+        timing = dict(metric.split(';', 1)[0:2] for metric in
+                      response['Server-Timing'].split(', '))
+        self.assertEqual(set(timing),
+                         {'db', 'tpl', 'view', 'mw', 'total'})
+        self.assertIn('desc="3 SQL"', timing['db'])
+
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['url_name'], 'order_detail')
+        self.assertEqual((line['status'], line['queries']), (200, 3))
+        self.assertGreater(line['tpl'], 0)
+        self.assertGreaterEqual(line['total'], line['view'])
+
+    def test_template_render_restored(self):
+        original = Template.render
+        self.client.get(reverse('order_form'))
+        self.assertIs(Template.render, original)
+
+        with TemplateTimer(), TemplateTimer():
+            self.assertIsNot(Template.render, original)
+        self.assertIs(Template.render, original)
+
+
+class MetricsTest(TestCase):
+
+    def setUp(self):
+        create_orders(5)
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def scrape(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        return response.content.decode()
+
+    def test_aggregates_processes(self):
+        with override_settings(METRICS_DIR=self.directory):
+            self.client.get(reverse('index'))
+            self.client.get(reverse('index'))
+
+            # Otro worker con sus propias solicitudes
+            other = metrics.Registry(self.directory)
+            other.observe('index', 200, 0.3, 4, 0.01)
+            other.observe('index', 500, 12.0, 0, 0.0)
+            other.flush()
+
+            content = self.scrape()
+
+        self.assertIn(
+            'orders_http_requests_total{url_name="index",status="200"} 3',
+            content)
+        self.assertIn(
+            'orders_http_requests_total{url_name="index",status="500"} 1',
+            content)
+        self.assertIn(
+            'orders_http_request_duration_seconds_bucket'
+            '{url_name="index",status="500",le="+Inf"} 1', content)
+        self.assertIn(
+            'orders_db_queries_total{url_name="index",status="200"} 4',
+            content)
+        self.assertIn('quantile="0.99"', content)
+
+    def test_dead_processes_are_compacted(self):
+        # Un proceso que ya terminó y otro que sigue en ejecución
+        process = subprocess.Popen(['true'])
+        process.wait()
+        dead = metrics.Registry(self.directory)
+        dead.path = os.path.join(self.directory, f'{process.pid}-0a.json')
+        dead.observe('index', 200, 0.3, 4, 0.01)
+        dead.flush()
+        alive = metrics.Registry(self.directory)
+        alive.observe('index', 200, 0.2, 1, 0.01)
+        alive.flush()
+
+        with override_settings(METRICS_DIR=self.directory):
+            self.assertEqual(metrics.compact(self.directory), 1)
+            self.assertEqual(metrics.compact(self.directory), 0)
+            self.assertEqual(sorted(os.listdir(self.directory)),
+                             sorted([metrics.AGGREGATE,
+                                     os.path.basename(alive.path)]))
+            self.assertIn(
+                'orders_db_queries_total{url_name="index",status="200"} 5',
+                self.scrape())
+
+            # Al salir, el proceso pasa sus métricas al acumulado
+            alive.close()
+            self.assertNotIn(os.path.basename(alive.path),
+                             os.listdir(self.directory))
+            self.assertEqual(
+                metrics.collect(self.directory)['index|200']['count'], 2)
+
+    def test_quantile_interpolation(self):
+        buckets = [0] * len(metrics.BUCKETS)
+        # 100 solicitudes entre 0.1 s y 0.25 s
+        buckets[metrics.BUCKETS.index(0.25)] = 100
+
+        self.assertAlmostEqual(metrics.quantile(buckets, 100, 0.5), 0.175)
+        self.assertEqual(metrics.quantile(buckets, 100, 1.0), 0.25)
+
+
+class QueryInspectionTest(TestCase):
+
+    def setUp(self):
+        create_orders(5, customers=5)
+
+    def test_normalize_sql(self):
+        self.assertEqual(
+            normalize_sql(
+                "SELECT a FROM t WHERE id IN (%s, %s,  %s) AND b = 'x''y'"
+                " LIMIT 21"),
+            'SELECT a FROM t WHERE id IN (...) AND b = ? LIMIT ?')
+
+    def test_reports_template_line(self):
+        template = engines['django'].from_string(
+            '{% for order in orders %}\n'
+            '{{ order.customer.last_name }}\n'
+            '{% endfor %}')
+        inspector = QueryInspector()
+        with connection.execute_wrapper(inspector):
+            template.render({'orders': Order.objects.all()})
+
+        (sql, count, origins), = inspector.duplicates()
+        self.assertEqual(count, 5)
+        self.assertIn('"orders_customer"', sql)
+        self.assertEqual(len(origins), 1)
+        self.assertTrue(origins[0].endswith(':2'), origins)
+
+        with self.assertLogs('orders.queries', 'WARNING') as logs:
+            report_duplicates(inspector, 'prueba')
+        self.assertIn('5 veces', logs.output[0])
+
+    def test_budget(self):
+        @query_budget(1)
+        def view(request):
+            return HttpResponse(str(len(Order.objects.all())
+                                    + Customer.objects.count()))
+
+        request = RequestFactory().get('/')
+        with override_settings(QUERY_BUDGET_RAISE=True):
+            with self.assertRaises(QueryBudgetExceeded):
+                view(request)
+
+        with override_settings(QUERY_BUDGET_RAISE=False), \
+                self.assertLogs('orders.queries', 'ERROR') as logs:
+            self.assertEqual(view(request).content, b'10')
+        self.assertIn('ejecutó 2 consultas; su límite es 1', logs.output[0])
+        self.assertEqual(view.query_budget, 1)
+
+    def test_views_declare_budgets(self):
+        self.assertEqual(views.order_detail.query_budget, 3)
+        self.assertEqual(views.index_data.query_budget, 9)
+
+
+class SlowQueryTest(TestCase):
+
+    def setUp(self):
+        create_orders(5)
+        self.order = Order.objects.first()
+
+    def test_records_plan_and_view(self):
+        with override_settings(SLOW_QUERY_THRESHOLD=0):
+            self.client.get(reverse('order_detail', args=[self.order.id]))
+
+        sample = SlowQuery.objects.filter(
+            statement__contains='"orders_customer"."last_name"').get()
+        self.assertEqual(sample.view, 'order_detail')
+        self.assertEqual(json.loads(sample.params), [self.order.id])
+        self.assertIn('?', sample.statement)
+        self.assertTrue(sample.plan)
+
+    def test_keeps_latest(self):
+        with override_settings(SLOW_QUERY_THRESHOLD=0, SLOW_QUERY_LIMIT=3):
+            for i in range(3):
+                self.client.get(reverse('order_detail', args=[self.order.id]))
+
+        self.assertEqual(SlowQuery.objects.count(), 3)
+
+    def test_command_ranks_by_total_time(self):
+        SlowQuery.objects.bulk_create(
+            [SlowQuery(fingerprint='a', statement='SELECT a', view='index',
+                       duration=0.2) for i in range(3)] +
+            [SlowQuery(fingerprint='b', statement='SELECT b', view='summary',
+                       duration=0.5, plan='SCAN orders_order')])
+
+        output = StringIO()
+        call_command('slow_queries', '--clear', stdout=output)
+        lines = output.getvalue().splitlines()
+
+        self.assertTrue(lines[0].startswith('1. 600.0 ms en 3 consultas'))
+        self.assertIn('2. 500.0 ms en 1 consultas', output.getvalue())
+        self.assertIn('-> SCAN orders_order', output.getvalue())
+        self.assertFalse(SlowQuery.objects.exists())
+
+
+@override_settings(REPLICA_DATABASE='replica')
+class ReplicaRouterTest(TestCase):
+    """
+    Usa una segunda base SQLite como réplica. No se replica nada, así que
+    cada base muestra qué consultas llegaron a ella.
+    """
+
+    databases = {'default', 'replica'}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        connections.databases['replica'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(cls.directory, 'replica.sqlite3'),
+        }
+        connections.ensure_defaults('replica')
+        connections.prepare_test_settings('replica')
+        call_command('migrate', database='replica', verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections.databases['replica']
+        if hasattr(connections._connections, 'replica'):
+            delattr(connections._connections, 'replica')
+        shutil.rmtree(cls.directory)
+
+    def setUp(self):
+        cache.clear()
+        Product.objects.using('replica').create(name='EnRéplica')
+        Product.objects.create(name='EnPrimario')
+
+    def test_read_only_views_use_replica(self):
+        content = self.client.get(reverse('products')).content.decode()
+
+        self.assertIn('EnRéplica', content)
+        self.assertNotIn('EnPrimario', content)
+
+        # Las exportaciones consultan mientras se envía la respuesta
+        response = self.client.get(reverse('export', args=['productos']))
+        content = b''.join(response.streaming_content).decode()
+        self.assertIn('EnRéplica', content)
+        self.assertNotIn('EnPrimario', content)
+
+    def test_other_views_use_primary(self):
+        product = Product.objects.get(name='EnPrimario')
+        response = self.client.get(
+            reverse('product_edit_form', args=[product.id]))
+
+        self.assertContains(response, 'EnPrimario')
+
+    def test_session_reads_primary_after_write(self):
+        self.client.post(reverse('process_product'),
+                         {'name': 'Nuevo', 'description': ''})
+        self.assertTrue(Product.objects.filter(name='Nuevo').exists())
+        self.assertFalse(
+            Product.objects.using('replica').filter(name='Nuevo').exists())
+
+        content = self.client.get(reverse('products')).content.decode()
+        self.assertIn('Nuevo', content)
+        self.assertNotIn('EnRéplica', content)
+
+        # Terminado el plazo vuelve a la réplica
+        session = self.client.session
+        session[routers.STICKY_KEY] = 0
+        session.save()
+        content = self.client.get(reverse('products')).content.decode()
+        self.assertIn('EnRéplica', content)
+
+    def test_fresh_version_not_cached_from_replica(self):
+        cache.set(VERSION_KEY, f'{time.time():.3f}-nueva', None)
+        with routers.use_replica():
+            self.assertFalse(can_store(table_version()))
+        self.assertTrue(can_store(table_version()))
+
+        cache.set(VERSION_KEY, f'{time.time() - 60:.3f}-vieja', None)
+        with routers.use_replica():
+            self.assertTrue(can_store(table_version()))
+
+
+class GlobalSearchTest(TestCase):
+
+    def setUp(self):
+        self.customer = Customer.objects.create(
+            first_name='Mónica', last_name='Benítez',
+            phone_number='0981555123', document='4567890')
+        self.product = Product.objects.create(
+            name='Reloj Océano', description='Resina azul')
+        self.order = Order.objects.create(
+            customer=self.customer, product=self.product, amount=1,
+            price=1000, deadline=date(2023, 1, 1),
+            observation='Envío a Luque', bill='001-002-0004567')
+
+    def find(self, query):
+        response = self.client.get(reverse('global_search'), {'q': query})
+        return [(result['kind'], result['id'])
+                for result in response.json()['results']]
+
+    def test_tokenize(self):
+        self.assertEqual(search.tokenize('Envío a LUQUE', '001-002-45', None),
+                         ['envio', 'a', 'luque', '001', '002', '45'])
+
+    def test_finds_by_prefix(self):
+        order = (SearchEntry.ORDER, self.order.id)
+        customer = (SearchEntry.CUSTOMER, self.customer.id)
+
+        self.assertEqual(self.find('0004567'), [order])
+        self.assertEqual(self.find('001-002-000'), [order])
+        self.assertEqual(self.find('envio luq'), [order])
+        self.assertEqual(self.find('0981555'), [customer, order])
+        self.assertEqual(self.find('4567'), [customer, order])
+        self.assertEqual(self.find('monica beni'), [customer])
+        self.assertEqual(self.find('oceano'),
+                         [(SearchEntry.PRODUCT, self.product.id)])
+        self.assertEqual(self.find('monica luque'), [])
+        self.assertEqual(self.find(''), [])
+
+        response = self.client.get(reverse('global_search'), {'q': 'envio'})
+        self.assertEqual(response.json()['results'][0]['url'],
+                         reverse('order_detail', args=[self.order.id]))
+
+    def test_index_follows_changes(self):
+        self.order.observation = 'Retira en local'
+        self.order.save()
+        self.assertEqual(self.find('luque'), [])
+        self.assertEqual(self.find('retira'),
+                         [(SearchEntry.ORDER, self.order.id)])
+
+        # El teléfono del cliente también está en sus pedidos
+        self.client.post(
+            reverse('customer_edit_process', args=[self.customer.id]),
+            {'first_name': 'Mónica', 'last_name': 'Benítez',
+             'phone_number': '0971000222', 'email': '', 'document': '',
+             'address': ''})
+        self.assertEqual(self.find('0981555'), [])
+        self.assertEqual(self.find('0971000'),
+                         [(SearchEntry.CUSTOMER, self.customer.id),
+                          (SearchEntry.ORDER, self.order.id)])
+
+        self.client.get(reverse('delete_product', args=[self.product.id]))
+        self.assertEqual(self.find('retira'), [])
+        self.assertEqual(self.find('oceano'), [])
+        self.assertFalse(SearchEntry.objects.exclude(
+            kind=SearchEntry.CUSTOMER).exists())
+
+    def test_rebuild_command(self):
+        SearchEntry.objects.all().delete()
+        Order.objects.filter(id=self.order.id).update(bill='F-777')
+
+        output = StringIO()
+        call_command('rebuild_search_index', stdout=output)
+
+        self.assertIn('1 pedidos, 0 pedidos archivados, 1 clientes y 1 productos',
+                      output.getvalue())
+        self.assertEqual(self.find('f 777'),
+                         [(SearchEntry.ORDER, self.order.id)])
+
+    def test_uses_token_index(self):
+        statements = []
+
+        def capture(execute, sql, params, many, context):
+            statements.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(capture):
+            search.find('envio luque', 10)
+
+        (sql, params), = statements
+        plan = explain(sql, params)
+        self.assertEqual(full_scans(plan, ['orders_searchentry']), [], plan)
+
+
+class ArchiveTest(TestCase):
+
+    def setUp(self):
+        self.customers, self.products = create_orders(
+            30, delivered_every=3, customers=2, products=2)
+        self.revenue = sum(order.total for order in Order.objects.with_total())
+
+    def archive(self):
+        output = StringIO()
+        call_command('archive_orders', days=30, batch_size=4, pause=0,
+                     stdout=output)
+        return output.getvalue()
+
+    def get_page(self, name, **params):
+        response = self.client.get(reverse(name), params)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_moves_old_delivered_orders(self):
+        delivered = dict(Order.objects.filter(
+            delivered__isnull=False).values_list('id', 'customer_id'))
+
+        self.assertIn('10 pedidos entregados', self.archive())
+
+        self.assertFalse(Order.objects.filter(delivered__isnull=False).exists())
+        self.assertEqual(dict(ArchivedOrder.objects.values_list(
+            'id', 'customer_id')), delivered)
+        self.assertFalse(SearchEntry.objects.filter(
+            kind=SearchEntry.ORDER, object_id__in=delivered).exists())
+        self.assertEqual(rollups.find_drift(), [])
+
+        # La búsqueda global los sigue encontrando, con la tabla del archivo
+        result, = search.search('F-00003', 10)
+        self.assertEqual(result['kind'], SearchEntry.ARCHIVED_ORDER)
+        self.assertTrue(result['text'].startswith('Pedido archivado'))
+        self.assertEqual(result['url'], reverse('index') +
+                         '?archivo=1&buscar=F-00003')
+        self.assertContains(self.client.get(result['url']),
+                            'data-search="F-00003"')
+
+        # Sin pedidos pendientes de archivar, no hace nada
+        self.assertIn('0 pedidos', self.archive())
+
+    def test_tables_and_summary(self):
+        self.archive()
+        archived_revenue = sum(
+            order.total for order in ArchivedOrder.objects.with_total())
+
+        self.assertEqual(self.get_page('index_data')['recordsTotal'], 20)
+        self.assertEqual(self.get_page('delivered_data')['recordsTotal'], 0)
+        self.assertEqual(self.get_page('to_deliver_data')['recordsTotal'], 20)
+
+        archived = self.get_page('delivered_data', archivo=1, length=100)
+        self.assertEqual(archived['recordsTotal'], 10)
+        self.assertEqual(len(archived['data']), 10)
+        self.assertEqual(archived['revenue'], archived_revenue)
+
+        page = self.client.get(reverse('delivered'), {'archivo': 1})
+        self.assertContains(page, 'Entregados archivados')
+        self.assertNotContains(page, 'bulkForm')
+
+        # El resumen sigue contando los pedidos archivados
+        response = self.client.get(reverse('summary'), {
+            'desde': '2023-01-01', 'hasta': '2023-12-31'})
+        self.assertEqual(response.context['totals']['revenue'], self.revenue)
+
+    def test_delete_customer_with_archived_orders(self):
+        self.archive()
+        self.client.get(
+            reverse('delete_customer', args=[self.customers[0].id]))
+
+        self.assertEqual(ArchivedOrder.objects.visible().count(), 5)
+        self.assertEqual(rollups.archive_totals()[0], 5)
+        self.assertEqual(rollups.find_drift(), [])
+
+    def test_locks_only_orders(self):
+        Customer.objects.filter(id=self.customers[0].id).update(
+            deleted_at=timezone.now())
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(archive.archive_batch(date(2024, 1, 1)), 5)
+
+        # Los eliminados se excluyen sin JOIN, que con FOR UPDATE bloquearía
+        # también las filas de clientes y productos
+        select, = [query['sql'] for query in queries.captured_queries
+                   if query['sql'].startswith('SELECT "orders_order"')]
+        self.assertNotIn('JOIN', select)
+
+
+class SoftDeleteTest(TestCase):
+
+    def setUp(self):
+        self.customers, self.products = create_orders(
+            30, delivered_every=3, customers=3, products=2)
+
+    def get_page(self, name, **params):
+        response = self.client.get(reverse(name), params)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_hides_catalog_and_orders(self):
+        customer = self.customers[0]
+        self.client.get(reverse('delete_customer', args=[customer.id]))
+
+        # Los pedidos siguen en la tabla hasta la purga
+        self.assertEqual(Order.objects.count(), 30)
+        self.assertEqual(rollups.find_drift(), [])
+
+        data = self.get_page('index_data', length=100)
+        self.assertEqual(data['recordsTotal'], 20)
+        self.assertEqual(len(data['data']), 20)
+        response = self.client.get(reverse('customers'))
+        self.assertNotIn(customer, response.context['all_customers'])
+        response = self.client.get(reverse('customer_search'), {'q': 'maria'})
+        self.assertEqual(len(response.json()['results']), 2)
+        self.assertFalse(SearchEntry.objects.filter(
+            kind=SearchEntry.ORDER,
+            object_id__in=customer.orders.values('id')).exists())
+
+    def test_visible_orders_do_not_join_catalog(self):
+        # Con un JOIN el motor puede partir de los clientes y ordenar todos
+        # los pedidos en lugar de leerlos en orden por su índice
+        sql = str(Order.objects.visible().order_by('id')[:10].query)
+        self.assertNotIn('JOIN', sql)
+
+        self.products[0].deleted_at = timezone.now()
+        self.products[0].save()
+        self.assertEqual(Order.objects.visible().count(), 15)
+        self.assertEqual(ArchivedOrder.objects.visible().count(), 0)
+
+    def test_purge_in_batches(self):
+        self.client.get(
+            reverse('delete_customer', args=[self.customers[0].id]))
+        # Los pedidos del cliente y del producto se restan una sola vez
+        self.client.get(reverse('delete_product', args=[self.products[0].id]))
+        self.assertEqual(rollups.find_drift(), [])
+        self.assertEqual(self.get_page('index_data')['recordsTotal'], 10)
+
+        output = StringIO()
+        call_command('purge_deleted', batch_size=4, pause=0, stdout=output)
+
+        self.assertIn('22 clientes, productos y pedidos', output.getvalue())
+        self.assertEqual(Order.objects.count(), 10)
+        self.assertFalse(Customer.objects.filter(
+            id=self.customers[0].id).exists())
+        self.assertFalse(Product.objects.filter(
+            id=self.products[0].id).exists())
+        self.assertEqual(rollups.find_drift(), [])
+
+
+class OrderEventTest(TestCase):
+
+    def setUp(self):
+        self.customers, self.products = create_orders(
+            3, customers=2, products=2)
+        self.order = Order.objects.first()
+
+    def kinds(self, order_id):
+        return list(OrderEvent.objects.filter(order_id=order_id).order_by(
+            'created_at', 'id').values_list('kind', flat=True))
+
+    def test_views_record_events(self):
+        self.client.post(reverse('process_order'), {
+            'product_id': self.products[0].id,
+            'customer_id': self.customers[0].id, 'observation': '',
+            'amount': 2, 'price': 1500, 'deadline': '2023-03-01',
+            'bill': 'F-9'})
+        order = Order.objects.latest('id')
+        created = OrderEvent.objects.get(order_id=order.id)
+        self.assertEqual(json.loads(created.changes)['bill'], [None, 'F-9'])
+
+        self.client.post(
+            reverse('process_edit', args=[order.id]), {
+                'product_id': self.products[1].id,
+                'customer_id': self.customers[0].id, 'observation': '',
+                'amount': 2, 'price': 2000, 'deadline': '2023-03-01',
+                'bill': 'F-9'})
+        self.client.get(reverse('order_delivered', args=[order.id]))
+        self.client.get(reverse('order_delivered', args=[order.id]))
+        self.client.get(reverse('delete_order', args=[order.id]))
+
+        self.assertEqual(self.kinds(order.id), [
+            OrderEvent.CREATED, OrderEvent.EDITED, OrderEvent.DELIVERED,
+            OrderEvent.REOPENED, OrderEvent.DELETED])
+        edited = OrderEvent.objects.get(
+            order_id=order.id, kind=OrderEvent.EDITED)
+        self.assertEqual(json.loads(edited.changes), {
+            'product_id': [self.products[0].id, self.products[1].id],
+            'price': [1500, 2000]})
+
+    def test_bulk_actions_insert_once(self):
+        ids = [str(id) for id in Order.objects.values_list('id', flat=True)]
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('bulk_orders'),
+                             {'accion': 'entregar', 'ids': ids})
+
+        inserts = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('INSERT INTO "orders_orderevent"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(OrderEvent.objects.filter(
+            kind=OrderEvent.DELIVERED).count(), 3)
+
+    def test_failed_transaction_discards_events(self):
+        with self.assertRaises(ValueError):
+            with events.recording():
+                events.record(self.order.id, OrderEvent.EDITED)
+                raise ValueError
+        self.assertFalse(OrderEvent.objects.exists())
+
+    def test_timeline_on_detail(self):
+        self.client.get(reverse('order_delivered', args=[self.order.id]))
+
+        response = self.client.get(
+            reverse('order_detail', args=[self.order.id]))
+        self.assertContains(response, 'Historial')
+        self.assertEqual(
+            [event.kind for event in response.context['events']],
+            [OrderEvent.DELIVERED])
+
+
+class AgendaTest(TestCase):
+
+    def setUp(self):
+        create_orders(30, delivered_every=3)
+
+    def test_month_calendar(self):
+        response = self.client.get(reverse('agenda'), {'mes': '2023-01'})
+
+        self.assertEqual(response.context['totals']['orders'], 30)
+        self.assertEqual(response.context['totals']['pending'], 20)
+        self.assertEqual(response.context['previous'], '2022-12')
+        self.assertEqual(response.context['next'], '2023-02')
+        cells = dict(
+            cell for week in response.context['weeks'] for cell in week)
+        self.assertEqual(cells[date(2023, 1, 1)].orders, 1)
+        self.assertIsNone(cells[date(2023, 1, 31)])
+
+    def test_overdue_board(self):
+        response = self.client.get(reverse('overdue'))
+        self.assertEqual(response.context['totals']['orders'], 20)
+        deadlines = [order['deadline'] for order in response.context['orders']]
+        self.assertEqual(deadlines, sorted(deadlines))
+        self.assertEqual(len(deadlines), 20)
+
+        order = Order.objects.filter(delivered__isnull=True).first()
+        self.client.get(reverse('order_delivered', args=[order.id]))
+
+        response = self.client.get(reverse('overdue'))
+        self.assertEqual(response.context['totals']['orders'], 19)
+        self.assertNotIn(order.id, [row['id'] for row in
+                                    response.context['orders']])
+
+
+class AssetTest(TestCase):
+
+    def setUp(self):
+        self.output = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output)
+        self.addCleanup(assets.load_manifest.cache_clear)
+        assets.load_manifest.cache_clear()
+
+    def static_size(self, url):
+        # Suma el tamaño de los archivos de static que carga una página
+        html = self.client.get(url).content.decode()
+        total = 0
+        for path in re.findall(r'(?:src|href)="/static/([^"]+)"', html):
+            if path.startswith('bundles/'):
+                path = os.path.join(self.output, path[len('bundles/'):])
+            total += os.path.getsize(os.path.join(
+                settings.STATICFILES_DIRS[0], path))
+        return total
+
+    def test_minify(self):
+        self.assertEqual(
+            assets.minify_css('/* a */ .a , .b {\n  color: red ;\n}\n'),
+            '.a,.b{color: red;}')
+        self.assertEqual(
+            assets.minify_js('// nota\nvar a = 1;\n\n    a += "//";\n'),
+            'var a = 1;\na += "//";')
+
+    def test_build_is_hashed_and_compressed(self):
+        output = StringIO()
+        call_command('build_assets', output=self.output, stdout=output)
+        manifest = assets.build(self.output)
+
+        self.assertEqual(set(manifest), set(assets.BUNDLES))
+        self.assertIn(f'tables.js -> {manifest["tables.js"]}',
+                      output.getvalue())
+        for name, hashed in manifest.items():
+            with open(os.path.join(self.output, hashed), 'rb') as file:
+                content = file.read()
+            with gzip.open(os.path.join(self.output, f'{hashed}.gz')) as file:
+                self.assertEqual(file.read(), content)
+            self.assertEqual(content, assets.bundle(name))
+
+    def test_pages_use_manifest(self):
+        manifest = assets.build(self.output)
+
+        with override_settings(ASSET_BUNDLES=True,
+                               ASSET_BUNDLES_DIR=self.output):
+            assets.load_manifest.cache_clear()
+            form = self.client.get(reverse('client_form'))
+            tables = self.client.get(reverse('customers'))
+            form_size = self.static_size(reverse('client_form'))
+
+        self.assertContains(form, f'/static/bundles/{manifest["app.js"]}')
+        self.assertNotContains(form, 'tables.')
+        self.assertContains(tables, f'/static/bundles/{manifest["tables.js"]}')
+        # Las bibliotecas de exportación solo se referencian para cargarlas
+        # al hacer clic
+        self.assertContains(
+            tables, f'&quot;/static/bundles/{manifest["export.js"]}&quot;')
+        self.assertNotContains(tables, f'src="/static/bundles/'
+                                       f'{manifest["export.js"]}"')
+        self.assertLess(form_size, 50000)
+
+    def test_sources_without_manifest(self):
+        self.assertLess(self.static_size(reverse('client_form')), 50000)
+        response = self.client.get(reverse('customers'))
+        self.assertContains(
+            response, 'src="/static/dataTables/DataTables-1.13.6/js/'
+                      'jquery.dataTables.min.js"')
+        self.assertNotContains(response, 'src="/static/dataTables/'
+                                         'pdfmake-0.2.7/pdfmake.min.js"')
@@ -4,17 +4,31 @@ from . import views
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('datos/', views.index_data, name='index_data'),
     path('porentregar/', views.to_deliver_balance, name='to_deliver'),
+    path('porentregar/datos/', views.to_deliver_data, name='to_deliver_data'),
     path('entreagdo/', views.delivered_balance, name='delivered'),
+    path('entreagdo/datos/', views.delivered_data, name='delivered_data'),
+    path('resumen/', views.summary, name='summary'),
+    path('agenda/', views.agenda, name='agenda'),
+    path('vencidos/', views.overdue, name='overdue'),
+    path('exportar/<str:dataset>/', views.export_data, name='export'),
+    path('pdf/balance/', views.balance_pdf, name='balance_pdf'),
+    path('importar/', views.import_data, name='import_data'),
+    path('metrics', views.metrics, name='metrics'),
+    path('buscar/', views.global_search, name='global_search'),
     path('pedido/form/', views.order_form, name='order_form'),
     path('pedido/procesar/', views.process_new_order, name='process_order'),
     path('pedido/editar/<int:id>/', views.edit_order_form, name='edit_order_form'),
     path('pedido/mutar/<int:id>/', views.process_order_edit, name='process_edit'),
     path('pedido/eliminar/<int:id>/', views.delete_order, name='delete_order'),
+    path('pedido/lote/', views.bulk_orders, name='bulk_orders'),
     path('pedido/detalle/<int:id>/', views.order_detail, name='order_detail'),
+    path('pedido/pdf/<int:id>/', views.order_pdf, name='order_pdf'),
     path('pedido/entregado/<int:id>/',
          views.order_delivered, name='order_delivered'),
     path('clientes/', views.customers, name='customers'),
+    path('clientes/buscar/', views.customer_search, name='customer_search'),
     path('clientes/agregar/', views.customer_form, name='client_form'),
     path('clientes/procesar/', views.process_new_customer, name='process_customer'),
     path('clientes/editar/<int:id>/',
@@ -24,6 +38,7 @@ urlpatterns = [
     path('clientes/eliminar/<int:id>/',
          views.delete_customer, name='delete_customer'),
     path('productos/', views.products, name='products'),
+    path('productos/buscar/', views.product_search, name='product_search'),
     path('productos/agregar/', views.product_form, name='product_form'),
     path('productos/procesar/', views.process_new_product, name='process_product'),
     path('productos/editar/<int:id>',
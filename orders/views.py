@@ -1,15 +1,63 @@
-from datetime import datetime
+import calendar
+import io
+from datetime import date, datetime, timedelta
 
+from django.conf import settings
 from django.contrib import messages
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.http import (FileResponse, Http404, HttpResponse, JsonResponse,
+                         StreamingHttpResponse)
 from django.shortcuts import redirect, render
 from django.urls import reverse
-
-from .models import Customer, Order, Product
+from django.utils import timezone
+
+from .datatables import server_side_response, summarize
+from .exports import (DATASETS, csv_stream, iter_rows, order_queryset,
+                      xlsx_stream)
+from .models import (ArchivedOrder, Customer, CustomerBalance, DailyBalance,
+                     Order, OrderEvent, Product, ProductBalance, SearchEntry)
+from . import (deletion, events, metrics as metrics_registry, pdf, rollups,
+               search)
+from .imports import IMPORTERS, import_csv
+from .cache import bump_table_version, cached_table
+from .profiling import query_budget
+from .routers import read_replica
+from .conditional import (agenda_state, catalog_state, conditional_page,
+                          order_detail_state, orders_state)
 
 # Create your views here.
 
+# Resultados por defecto y máximos de las búsquedas de los formularios
+SEARCH_LIMIT = 10
+SEARCH_MAX_LIMIT = 50
+
+# Máximo de pedidos por acción en lote y páginas a las que se puede volver
+BULK_MAX_ORDERS = 1000
+BULK_RETURN_PAGES = ['index', 'to_deliver', 'delivered']
+
+# Pedidos vencidos que se listan en el tablero, de los más atrasados
+OVERDUE_LIMIT = 100
+
 
 # --Balance--
+def _archived(request):
+    """
+    Indica si la tabla de balance debe mostrar los pedidos archivados, que
+    solo se consultan cuando se piden.
+
+    Args:
+        request (HttpRequest): La solicitud HTTP recibida.
+
+    Returns:
+        bool: True si la solicitud trae 'archivo=1'.
+    """
+
+    return request.GET.get('archivo') == '1'
+
+
+@read_replica
+@query_budget(0)
 def index(request):
     """
     Vista para mostrar todos los pedidos en una página de balance.
@@ -22,17 +70,41 @@ def index(request):
         página de balance.
     """
 
-    # Recupera todos los pedidos
-    orders = Order.objects.all()
-
+    # Los pedidos se cargan por página desde 'index_data', filtrados desde
+    # el principio por 'buscar' si se indica
     context = {
-        'all_orders': orders,
+        'archive': _archived(request),
+        'search': request.GET.get('buscar', ''),
     }
-
-    # Renderiza 'balance_sheets/all.html' utilizando el diccionario context.
     return render(request, 'balance_sheets/all.html', context)
 
 
+@read_replica
+@query_budget(9)
+@conditional_page(orders_state)
+@cached_table
+def index_data(request):
+    """
+    Fuente de datos paginada en el servidor para la tabla de todos los
+    pedidos, o de los archivados con 'archivo=1'.
+
+    Args:
+        request (HttpRequest): La solicitud HTTP enviada por DataTables.
+
+    Returns:
+        JsonResponse: La página de pedidos solicitada.
+    """
+
+    if _archived(request):
+        return server_side_response(
+            request, ArchivedOrder.objects.visible(), rollups.archive_totals)
+
+    return server_side_response(
+        request, Order.objects.visible(), rollups.balance_totals)
+
+
+@read_replica
+@query_budget(0)
 def to_deliver_balance(request):
     """
     Vista para mostrar todos los pedidos que aún no se han entregado en una 
@@ -46,17 +118,35 @@ def to_deliver_balance(request):
         no se han entregado en una página de balance.
     """
 
-    # Recupera los pedidos que no se han entregado
-    to_deliver = Order.objects.filter(delivered__isnull=True)
+    # Los pedidos se cargan por página desde 'to_deliver_data'
+    return render(request, 'balance_sheets/to_deliver.html')
 
-    context = {
-        'to_deliver': to_deliver
-    }
 
-    # Renderiza 'balance_sheets/to_deliver.html' utilizando el diccionario context.
-    return render(request, 'balance_sheets/to_deliver.html', context)
+@read_replica
+@query_budget(8)
+@conditional_page(orders_state)
+@cached_table
+def to_deliver_data(request):
+    """
+    Fuente de datos paginada en el servidor para la tabla de pedidos por
+    entregar.
+
+    Args:
+        request (HttpRequest): La solicitud HTTP enviada por DataTables.
+
+    Returns:
+        JsonResponse: La página de pedidos solicitada.
+    """
 
+    # Pedidos que no se han entregado
+    to_deliver = Order.objects.visible().filter(delivered__isnull=True)
 
+    return server_side_response(
+        request, to_deliver, lambda: rollups.balance_totals('to_deliver'))
+
+
+@read_replica
+@query_budget(0)
 def delivered_balance(request):
     """
     Vista para mostrar todos los pedidos que han sido entregadas en una página
@@ -70,18 +160,473 @@ def delivered_balance(request):
         sido entregadas en una página de balance.
     """
 
-    # Obtener todos los pedidos entregados
-    delivered = Order.objects.filter(delivered__isnull=False)
+    # Los pedidos se cargan por página desde 'delivered_data'
+    context = {'archive': _archived(request)}
+    return render(request, 'balance_sheets/delivered.html', context)
+
+
+@read_replica
+@query_budget(9)
+@conditional_page(orders_state)
+@cached_table
+def delivered_data(request):
+    """
+    Fuente de datos paginada en el servidor para la tabla de pedidos
+    entregados, o de los archivados con 'archivo=1'.
+
+    Args:
+        request (HttpRequest): La solicitud HTTP enviada por DataTables.
+
+    Returns:
+        JsonResponse: La página de pedidos solicitada.
+    """
+
+    # Los pedidos archivados están todos entregados
+    if _archived(request):
+        return server_side_response(
+            request, ArchivedOrder.objects.visible(), rollups.archive_totals)
+
+    # Pedidos entregados
+    delivered = Order.objects.visible().filter(delivered__isnull=False)
+
+    return server_side_response(
+        request, delivered, lambda: rollups.balance_totals('delivered'))
+
+
+def _date_param(params, name, default):
+    """
+    Lee una fecha con formato AAAA-MM-DD de los parámetros de la solicitud.
+
+    Args:
+        params (QueryDict): Parámetros de la solicitud.
+        name (str): Nombre del parámetro.
+        default (date): Fecha a usar si falta o no es válida.
+
+    Returns:
+        date: La fecha leída.
+    """
+
+    try:
+        return datetime.strptime(params.get(name, ''), '%Y-%m-%d').date()
+    except ValueError:
+        return default
+
+
+@read_replica
+@query_budget(9)
+@conditional_page(orders_state)
+def summary(request):
+    """
+    Muestra el resumen de ventas de un periodo a partir de las tablas de
+    resumen, sin recorrer los pedidos.
+
+    Args:
+        request (HttpRequest): La solicitud HTTP recibida. Acepta los
+        parámetros 'desde' y 'hasta' (por defecto, el mes actual).
+
+    Returns:
+        HttpResponse: La respuesta HTTP con el resumen del periodo.
+    """
+
+    # Periodo solicitado, por defecto desde el inicio del mes
+    today = date.today()
+    start = _date_param(request.GET, 'desde', today.replace(day=1))
+    end = _date_param(request.GET, 'hasta', today)
+
+    # Totales por día del periodo
+    days = DailyBalance.objects.filter(
+        day__range=(start, end), orders__gt=0).order_by('day')
+
+    context = {
+        'start': start.strftime('%Y-%m-%d'),
+        'end': end.strftime('%Y-%m-%d'),
+        'totals': days.aggregate(
+            orders=Sum('orders'),
+            units=Sum('units'),
+            revenue=Sum('revenue'),
+            delivered_revenue=Sum('delivered_revenue'),
+        ),
+        'days': days,
+        'top_customers': CustomerBalance.objects.select_related(
+            'customer').filter(customer__deleted_at__isnull=True).order_by(
+            '-revenue')[:10],
+        'top_products': ProductBalance.objects.select_related(
+            'product').filter(product__deleted_at__isnull=True).order_by(
+            '-revenue')[:10],
+    }
+
+    # Renderiza 'balance_sheets/summary.html' utilizando el diccionario context.
+    return render(request, 'balance_sheets/summary.html', context)
+
+
+def _month_param(params, default):
+    """
+    Lee un mes con formato AAAA-MM del parámetro 'mes' de la solicitud.
+
+    Args:
+        params (QueryDict): Parámetros de la solicitud.
+        default (date): Primer día del mes a usar si falta o no es válido.
+
+    Returns:
+        date: El primer día del mes leído.
+    """
+
+    try:
+        return datetime.strptime(params.get('mes', ''), '%Y-%m').date()
+    except ValueError:
+        return default
+
+
+def _pending(days):
+    """
+    Anota los días del resumen diario con la cantidad y el total de los
+    pedidos que faltan entregar.
+
+    Args:
+        days (QuerySet): Filas de DailyBalance.
+
+    Returns:
+        QuerySet: Las filas con 'pending' y 'pending_revenue'.
+    """
+
+    return days.annotate(
+        pending=F('orders') - F('delivered_orders'),
+        pending_revenue=F('revenue') - F('delivered_revenue'))
+
+
+@read_replica
+@query_budget(6)
+@conditional_page(agenda_state)
+def agenda(request):
+    """
+    Muestra el calendario de un mes con los pedidos por día de entrega, a
+    partir del resumen diario: una consulta por rango sobre su índice, sin
+    recorrer los pedidos.
+
+    Args:
+        request (HttpRequest): La solicitud HTTP recibida. Acepta el
+        parámetro 'mes' (AAAA-MM, por defecto el mes actual).
+
+    Returns:
+        HttpResponse: La respuesta HTTP con el calendario del mes.
+    """
+
+    today = timezone.localdate()
+    month = _month_param(request.GET, today.replace(day=1))
+
+    # Semanas completas, de lunes a domingo, que cubren el mes
+    weeks = calendar.Calendar().monthdatescalendar(month.year, month.month)
+    days = {
+        row.day: row for row in _pending(DailyBalance.objects.filter(
+            day__range=(weeks[0][0], weeks[-1][-1]), orders__gt=0))
+    }
+    in_month = [row for day, row in days.items()
+                if day.month == month.month]
 
     context = {
-        'delivered_orders': delivered
+        'month': month,
+        'previous': (month - timedelta(days=1)).strftime('%Y-%m'),
+        'next': (month + timedelta(days=31)).strftime('%Y-%m'),
+        'today': today,
+        'weeks': [[(day, days.get(day)) for day in week] for week in weeks],
+        'totals': {
+            'orders': sum(row.orders for row in in_month),
+            'revenue': sum(row.revenue for row in in_month),
+            'pending': sum(row.pending for row in in_month),
+            'pending_revenue': sum(row.pending_revenue for row in in_month),
+        },
     }
 
-    # Renderiza 'delivered.html' utilizando el diccionario context.
-    return render(request, 'balance_sheets/delivered.html', context)
+    return render(request, 'balance_sheets/agenda.html', context)
+
+
+@read_replica
+@query_budget(7)
+@conditional_page(agenda_state)
+def overdue(request):
+    """
+    Muestra los pedidos vencidos: los días con pedidos sin entregar cuya
+    fecha de entrega ya pasó, desde el resumen diario, y los más atrasados,
+    desde el índice por estado de entrega y fecha.
+
+    Args:
+        request (HttpRequest): La solicitud HTTP recibida.
+
+    Returns:
+        HttpResponse: La respuesta HTTP con el tablero de vencidos.
+    """
+
+    today = timezone.localdate()
+
+    days = list(_pending(DailyBalance.objects.filter(day__lt=today)).filter(
+        pending__gt=0).order_by('day'))
+    for row in days:
+        row.late = (today - row.day).days
+
+    context = {
+        'today': today,
+        'days': days,
+        'totals': {
+            'orders': sum(row.pending for row in days),
+            'revenue': sum(row.pending_revenue for row in days),
+        },
+        'orders': Order.objects.visible().with_total().filter(
+            delivered__isnull=True, deadline__lt=today,
+        ).order_by('deadline', 'id').values(
+            'id', 'deadline', 'amount', 'total', 'bill',
+            'customer__first_name', 'customer__last_name', 'product__name',
+        )[:OVERDUE_LIMIT],
+        'limit': OVERDUE_LIMIT,
+    }
+
+    return render(request, 'balance_sheets/overdue.html', context)
+
+
+@read_replica
+def export_data(request, dataset):
+    """
+    Exporta pedidos, clientes o productos leyendo la base de datos por
+    bloques y enviando el archivo a medida que se genera.
+
+    Args:
+        request (HttpRequest): La solicitud HTTP recibida. Acepta
+        'formato' ('csv' o 'xlsx') y, para los pedidos, los filtros 'estado',
+        'buscar' y 'min_total'.
+        dataset (str): 'pedidos', 'clientes' o 'productos'.
+
+    Returns:
+        StreamingHttpResponse: El archivo exportado.
+    """
+
+    if dataset not in DATASETS:
+        raise Http404('Exportación desconocida')
+
+    # Filas a exportar, leídas por bloques
+    build_queryset, columns = DATASETS[dataset]
+    headers = [header for header, field in columns]
+    rows = iter_rows(build_queryset(request.GET),
+                     [field for header, field in columns])
+
+    if request.GET.get('formato') == 'xlsx':
+        response = StreamingHttpResponse(
+            xlsx_stream(headers, rows),
+            content_type='application/vnd.openxmlformats-officedocument.'
+                         'spreadsheetml.sheet')
+        extension = 'xlsx'
+    else:
+        response = StreamingHttpResponse(
+            csv_stream(headers, rows), content_type='text/csv; charset=utf-8')
+        extension = 'csv'
+
+    response['Content-Disposition'] = (
+        f'attachment; filename="{dataset}.{extension}"')
+
+    return response
+
+
+def import_data(request):
+    """
+    Muestra el formulario para importar un CSV de clientes, productos o
+    pedidos y, al enviarlo, lo importa por bloques y muestra los errores de
+    cada fila.
+
+    Args:
+        request (HttpRequest): La solicitud HTTP recibida. Por POST recibe
+        'tipo' ('clientes', 'productos' o 'pedidos') y el archivo 'archivo'.
+
+    Returns:
+        HttpResponse: La plantilla 'imports/upload.html' con el reporte.
+    """
+
+    context = {'kinds': list(IMPORTERS)}
+
+    if request.method == 'POST':
+        kind = request.POST.get('tipo')
+        upload = request.FILES.get('archivo')
+
+        if kind not in IMPORTERS or upload is None:
+            messages.error(request, 'Elige un tipo y un archivo CSV')
+            return redirect(reverse('import_data'))
+
+        # Leer el archivo subido como texto, línea por línea; 'utf-8-sig'
+        # quita la marca BOM que agrega Excel
+        file = io.TextIOWrapper(upload.file, encoding='utf-8-sig',
+                                newline='')
+        try:
+            context['report'] = import_csv(kind, file)
+        except UnicodeDecodeError:
+            messages.error(request, 'El archivo debe estar en UTF-8')
+            return redirect(reverse('import_data'))
+        context['kind'] = kind
+
+    return render(request, 'imports/upload.html', context)
+
+
+def _pdf_response(kind, payload, filename):
+    """
+    Genera (o reutiliza) un PDF y lo envía como archivo.
+
+    Args:
+        kind (str): Renderizador de orders.pdf a utilizar.
+        payload (dict): Datos del documento.
+        filename (str): Nombre del archivo descargado.
+
+    Returns:
+        HttpResponse: El PDF, o un 503 si el grupo de procesos está ocupado.
+    """
+
+    try:
+        document = pdf.render_cached(kind, payload)
+    except pdf.PdfBusy:
+        return HttpResponse('Servidor ocupado, intente de nuevo', status=503)
+
+    return FileResponse(document, filename=filename,
+                        content_type='application/pdf')
+
+
+# Títulos de los balances en PDF según el filtro 'estado'
+BALANCE_TITLES = {
+    'por_entregar': 'Por entregar',
+    'entregados': 'Entregados',
+}
+
+
+def _balance_pdf_totals(params):
+    """
+    Obtiene la cantidad de pedidos y la suma de sus totales de un balance en
+    PDF: de los resúmenes si solo se filtra por estado, o con una consulta
+    agregada si hay búsqueda o total mínimo.
+
+    Args:
+        params (QueryDict): Parámetros de la solicitud.
+
+    Returns:
+        tuple: La cantidad de pedidos y la suma de sus totales.
+    """
+
+    if params.get('buscar', '').strip() or params.get('min_total'):
+        return summarize(order_queryset(params))
+
+    status = params.get('estado')
+    if params.get('archivo') == '1':
+        # Los pedidos archivados están todos entregados
+        if status == 'por_entregar':
+            return 0, 0
+        return rollups.archive_totals()
+
+    return rollups.balance_totals(
+        {'por_entregar': 'to_deliver', 'entregados': 'delivered'}.get(status))
+
+
+@read_replica
+@query_budget(3)
+def balance_pdf(request):
+    """
+    Genera el PDF de una tabla de balance en el servidor, con a lo sumo
+    PDF_MAX_ROWS pedidos; para más, la exportación a CSV o Excel.
+
+    Args:
+        request (HttpRequest): La solicitud HTTP recibida. Acepta los mismos
+        filtros que la exportación de pedidos.
+
+    Returns:
+        HttpResponse: El PDF del balance.
+    """
+
+    count, revenue = _balance_pdf_totals(request.GET)
+
+    # Los primeros pedidos del balance con los filtros de la tabla, en una
+    # sola consulta
+    max_rows = getattr(settings, 'PDF_MAX_ROWS', 2000)
+    fields = ['id', 'product__name', 'customer__first_name',
+              'customer__last_name', 'amount', 'price', 'total', 'deadline',
+              'delivered', 'bill']
+    rows = [
+        (id, product, f'{first_name} {last_name or ""}', amount, price, total,
+         deadline, delivered or 'Por entregar', bill)
+        for (id, product, first_name, last_name, amount, price, total,
+             deadline, delivered, bill)
+        in order_queryset(request.GET).order_by('id').values_list(
+            *fields)[:max_rows]
+    ]
+
+    footer = f'Total: {revenue}'
+    if count > len(rows):
+        footer += (f' - {count} pedidos, se muestran los primeros '
+                   f'{len(rows)}; use la exportación para verlos todos')
+
+    payload = {
+        'title': BALANCE_TITLES.get(request.GET.get('estado'),
+                                    'Todos los pedidos'),
+        'headers': ['N°', 'Producto', 'Cliente', '°', 'Precio', 'P. Total',
+                    'Entrega', 'Entregado', 'Docm.'],
+        'widths': [5, 18, 20, 4, 9, 10, 10, 10, 10],
+        'rows': rows,
+        'footer': footer,
+    }
+
+    return _pdf_response('table', payload, 'balance.pdf')
+
+
+@query_budget(1)
+def order_pdf(request, id):
+    """
+    Genera la ficha en PDF de un pedido.
+
+    Args:
+        request (HttpRequest): La solicitud HTTP recibida.
+        id (int): El ID del pedido.
+
+    Returns:
+        HttpResponse: El PDF del pedido.
+    """
+
+    order = Order.objects.visible().select_related(
+        'product', 'customer').get(id=id)
+
+    payload = {
+        'title': f'Pedido numero: {order.id}',
+        'fields': [
+            ('Producto:', order.product.name),
+            ('Cliente:', f'{order.customer.first_name} '
+                         f'{order.customer.last_name or ""}'),
+            ('Cantidad:', order.amount),
+            ('Precio:', order.price),
+            ('Precio total:', order.calculate_total_price()),
+            ('Observación:', order.observation or ''),
+            ('Fecha de entrega:', order.deadline),
+            ('Entregado:', order.delivered or 'Por entregar'),
+            ('Factura numero:', order.bill or ''),
+        ],
+    }
+
+    return _pdf_response('slip', payload, f'pedido_{order.id}.pdf')
+
+
+def metrics(request):
+    """
+    Expone las métricas de todos los procesos en el formato de texto de
+    Prometheus: histogramas de latencia por URL y estado, solicitudes,
+    consultas SQL y los cuantiles p50/p95/p99 estimados.
+
+    Args:
+        request (HttpRequest): La solicitud HTTP recibida.
+
+    Returns:
+        HttpResponse: Las métricas en texto plano.
+    """
+
+    # Incluir las solicitudes de este proceso que aún no se escribieron
+    metrics_registry.get_registry().flush()
+    content = metrics_registry.render(
+        metrics_registry.collect(settings.METRICS_DIR))
+
+    return HttpResponse(
+        content, content_type='text/plain; version=0.0.4; charset=utf-8')
 
 
 # Pedidos
+@query_budget(0)
 def order_form(request):
     """
     Renderiza el formulario de creación de un pedido.
@@ -95,16 +640,12 @@ def order_form(request):
 
     """
 
-    # Obtener todos los clientes y productos para pasarlos como contexto
-    context = {
-        'customers': Customer.objects.all(),
-        'products': Product.objects.all()
-    }
-
-    # Renderiza 'orders/add.html' utilizando el diccionario context.
-    return render(request, 'orders/add.html', context)
+    # Clientes y productos se buscan desde el formulario con
+    # 'customer_search' y 'product_search'
+    return render(request, 'orders/add.html')
 
 
+@query_budget(17)
 def process_new_order(request):
     """
     Procesa la creación de un nuevo pedido.
@@ -132,19 +673,24 @@ def process_new_order(request):
         return redirect(reverse('order_form'))
 
     # Obtener el producto y cliente correspondiente a los IDs proporcionados
-    product = Product.objects.get(id=data['product_id'])
-    customer = Customer.objects.get(id=data['customer_id'])
-
-    # Crear el pedido con los datos proporcionados
-    Order.objects.create(
-        product=product,
-        customer=customer,
-        observation=data['observation'],
-        amount=data['amount'],
-        price=data['price'],
-        deadline=data['deadline'],
-        bill=data['bill']
-    )
+    product = Product.objects.visible().get(id=data['product_id'])
+    customer = Customer.objects.visible().get(id=data['customer_id'])
+
+    # Crear el pedido, sumarlo a los resúmenes y registrar el evento en la
+    # misma transacción
+    with events.recording():
+        order = Order.objects.create(
+            product=product,
+            customer=customer,
+            observation=data['observation'],
+            amount=data['amount'],
+            price=data['price'],
+            deadline=data['deadline'],
+            bill=data['bill']
+        )
+        rollups.add_order(order)
+        events.record(order.id, OrderEvent.CREATED,
+                      events.diff({}, events.snapshot(order)))
 
     # Crear un mensaje de exito.
     messages.success(request, 'Pedido agregado a la lista')
@@ -153,6 +699,7 @@ def process_new_order(request):
     return redirect(reverse(index))
 
 
+@query_budget(1)
 def edit_order_form(request, id):
     """
     Muestra el formulario de edición de una orden existente.
@@ -166,16 +713,15 @@ def edit_order_form(request, id):
 
     """
 
-    # Obtener el pedido a editar utilizando el ID proporcionado
-    to_edit_order = Order.objects.get(id=id)
+    # Obtener el pedido a editar junto con su cliente y producto actuales
+    to_edit_order = Order.objects.visible().select_related(
+        'product', 'customer').get(id=id)
 
     # Formatear la fecha limite para que sea legible por el HTML
     formated_date = to_edit_order.deadline.strftime("%Y-%m-%d")
 
-    # Crear un context con los clientes, productos y la orden a editar
+    # Crear un context con la orden a editar
     context = {
-        'customers': Customer.objects.all(),
-        'products': Product.objects.all(),
         'order': to_edit_order,
         'deadline_formated': formated_date
     }
@@ -184,6 +730,7 @@ def edit_order_form(request, id):
     return render(request, 'orders/edit.html', context)
 
 
+@query_budget(22)
 def process_order_edit(request, id):
     """
     Procesa la edición de una orden existente.
@@ -197,9 +744,6 @@ def process_order_edit(request, id):
 
     """
 
-    # Obtener la orden a editar utilizando el ID proporcionado
-    to_edit = Order.objects.get(id=id)
-
     # Obtener los nuevos datos enviados en el cuerpo de la solicitud POST
     new_data = request.POST
 
@@ -219,20 +763,38 @@ def process_order_edit(request, id):
     customer_id = int(new_data['customer_id'])
 
     # Obtener los objetos de producto y cliente con los nuevos datos
-    product = Product.objects.get(id=product_id)
-    customer = Customer.objects.get(id=customer_id)
-
-    # Actualizar datos del pedido a editar
-    to_edit.product = product
-    to_edit.customer = customer
-    to_edit.observation = new_data['observation']
-    to_edit.amount = new_data['amount']
-    to_edit.price = new_data['price']
-    to_edit.deadline = new_data['deadline']
-    to_edit.bill = new_data['bill']
-
-    # Guardar los cambios
-    to_edit.save()
+    product = Product.objects.visible().get(id=product_id)
+    customer = Customer.objects.visible().get(id=customer_id)
+
+    with events.recording():
+        # Obtener la orden a editar bloqueada, para restar de los resúmenes
+        # el estado de entrega que tiene guardado en este momento
+        to_edit = Order.objects.visible().select_for_update().get(id=id)
+        before = events.snapshot(to_edit)
+
+        # Restar el pedido de los resúmenes con sus valores anteriores
+        rollups.remove_order(to_edit)
+
+        # Actualizar datos del pedido a editar
+        to_edit.product = product
+        to_edit.customer = customer
+        to_edit.observation = new_data['observation']
+        to_edit.amount = new_data['amount']
+        to_edit.price = new_data['price']
+        to_edit.deadline = new_data['deadline']
+        to_edit.bill = new_data['bill']
+
+        # Guardar los cambios sin reescribir el estado de entrega y sumar
+        # los nuevos valores
+        to_edit.save(update_fields=[
+            'product', 'customer', 'observation', 'amount', 'price',
+            'deadline', 'bill', 'updated_at'])
+        rollups.add_order(to_edit)
+
+        # Registrar solo los campos que cambiaron
+        changes = events.diff(before, events.snapshot(to_edit))
+        if changes:
+            events.record(to_edit.id, OrderEvent.EDITED, changes)
 
     # Crea mensaje informando la acción
     messages.warning(request, 'Pedido modificado')
@@ -241,6 +803,7 @@ def process_order_edit(request, id):
     return redirect(reverse(index))
 
 
+@query_budget(9)
 def delete_order(request, id):
     """
     Elimina un pedido existente.
@@ -255,10 +818,15 @@ def delete_order(request, id):
     """
 
     # Obtener el pedido a eliminar
-    to_delete = Order.objects.get(id=id)
+    to_delete = Order.objects.visible().get(id=id)
 
-    # Eliminar el pedido
-    to_delete.delete()
+    # Eliminar el pedido, restarlo de los resúmenes e invalidar las tablas
+    with events.recording():
+        rollups.remove_order(to_delete)
+        search.remove(SearchEntry.ORDER, [to_delete.id])
+        events.record(to_delete.id, OrderEvent.DELETED)
+        to_delete.delete()
+        bump_table_version()
 
     # Crea mensaje informando la acción.
     messages.error(request, 'Pedido eliminado a la lista')
@@ -267,6 +835,85 @@ def delete_order(request, id):
     return redirect(reverse(index))
 
 
+@query_budget(23)
+def bulk_orders(request):
+    """
+    Entrega, reabre o elimina los pedidos seleccionados en una tabla de
+    balance con una sola consulta UPDATE o DELETE. Los resúmenes se ajustan
+    con una consulta agrupada por tabla y la caché se invalida una sola vez.
+
+    Args:
+        request (HttpRequest): La solicitud HTTP recibida. Por POST recibe
+        'accion' ('entregar', 'reabrir' o 'eliminar'), los 'ids' de los
+        pedidos y 'volver', la página de balance de origen.
+
+    Returns:
+        HttpResponseRedirect: Una redirección a la página de balance.
+    """
+
+    back = request.POST.get('volver')
+    if back not in BULK_RETURN_PAGES:
+        back = 'index'
+
+    if request.method != 'POST':
+        return redirect(reverse(back))
+
+    action = request.POST.get('accion')
+    ids = [int(id) for id in request.POST.getlist('ids') if id.isdigit()]
+
+    if action not in ('entregar', 'reabrir', 'eliminar') or not ids:
+        messages.error(request, 'Selecciona pedidos y una acción')
+        return redirect(reverse(back))
+    if len(ids) > BULK_MAX_ORDERS:
+        messages.error(
+            request, f'Máximo {BULK_MAX_ORDERS} pedidos por acción')
+        return redirect(reverse(back))
+
+    orders = Order.objects.visible().filter(id__in=ids)
+    if action == 'entregar':
+        orders = orders.filter(delivered__isnull=True)
+    elif action == 'reabrir':
+        orders = orders.filter(delivered__isnull=False)
+
+    with events.recording():
+        # Bloquear los pedidos afectados para que nadie los cambie entre la
+        # resta de los resúmenes y la actualización
+        locked = dict(
+            orders.select_for_update().values_list('id', 'delivered'))
+        changed = Order.objects.filter(id__in=list(locked))
+        rollups.apply_orders(changed, sign=-1)
+
+        if action == 'eliminar':
+            search.remove(SearchEntry.ORDER, changed.values('id'))
+            count = changed.delete()[1].get(Order._meta.label, 0)
+            for id in locked:
+                events.record(id, OrderEvent.DELETED)
+        else:
+            # update() no modifica updated_at por su cuenta
+            delivered = timezone.localdate() if action == 'entregar' else None
+            count = changed.update(
+                delivered=delivered, updated_at=timezone.now())
+            rollups.apply_orders(changed)
+            kind = (OrderEvent.DELIVERED if action == 'entregar'
+                    else OrderEvent.REOPENED)
+            for id, previous in locked.items():
+                events.record(id, kind, {'delivered': [previous, delivered]})
+
+        bump_table_version()
+
+    # Crea mensaje informando la acción
+    results = {
+        'entregar': 'marcados como entregados',
+        'reabrir': 'marcados como por entregar',
+        'eliminar': 'eliminados',
+    }
+    messages.success(request, f'{count} pedidos {results[action]}')
+
+    return redirect(reverse(back))
+
+
+@query_budget(3)
+@conditional_page(order_detail_state)
 def order_detail(request, id):
     """
     Muestra los detalles de un pedido específico.
@@ -282,15 +929,19 @@ def order_detail(request, id):
 
     """
 
-    # Obtener el pedido y pasarlo como contexto
+    # Obtener el pedido junto con su producto y cliente en una sola consulta,
+    # y su historial desde el índice (pedido, fecha)
     context = {
-        'order': Order.objects.get(id=id)
+        'order': Order.objects.visible().select_related(
+            'product', 'customer').get(id=id),
+        'events': events.timeline(id),
     }
 
     # Renderizar template detail.html de la carpeta orders con el contexto
     return render(request, 'orders/detail.html', context)
 
 
+@query_budget(10)
 def order_delivered(request, id):
     """
     Marca un pedido como entregado o como no entregado y redirige al índice.
@@ -304,17 +955,108 @@ def order_delivered(request, id):
 
     """
 
-    # Obtener el pedido utilizando el ID proporcionado
-    order = Order.objects.get(id=id)
-
-    # Marcar o desmarcar como entregado con el metodo deliver_product()
-    order.deliver_product()
+    # Marcar o desmarcar como entregado con un solo UPDATE condicional,
+    # actualizando los resúmenes en la misma transacción
+    with events.recording():
+        order = Order.objects.visible().toggle_delivered(id)
+        if order is None:
+            raise Http404('Pedido no encontrado')
+        rollups.toggle_order(order)
+        # El UPDATE condicional no lee la fecha de entrega anterior
+        if order.delivered is None:
+            events.record(order.id, OrderEvent.REOPENED)
+        else:
+            events.record(order.id, OrderEvent.DELIVERED,
+                          {'delivered': [None, order.delivered]})
+        # update() no envía post_save: invalidar las tablas a mano
+        bump_table_version()
 
     # Redirigir al índice
     return redirect(reverse(index))
 
 
+def _search_limit(params):
+    """
+    Obtiene la cantidad de resultados pedida en una búsqueda.
+
+    Args:
+        params (QueryDict): Parámetros de la solicitud.
+
+    Returns:
+        int: La cantidad de resultados, entre 1 y SEARCH_MAX_LIMIT.
+    """
+
+    try:
+        limit = int(params.get('limit', SEARCH_LIMIT))
+    except ValueError:
+        limit = SEARCH_LIMIT
+
+    return min(max(limit, 1), SEARCH_MAX_LIMIT)
+
+
+@read_replica
+@query_budget(5)
+def global_search(request):
+    """
+    Busca pedidos, clientes y productos en el índice de búsqueda por
+    número de factura, teléfono, documento, nombre u observación.
+
+    Args:
+        request (HttpRequest): La solicitud HTTP recibida, con el texto en
+        'q' y opcionalmente 'limit'.
+
+    Returns:
+        JsonResponse: Los resultados con su tipo, texto y URL.
+    """
+
+    term = request.GET.get('q', '').strip()
+    if not term:
+        return JsonResponse({'results': []})
+
+    return JsonResponse(
+        {'results': search.search(term, _search_limit(request.GET))})
+
+
 # --Clientes--
+@query_budget(1)
+def customer_search(request):
+    """
+    Busca clientes cuyo nombre, apellido, teléfono o documento empiece con el
+    texto dado, para el selector de los formularios de pedidos.
+
+    Args:
+        request (HttpRequest): La solicitud HTTP recibida, con el texto en
+        'q' y opcionalmente 'limit'.
+
+    Returns:
+        JsonResponse: Los clientes encontrados con su id y texto a mostrar.
+    """
+
+    term = request.GET.get('q', '').strip()
+    if not term:
+        return JsonResponse({'results': []})
+
+    # Búsquedas por prefijo, que pueden usar los índices de cada columna
+    matches = Customer.objects.visible().filter(
+        Q(first_name__istartswith=term) |
+        Q(last_name__istartswith=term) |
+        Q(phone_number__startswith=term) |
+        Q(document__startswith=term)
+    ).order_by('first_name', 'last_name').values_list(
+        'id', 'first_name', 'last_name', 'phone_number'
+    )[:_search_limit(request.GET)]
+
+    results = [
+        {'id': id, 'text': f'{first_name} {last_name or ""} ({phone})'}
+        for id, first_name, last_name, phone in matches
+    ]
+
+    return JsonResponse({'results': results})
+
+
+@read_replica
+@query_budget(2)
+@conditional_page(catalog_state(Customer))
 def customers(request):
     """
     Muestra todos los clientes y renderiza la plantilla 'index.html'.
@@ -328,7 +1070,7 @@ def customers(request):
 
     """
     # Obtener todos los clientes
-    all_customers = Customer.objects.all()
+    all_customers = Customer.objects.visible()
 
     # Crear un contexto usando todos los clientes obtenidos
     context = {'all_customers': all_customers}
@@ -337,6 +1079,7 @@ def customers(request):
     return render(request, 'customers/index.html', context)
 
 
+@query_budget(0)
 def customer_form(request):
     """
     Renderiza la plantilla 'add.html' que muestra un formulario para agregar 
@@ -354,6 +1097,7 @@ def customer_form(request):
     return render(request, 'customers/add.html')
 
 
+@query_budget(3)
 def process_new_customer(request):
     """
     Procesa los datos del formulario enviado por POST para agregar un nuevo 
@@ -395,6 +1139,7 @@ def process_new_customer(request):
     return redirect(reverse('customers'))
 
 
+@query_budget(1)
 def customer_edit_form(request, id):
     """
     Muestra un formulario de edición para modificar los datos de un cliente 
@@ -411,13 +1156,14 @@ def customer_edit_form(request, id):
 
     # Contexto con los datos del cliente a editar
     context = {
-        'customer': Customer.objects.get(id=id)
+        'customer': Customer.objects.visible().get(id=id)
     }
 
     # Renderiza formulario de edición con el contexto
     return render(request, 'customers/edit.html', context)
 
 
+@query_budget(15)
 def customer_edit_process(request, id):
     """
     Procesa la información enviada desde el formulario de edición y actualiza 
@@ -433,7 +1179,7 @@ def customer_edit_process(request, id):
     """
 
     # Obtener el objeto Customer con el ID proporcionado
-    edit_customer = Customer.objects.get(id=id)
+    edit_customer = Customer.objects.visible().get(id=id)
 
     # Obtener los datos del formulario
     form_data = request.POST
@@ -449,6 +1195,9 @@ def customer_edit_process(request, id):
         # Redirige al formulario para editar el cliente.
         return redirect(reverse('customer_edit_form', args=[id]))
 
+    # Teléfono y documento actuales, que también se indexan en sus pedidos
+    indexed = (edit_customer.phone_number, edit_customer.document)
+
     # Actualizar los datos del cliente
     edit_customer.first_name = form_data['first_name']
     edit_customer.last_name = form_data['last_name']
@@ -457,8 +1206,15 @@ def customer_edit_process(request, id):
     edit_customer.document = form_data['document']
     edit_customer.address = form_data['address']
 
-    # Guardar los cambios
-    edit_customer.save()
+    # Guardar los cambios y, si cambiaron, volver a indexar sus pedidos
+    with transaction.atomic():
+        edit_customer.save()
+        if indexed != (edit_customer.phone_number, edit_customer.document):
+            search.index(SearchEntry.ORDER, edit_customer.orders.values_list(
+                'id', flat=True))
+            search.index(SearchEntry.ARCHIVED_ORDER,
+                         edit_customer.archived_orders.values_list(
+                             'id', flat=True))
 
     # Crea mensaje informando la acción
     messages.warning(request, 'Cliente modificado')
@@ -481,10 +1237,11 @@ def delete_customer(request, id):
     """
 
     # Obtener el cliente a editar
-    customer_to_delete = Customer.objects.get(id=id)
+    customer_to_delete = Customer.objects.visible().get(id=id)
 
-    # Eliminar cliente
-    customer_to_delete.delete()
+    # Marcar el cliente como eliminado; sus pedidos se restan de los
+    # resúmenes ahora y se borran por bloques con purge_deleted
+    deletion.soft_delete(customer_to_delete)
 
     # Crea mensaje informando la acción
     messages.error(request, 'Cliente eliminado a la lista')
@@ -494,6 +1251,39 @@ def delete_customer(request, id):
 
 
 # --Productos--
+@query_budget(1)
+def product_search(request):
+    """
+    Busca productos cuyo nombre empiece con el texto dado, para el selector
+    de los formularios de pedidos.
+
+    Args:
+        request (HttpRequest): La solicitud HTTP recibida, con el texto en
+        'q' y opcionalmente 'limit'.
+
+    Returns:
+        JsonResponse: Los productos encontrados con su id y nombre.
+    """
+
+    term = request.GET.get('q', '').strip()
+    if not term:
+        return JsonResponse({'results': []})
+
+    matches = (
+        Product.objects.visible()
+        .filter(name__istartswith=term)
+        .order_by('name')
+        .values_list('id', 'name')[:_search_limit(request.GET)]
+    )
+
+    results = [{'id': id, 'text': name} for id, name in matches]
+
+    return JsonResponse({'results': results})
+
+
+@read_replica
+@query_budget(2)
+@conditional_page(catalog_state(Product))
 def products(request):
     """
     Muestra la página de productos con una lista de todos ellos.
@@ -508,7 +1298,7 @@ def products(request):
     """
 
     # Obtener todos los productos
-    all_products = Product.objects.all()
+    all_products = Product.objects.visible()
 
     # Crear un diccionario contexto con todos los productos
     context = {'all_products': all_products}
@@ -517,6 +1307,7 @@ def products(request):
     return render(request, 'products/index.html', context)
 
 
+@query_budget(0)
 def product_form(request):
     """
     Muestra el formulario para añadir un producto.
@@ -534,6 +1325,7 @@ def product_form(request):
     return render(request, 'products/add.html')
 
 
+@query_budget(3)
 def process_new_product(request):
     """
     Procesa la información del formulario y crea un nuevo producto en la base 
@@ -572,6 +1364,7 @@ def process_new_product(request):
     return redirect(reverse('products'))
 
 
+@query_budget(1)
 def product_edit_form(request, id):
     """
     Muestra el formulario de edición de un producto existente.
@@ -587,13 +1380,14 @@ def product_edit_form(request, id):
 
     # Crea contexto con el producto a editar
     context = {
-        'product': Product.objects.get(id=id)
+        'product': Product.objects.visible().get(id=id)
     }
 
     # Redirige al formulario para editar con el contexto
     return render(request, 'products/edit.html', context)
 
 
+@query_budget(5)
 def product_edit_process(request, id):
     """
     Procesa la edición de un producto existente.
@@ -609,7 +1403,7 @@ def product_edit_process(request, id):
     """
 
     # Obtener el producto a editar
-    edit_product = Product.objects.get(id=id)
+    edit_product = Product.objects.visible().get(id=id)
 
     # Obtener los datos nuevos
     form_data = request.POST
@@ -654,10 +1448,11 @@ def delete_product(request, id):
     """
 
     # Obtener producto a eliminar
-    customer_to_delete = Product.objects.get(id=id)
+    product_to_delete = Product.objects.visible().get(id=id)
 
-    # Eliminar producto
-    customer_to_delete.delete()
+    # Marcar el producto como eliminado; sus pedidos se restan de los
+    # resúmenes ahora y se borran por bloques con purge_deleted
+    deletion.soft_delete(product_to_delete)
 
     # Crea mensaje informando la acción.
     messages.error(request, 'Producto eliminado a la lista')
@@ -10,7 +10,11 @@ For the full list of settings and their values, seeCONF
 https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
+import atexit
 import os
+import shutil
+import sys
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -25,6 +29,9 @@ SECRET_KEY = 's5cazcr-(v-w+vcpa6o2ovxf#vb&_(5itx626(ikkxdweg7*w0'
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
+# Verdadero al ejecutar 'manage.py test'
+TESTING = sys.argv[1:2] == ['test']
+
 ALLOWED_HOSTS = []
 
 
@@ -43,13 +50,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'django.middleware.gzip.GZipMiddleware',
+    'orders.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'orders.middleware.ReplicaMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'orders.middleware.ViewTimingMiddleware',
 ]
 
 ROOT_URLCONF = 'resin_haus.urls'
@@ -87,6 +98,80 @@ DATABASES = {
     }
 }
 
+# Réplica de solo lectura para los listados y reportes, activada con
+# DB_REPLICA_HOST. Después de escribir, cada sesión lee del primario durante
+# REPLICA_STICKY_SECONDS para no ver datos anteriores a su escritura.
+
+REPLICA_DATABASE = None
+if os.environ.get('DB_REPLICA_HOST'):
+    DATABASES['replica'] = dict(
+        DATABASES['default'], HOST=os.environ['DB_REPLICA_HOST'],
+        TEST={'MIRROR': 'default'})
+    REPLICA_DATABASE = 'replica'
+
+DATABASE_ROUTERS = ['orders.routers.ReplicaRouter']
+REPLICA_STICKY_SECONDS = 5
+
+
+# Cache
+# Caché compartida entre los procesos del servidor: las tablas de pedidos
+# guardadas por un proceso deben invalidarse para todos.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+    }
+}
+
+
+# Tiempos por solicitud: una línea JSON por solicitud en la consola.
+# TIMING_LOG_LEVEL=WARNING los desactiva.
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'orders.timing': {
+            'handlers': ['console'],
+            'level': os.environ.get('TIMING_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+        'orders.queries': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
+
+# Consultas por solicitud: en desarrollo y en las pruebas se agrupan por SQL
+# normalizado para señalar los N+1. Una vista que supera su límite de
+# query_budget() falla en las pruebas y se registra en producción.
+
+QUERY_INSPECTION = DEBUG or TESTING
+QUERY_BUDGET_RAISE = TESTING
+
+
+# Consultas lentas: las que tardan al menos SLOW_QUERY_THRESHOLD segundos se
+# guardan con su EXPLAIN (None lo desactiva). La tabla conserva las últimas
+# SLOW_QUERY_LIMIT; 'manage.py slow_queries' muestra las que más tiempo suman.
+
+SLOW_QUERY_THRESHOLD = 0.1
+SLOW_QUERY_LIMIT = 1000
+
+
+# Pedidos entregados hace más de estos días pasan a la tabla de archivo con
+# 'manage.py archive_orders'
+
+ARCHIVE_AFTER_DAYS = 365
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -126,3 +211,40 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+
+# Paquetes generados con 'manage.py build_assets' (ver orders/assets.py). El
+# servidor web debe enviar las versiones .br/.gz ya comprimidas y guardar
+# los archivos con hash sin vencimiento. Con DEBUG se usan los archivos
+# originales, para no tener que regenerar los paquetes en cada cambio.
+ASSET_BUNDLES_DIR = os.path.join(BASE_DIR, 'static', 'bundles')
+ASSET_BUNDLES = not DEBUG
+
+
+# PDF generados en el servidor
+
+PDF_CACHE_DIR = os.path.join(BASE_DIR, 'pdf_cache')
+PDF_CACHE_MAX_FILES = 500
+PDF_WORKERS = 2
+PDF_MAX_ROWS = 2000
+
+
+# Métricas de las solicitudes, un archivo por proceso
+
+METRICS_DIR = os.path.join(BASE_DIR, 'metrics')
+
+
+# Pruebas
+# Las pruebas usan una caché en memoria y una carpeta temporal para los PDF
+# y las métricas, para no leer ni borrar los datos del servidor.
+
+if TESTING:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+    TEST_FILES_DIR = tempfile.mkdtemp(prefix='resin_haus_tests_')
+    atexit.register(shutil.rmtree, TEST_FILES_DIR, ignore_errors=True)
+    PDF_CACHE_DIR = os.path.join(TEST_FILES_DIR, 'pdf_cache')
+    METRICS_DIR = os.path.join(TEST_FILES_DIR, 'metrics')
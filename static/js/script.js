@@ -1,21 +1,16 @@
 // DataTables 
 $(document).ready(function () {
-    $('#myTable').DataTable({
+    var table = $('#myTable');
+    // DataTables solo se carga en las páginas con tablas
+    if (!table.length) {
+        return;
+    }
+    var options = {
         responsive: 'true',
         dom: 'Bfrtip', 
         buttons: [
-            {
-                extend: 'excelHtml5',
-                text: '<i class="fas fa-file-excel"></i>',
-                titleAttr: 'Exportar a Excel',
-                className: 'btn btn-success',
-            },
-            {
-                extend: 'pdfHtml5',
-                text: '<i class="fas fa-file-pdf"></i>',
-                titleAttr: 'Exportar a PDF',
-                className: 'btn btn-danger',
-            },
+            lazyExportButton('excelHtml5', 'fas fa-file-excel', 'Exportar a Excel', 'btn btn-success'),
+            lazyExportButton('pdfHtml5', 'fas fa-file-pdf', 'Exportar a PDF', 'btn btn-danger'),
             {
                 extend: 'print',
                 text: '<i class="fa fa-print"></i>',
@@ -23,6 +18,220 @@ $(document).ready(function () {
                 className: 'btn btn-info',
             }
         ]
+    };
+
+    // Tablas de balance: los datos se paginan, ordenan y filtran en el servidor
+    if (table.data('source')) {
+        $.extend(options, serverSideOptions(table));
+    }
+
+    // Exportaciones generadas en el servidor a partir de la base de datos
+    if (table.data('export')) {
+        options.buttons.splice(0, 1,
+            exportButton(table, 'xlsx', 'fas fa-file-excel', 'Exportar a Excel', 'btn btn-success'),
+            exportButton(table, 'csv', 'fas fa-file-csv', 'Exportar a CSV', 'btn btn-secondary'));
+    }
+
+    // PDF generado en el servidor
+    if (table.data('pdf')) {
+        options.buttons.splice(options.buttons.length - 2, 1,
+            exportButton(table, 'pdf', 'fas fa-file-pdf', 'Exportar a PDF', 'btn btn-danger'));
+    }
+
+    table.DataTable(options);
+
+    // Cada página nueva empieza sin pedidos seleccionados
+    table.on('draw.dt', function () {
+        table.find('thead input[type="checkbox"]').prop('checked', false);
+    });
+});
+
+
+// Bibliotecas de exportación en el navegador (JSZip y pdfmake), que pesan
+// varios MB: se cargan una sola vez, al usar el primer botón que las necesita
+var exportLibraries = null;
+
+function loadExportLibraries() {
+    if (!exportLibraries) {
+        var urls = $('body').data('export-assets') || [];
+        exportLibraries = urls.reduce(function (loading, url) {
+            return loading.then(function () {
+                return $.ajax({url: url, dataType: 'script', cache: true});
+            });
+        }, $.Deferred().resolve().promise());
+    }
+    return exportLibraries;
+}
+
+
+// Botón de exportación de DataTables que carga sus bibliotecas al hacer clic
+// y después ejecuta la acción del botón original ('excelHtml5' o 'pdfHtml5')
+function lazyExportButton(extend, icon, title, className) {
+    return {
+        text: '<i class="' + icon + '"></i>',
+        titleAttr: title,
+        className: className,
+        action: function (e, dt, node, config) {
+            var button = this;
+            var base = $.fn.dataTable.ext.buttons[extend];
+            button.processing(true);
+            loadExportLibraries().then(function () {
+                button.processing(false);
+                base.action.call(button, e, dt, node, $.extend(true, {}, base, config));
+            });
+        }
+    };
+}
+
+
+// Botón que descarga la exportación del servidor con la búsqueda actual
+function exportButton(table, format, icon, title, className) {
+    return {
+        text: '<i class="' + icon + '"></i>',
+        titleAttr: title,
+        className: className,
+        action: function (e, dt) {
+            var url = table.data(format === 'pdf' ? 'pdf' : 'export');
+            var params = {formato: format, buscar: dt.search()};
+            window.location = url + (url.indexOf('?') < 0 ? '?' : '&') + $.param(params);
+        }
+    };
+}
+
+
+// Opciones de DataTables para las tablas con procesamiento en el servidor
+function serverSideOptions(table) {
+    // Última respuesta recibida, para pedir la página siguiente por cursor
+    var last = null;
+
+    var columns = table.find('thead th').map(function () {
+        var th = $(this);
+        if (th.data('select')) {
+            // Las casillas pertenecen al formulario de acciones en lote
+            return {data: 'id', orderable: false, render: function (id) {
+                return '<input type="checkbox" class="form-check-input" name="ids" form="bulkForm" value="' + id + '">';
+            }};
+        }
+        if (th.data('actions')) {
+            return {data: 'id', orderable: false, render: function (id, type, row) {
+                return orderActions(table, row);
+            }};
+        }
+        if (th.data('data') === 'delivered') {
+            return {data: 'delivered', render: function (delivered) {
+                return delivered ? delivered : '<span style="color:red">Por entregar</span>';
+            }};
+        }
+        return {
+            data: th.data('data'),
+            orderable: th.data('orderable') !== false,
+            render: $.fn.dataTable.render.text()
+        };
+    }).get();
+
+    return {
+        serverSide: true,
+        processing: true,
+        searchDelay: 400,
+        // Búsqueda inicial, por ejemplo desde un resultado de /buscar/
+        search: {search: table.data('search') || ''},
+        columns: columns,
+        ajax: {
+            url: table.data('source'),
+            // Sin parámetro anti-caché, para que el navegador valide con ETag
+            cache: true,
+            data: function (d) {
+                var key = JSON.stringify([d.order, d.search.value, d.length]);
+                if (last && last.key === key && d.start === last.start + d.length && last.cursor) {
+                    d.cursor = last.cursor;
+                }
+                last = {key: key, start: d.start};
+            },
+            dataSrc: function (json) {
+                last.cursor = json.cursor;
+                return json.data;
+            }
+        }
+    };
+}
+
+
+// Botones de acciones de un pedido a partir de las URLs de la tabla
+function orderActions(table, row) {
+    var url = function (name) {
+        return table.data(name + '-url').replace('/0/', '/' + row.id + '/');
+    };
+    var deliver = row.delivered
+        ? '<a class="btn btn-secondary btn-sm" href="' + url('deliver') + '" title="deliver link"><i class="bi bi-x-circle-fill"></i></a>'
+        : '<a class="btn btn-success btn-sm" href="' + url('deliver') + '" title="deliver link"><i class="bi bi-check-circle-fill"></i></a>';
+
+    return '<button type="button" class="btn btn-danger btn-sm" data-bs-toggle="modal" data-bs-target="#deleteModal"'
+        + ' data-id="' + row.id + '" data-product="' + $('<div>').text(row.product).html().replace(/"/g, '&quot;') + '"'
+        + ' data-amount="' + row.amount + '" data-url="' + url('delete') + '"><i class="bi bi-trash3-fill"></i></button> '
+        + '<a class="btn btn-warning btn-sm" href="' + url('edit') + '" title="edit link"><i class="bi bi-pencil-fill"></i></a> '
+        + deliver + ' '
+        + '<a class="btn btn-info btn-sm" href="' + url('detail') + '" title="detail link"><i class="bi bi-info-circle-fill"></i></a>';
+}
+
+
+// Seleccionar o quitar todos los pedidos de la página visible
+$(document).on('change', '#myTable thead input[type="checkbox"]', function () {
+    $('#myTable tbody input[name="ids"]').prop('checked', this.checked);
+});
+
+
+// Modal de eliminación compartido por todas las filas
+$(document).on('show.bs.modal', '#deleteModal', function (event) {
+    var button = $(event.relatedTarget);
+    var modal = $(this);
+    modal.find('[data-field="id"]').text(button.data('id'));
+    modal.find('[data-field="product"]').text(button.data('product'));
+    modal.find('[data-field="amount"]').text(button.data('amount'));
+    modal.find('[data-field="delete-link"]').attr('href', button.data('url'));
+});
+
+
+// Selectores con búsqueda para clientes y productos en los formularios
+$(document).ready(function () {
+    $('[data-typeahead]').each(function () {
+        var widget = $(this);
+        var input = widget.find('input[type="text"]');
+        var hidden = widget.find('input[type="hidden"]');
+        var menu = widget.find('.dropdown-menu');
+        var empty = hidden.data('empty');
+        var timer = null;
+        var request = null;
+
+        input.on('input', function () {
+            // El texto cambió: el valor anterior ya no es válido
+            hidden.val(empty);
+            clearTimeout(timer);
+            timer = setTimeout(function () {
+                if (request) {
+                    request.abort();
+                }
+                request = $.getJSON(widget.data('typeahead'), {q: input.val()}, function (data) {
+                    menu.empty();
+                    $.each(data.results, function (i, result) {
+                        $('<li><a class="dropdown-item" href="#"></a></li>')
+                            .find('a').text(result.text).data('id', result.id).end()
+                            .appendTo(menu);
+                    });
+                    menu.toggleClass('show', data.results.length > 0);
+                });
+            }, 250);
+        });
+
+        menu.on('click', 'a', function (event) {
+            event.preventDefault();
+            input.val($(this).text());
+            hidden.val($(this).data('id'));
+            menu.removeClass('show');
+        });
+
+        input.on('blur', function () {
+            setTimeout(function () { menu.removeClass('show'); }, 200);
+        });
     });
 });
 